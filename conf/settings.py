@@ -11,12 +11,15 @@ https://docs.djangoproject.com/en/1.9/ref/settings/
 """
 
 import os
+from urllib.parse import urlparse
 
 import directory_healthcheck.backends
 import environ
 import sentry_sdk
 from sentry_sdk.integrations.django import DjangoIntegration
 
+import core.healthcheck
+
 env = environ.Env()
 for env_file in env.list('ENV_FILES', default=[]):
     env.read_env(f'conf/env/{env_file}')
@@ -69,6 +72,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'core.middleware.PrefixUrlMiddleware',
+    'core.middleware.UpstreamDeadlineMiddleware',
+    'core.middleware.StaleDataMiddleware',
+    'core.middleware.RequestCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'directory_sso_api_client.middleware.AuthenticationMiddleware',
@@ -97,6 +103,7 @@ TEMPLATES = [
                 'directory_components.context_processors.analytics',
                 'directory_components.context_processors.feature_flags',
                 'directory_components.context_processors.cookie_notice',
+                'core.context_processors.stale_data',
             ]
         },
     }
@@ -112,13 +119,75 @@ if 'redis' in VCAP_SERVICES:
 else:
     REDIS_URL = env.str('REDIS_URL')
 
-cache = {
-    'BACKEND': 'django_redis.cache.RedisCache',
-    'LOCATION': REDIS_URL,
-    'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
-}
+# Each Redis cache has its own connection pool, so large api_fallback writes don't
+# hold up the latency sensitive lookups of the default cache. <NAME>_REDIS_URL can
+# point a cache at another Redis database or instance. A pool's connections are
+# shared by the threads of a process; once all are in use a thread waits up to
+# <NAME>_REDIS_POOL_TIMEOUT seconds for one.
+DJANGO_REDIS_CONNECTION_FACTORY = 'core.cache_backends.ConnectionFactory'
+
+
+def get_redis_cache(name, socket_timeout, max_connections, compress=True):
+    options = {
+        'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        'POOL_NAME': name.lower(),
+        'SOCKET_CONNECT_TIMEOUT': env.float(f'{name}_REDIS_SOCKET_CONNECT_TIMEOUT', 1),
+        'SOCKET_TIMEOUT': env.float(f'{name}_REDIS_SOCKET_TIMEOUT', socket_timeout),
+        'CONNECTION_POOL_CLASS': 'redis.connection.BlockingConnectionPool',
+        'CONNECTION_POOL_KWARGS': {
+            'max_connections': env.int(f'{name}_REDIS_MAX_CONNECTIONS', max_connections),
+            'timeout': env.float(f'{name}_REDIS_POOL_TIMEOUT', 1),
+            'health_check_interval': env.int(f'{name}_REDIS_HEALTH_CHECK_INTERVAL', 30),
+        },
+    }
+    if compress:
+        options.update(
+            {
+                'COMPRESSOR': 'core.cache_backends.ZlibCompressor',
+                'COMPRESS_MIN_LENGTH': env.int('CACHE_COMPRESS_MIN_LENGTH', 512),
+                'COMPRESS_LEVEL': env.int('CACHE_COMPRESS_LEVEL', 6),
+            }
+        )
+    return {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': env.str(f'{name}_REDIS_URL', REDIS_URL),
+        'OPTIONS': options,
+    }
+
 
-CACHES = {'default': cache, 'api_fallback': cache}
+# hot values that rarely change, such as Companies House profiles, are also kept in process for a few seconds
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'LOCATION': 'redis',
+        'OPTIONS': {
+            'LOCAL_KEY_PREFIXES': env.list(
+                'CACHE_LOCAL_KEY_PREFIXES', default=['COMPANY_PROFILE-', 'COMPANY_PROFILE_PARTIAL-']
+            ),
+            'LOCAL_TIMEOUT': env.int('CACHE_LOCAL_TIMEOUT_SECONDS', 5),
+            'LOCAL_MAX_ENTRIES': env.int('CACHE_LOCAL_MAX_ENTRIES', 1000),
+        },
+    },
+    'redis': get_redis_cache('CACHE', socket_timeout=1, max_connections=50),
+    # only entries worth keeping through an outage are written to the fallback cache: by
+    # default shared public pages and the circuit breakers' last-known-good data, at most
+    # once every API_FALLBACK_WRITE_MIN_INTERVAL_SECONDS per entry
+    'api_fallback': {
+        'BACKEND': 'core.cache_backends.FallbackPolicyCache',
+        'LOCATION': 'api_fallback_redis',
+        'OPTIONS': {
+            'WRITE_KEY_PATTERNS': env.list(
+                'API_FALLBACK_WRITE_KEY_PATTERNS', default=['/public/*', 'LAST_KNOWN_GOOD-*']
+            ),
+            'WRITE_MIN_INTERVAL': env.int('API_FALLBACK_WRITE_MIN_INTERVAL_SECONDS', 60 * 10),
+            'MAX_VALUE_SIZE': env.int('API_FALLBACK_MAX_VALUE_SIZE', 256 * 1024),
+        },
+    },
+    'api_fallback_redis': get_redis_cache('API_FALLBACK', socket_timeout=5, max_connections=10),
+    # files uploaded part way through a wizard. Kept apart so a few megabytes of image don't hold
+    # up the connections other requests are waiting on, and not compressed as images already are
+    'wizard_files': get_redis_cache('WIZARD_FILES', socket_timeout=10, max_connections=10, compress=False),
+}
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.9/topics/i18n/
@@ -167,6 +236,15 @@ elif STORAGE_CLASS_NAME == 'default':
 else:
     raise NotImplementedError()
 
+# files uploaded part way through a wizard, kept until the wizard is done. They are
+# kept in the cache so any instance can serve the next step.
+# core.storage.TemporaryFileSystemStorage keeps them on local disk instead, which
+# only works when the service runs on a single instance
+WIZARD_FILE_STORAGE = env.str('WIZARD_FILE_STORAGE', 'core.storage.CacheStorage')
+WIZARD_FILE_STORAGE_LOCATION = env.str('WIZARD_FILE_STORAGE_LOCATION', '')
+WIZARD_FILE_STORAGE_CACHE = env.str('WIZARD_FILE_STORAGE_CACHE', 'wizard_files')
+WIZARD_FILE_STORAGE_TTL_SECONDS = env.int('WIZARD_FILE_STORAGE_TTL_SECONDS', 60 * 60 * 3)
+
 # Logging for development
 if DEBUG:
     LOGGING = {
@@ -253,12 +331,51 @@ DIRECTORY_HEALTHCHECK_TOKEN = env.str('HEALTH_CHECK_TOKEN')
 DIRECTORY_HEALTHCHECK_BACKENDS = [
     directory_healthcheck.backends.SingleSignOnBackend,
     directory_healthcheck.backends.APIBackend,
+    core.healthcheck.HTTPTransportBackend,
+    core.healthcheck.BulkheadBackend,
+    core.healthcheck.SSOSessionCacheBackend,
+    core.healthcheck.TwoTierCacheBackend,
+    core.healthcheck.RedisPoolBackend,
+    core.healthcheck.FallbackPolicyBackend,
     # health_check.cache.CacheBackend is also registered in
     # INSTALLED_APPS's health_check.cache
 ]
 
 
-REST_FRAMEWORK = {'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',)}
+REST_FRAMEWORK = {'DEFAULT_RENDERER_CLASSES': ('core.renderers.ORJSONRenderer',)}
+
+# Companies House and postcode typeahead searches
+SEARCH_COMPANIES_HOUSE_MIN_LENGTH = env.int('SEARCH_COMPANIES_HOUSE_MIN_LENGTH', 2)
+SEARCH_POSTCODE_MIN_LENGTH = env.int('SEARCH_POSTCODE_MIN_LENGTH', 5)
+# token bucket per client: burst of SEARCH_THROTTLE_CAPACITY, refilled at SEARCH_THROTTLE_REFILL_RATE per second
+SEARCH_THROTTLE_CAPACITY = env.int('SEARCH_THROTTLE_CAPACITY', 20)
+SEARCH_THROTTLE_REFILL_RATE = env.float('SEARCH_THROTTLE_REFILL_RATE', 2)
+# drop searches superseded by a later keystroke from the same browser. This only saves the
+# upstream calls for keystrokes that arrive within SEARCH_DEBOUNCE_SECONDS: each search sleeps
+# that long in its worker thread first, and a search that is superseded while upstream is
+# answering still runs to completion. Only its result is discarded. Off by default as the
+# sleeping threads cost more than they save unless upstream quota is the scarcer resource
+SEARCH_LATEST_QUERY_WINS = env.bool('SEARCH_LATEST_QUERY_WINS', False)
+SEARCH_DEBOUNCE_SECONDS = env.float('SEARCH_DEBOUNCE_SECONDS', 0.15)
+SEARCH_LATEST_QUERY_TIMEOUT = env.int('SEARCH_LATEST_QUERY_TIMEOUT', 30)
+# fields from search results, kept so the chosen company's status is known without fetching its profile
+COMPANIES_HOUSE_PARTIAL_PROFILE_CACHE_SECONDS = env.int('COMPANIES_HOUSE_PARTIAL_PROFILE_CACHE_SECONDS', 60 * 10)
+
+# Companies House "basic company data" snapshot, built by the ingest_companies_house_snapshot command
+COMPANIES_HOUSE_INDEX_PATH = env.str('COMPANIES_HOUSE_INDEX_PATH', '')
+# the snapshot is published monthly
+COMPANIES_HOUSE_INDEX_MAX_AGE_DAYS = env.int('COMPANIES_HOUSE_INDEX_MAX_AGE_DAYS', 45)
+
+# ONS Postcode Directory, built by the ingest_postcode_directory command
+POSTCODE_INDEX_PATH = env.str('POSTCODE_INDEX_PATH', '')
+
+# Bloom filter of common and breached passwords, built by the build_password_filter command
+PASSWORD_FILTER_PATH = env.str('PASSWORD_FILTER_PATH', '')
+
+# enrolment
+ENROLMENT_PREFETCH_ENABLED = env.bool('ENROLMENT_PREFETCH_ENABLED', True)
+ENROLMENT_PREFETCH_MAX_WORKERS = env.int('ENROLMENT_PREFETCH_MAX_WORKERS', 4)
+ENROLMENT_IS_ENROLLED_CACHE_SECONDS = env.int('ENROLMENT_IS_ENROLLED_CACHE_SECONDS', 60 * 5)
 
 # Google captcha
 RECAPTCHA_PUBLIC_KEY = env.str('RECAPTCHA_PUBLIC_KEY')
@@ -306,6 +423,56 @@ DIRECTORY_API_CLIENT_API_KEY = env.str('DIRECTORY_API_CLIENT_API_KEY')
 DIRECTORY_API_CLIENT_SENDER_ID = env.str('DIRECTORY_API_CLIENT_SENDER_ID', 'directory')
 DIRECTORY_API_CLIENT_DEFAULT_TIMEOUT = env.str('DIRECTORY_API_CLIENT_DEFAULT_TIMEOUT', 15)
 
+# HTTP transport shared by all upstream clients. HTTP_TRANSPORT_HOSTS overrides
+# the defaults per host e.g., {"api.getaddress.io": {"pool_maxsize": 4, "timeout": 5}}.
+# max_concurrency caps the threads of a process waiting on the host at once;
+# further calls are rejected immediately rather than queued.
+HTTP_TRANSPORT_POOL_CONNECTIONS = env.int('HTTP_TRANSPORT_POOL_CONNECTIONS', 10)
+HTTP_TRANSPORT_POOL_MAXSIZE = env.int('HTTP_TRANSPORT_POOL_MAXSIZE', 10)
+HTTP_TRANSPORT_MAX_RETRIES = env.int('HTTP_TRANSPORT_MAX_RETRIES', 0)
+HTTP_TRANSPORT_BACKOFF_FACTOR = env.float('HTTP_TRANSPORT_BACKOFF_FACTOR', 0.1)
+HTTP_TRANSPORT_HOSTS = env.json(
+    'HTTP_TRANSPORT_HOSTS',
+    {
+        'api.getaddress.io': {'max_concurrency': 4},
+        urlparse(EXPORTING_OPPORTUNITIES_API_BASE_URL).netloc.lower(): {'max_concurrency': 4},
+    },
+)
+# total time a request may spend on upstream calls, overridden per url name
+# e.g., {"api:postcode-search": 5, "business-profile": 10}
+UPSTREAM_DEADLINE_SECONDS = env.float('UPSTREAM_DEADLINE_SECONDS', 20)
+UPSTREAM_DEADLINE_URL_BUDGETS = env.json('UPSTREAM_DEADLINE_URL_BUDGETS', {})
+
+# dashboard reads stop calling an upstream endpoint that keeps failing, showing
+# the last-known-good data from the api_fallback cache until it recovers
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.int('CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5)
+CIRCUIT_BREAKER_WINDOW_SECONDS = env.int('CIRCUIT_BREAKER_WINDOW_SECONDS', 60)
+CIRCUIT_BREAKER_OPEN_SECONDS = env.int('CIRCUIT_BREAKER_OPEN_SECONDS', 30)
+
+# directory-api reads that opt in are hedged with a second request if the first
+# is slower than the p90 of the last HEDGED_REQUESTS_LATENCY_WINDOW requests
+HEDGED_REQUESTS_ENABLED = env.bool('HEDGED_REQUESTS_ENABLED', False)
+HEDGED_REQUESTS_MAX_RATE = env.float('HEDGED_REQUESTS_MAX_RATE', 0.05)
+HEDGED_REQUESTS_MAX_WORKERS = env.int('HEDGED_REQUESTS_MAX_WORKERS', 20)
+HEDGED_REQUESTS_LATENCY_WINDOW = env.int('HEDGED_REQUESTS_LATENCY_WINDOW', 500)
+HEDGED_REQUESTS_MIN_SAMPLES = env.int('HEDGED_REQUESTS_MIN_SAMPLES', 50)
+
+# Identical concurrent upstream GETs are coalesced into one request. Optionally
+# across processes using a lock in the cache and a short-lived shared result.
+SINGLE_FLIGHT_ENABLED = env.bool('SINGLE_FLIGHT_ENABLED', True)
+SINGLE_FLIGHT_ACROSS_PROCESSES = env.bool('SINGLE_FLIGHT_ACROSS_PROCESSES', False)
+SINGLE_FLIGHT_LOCK_TIMEOUT = env.int('SINGLE_FLIGHT_LOCK_TIMEOUT', 15)
+SINGLE_FLIGHT_RESULT_TIMEOUT = env.int('SINGLE_FLIGHT_RESULT_TIMEOUT', 2)
+
+# company and collaborator payloads kept for revalidating with conditional requests
+CONDITIONAL_REQUEST_CACHE_SECONDS = env.int('CONDITIONAL_REQUEST_CACHE_SECONDS', 60 * 60 * 24)
+# the company returned by an update is used without revalidating for this long
+COMPANY_WRITE_THROUGH_FRESH_SECONDS = env.int('COMPANY_WRITE_THROUGH_FRESH_SECONDS', 60)
+# company membership kept in the session for the authorization checks
+MEMBERSHIP_CLAIMS_TTL_SECONDS = env.int('MEMBERSHIP_CLAIMS_TTL_SECONDS', 60 * 5)
+# how long the case study edit wizard keeps the case study it is editing
+CASE_STUDY_CACHE_SECONDS = env.int('CASE_STUDY_CACHE_SECONDS', 60 * 30)
+
 # directory client core
 DIRECTORY_CLIENT_CORE_CACHE_EXPIRE_SECONDS = 60 * 60 * 24 * 30  # 30 days
 
@@ -321,7 +488,10 @@ VALIDATOR_MAX_CASE_STUDY_VIDEO_SIZE_BYTES = env.int('VALIDATOR_MAX_CASE_STUDY_VI
 
 AUTH_USER_MODEL = 'sso.SSOUser'
 
-AUTHENTICATION_BACKENDS = ['directory_sso_api_client.backends.SSOUserBackend']
+AUTHENTICATION_BACKENDS = ['core.backends.CachedSSOUserBackend']
+
+# short, as the cached user is only invalidated by changes made through this service
+SSO_SESSION_CACHE_SECONDS = env.int('SSO_SESSION_CACHE_SECONDS', 30)
 
 
 # Directory Components
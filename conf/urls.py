@@ -1,32 +1,48 @@
+import functools
 import profile.business_profile.views
 import profile.exops.views
 import profile.personal_profile.views
 import profile.soo.views
 
 import directory_healthcheck.views
-from directory_constants import urls
+from directory_constants import urls, user_roles
 from django.conf.urls import include, url
-from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic import RedirectView
 
+import core.helpers
 import core.views
 import enrolment.views
 
 
+def membership_claims_pass_test(test_func):
+    # like user_passes_test, but given the session's membership claims so no upstream calls are made
+    def decorator(function):
+        @functools.wraps(function)
+        def inner(request, *args, **kwargs):
+            if test_func(core.helpers.get_membership_claims(request)):
+                return function(request, *args, **kwargs)
+            return redirect('business-profile')
+
+        return inner
+
+    return decorator
+
+
 def no_company_required(function):
-    url = reverse_lazy('business-profile')
-    inner = user_passes_test(lambda user: not bool(getattr(user, 'company', None)), url, None)
+    inner = membership_claims_pass_test(lambda claims: not claims['has_company'])
     return inner(function)
 
 
 def company_required(function):
-    inner = user_passes_test(lambda user: bool(user.company), reverse_lazy('business-profile'), None)
+    inner = membership_claims_pass_test(lambda claims: claims['has_company'])
     return login_required(inner(function))
 
 
 def company_admin_required(function):
-    inner = user_passes_test(lambda user: user.is_company_admin, reverse_lazy('business-profile'), None)
+    inner = membership_claims_pass_test(lambda claims: claims['role'] == user_roles.ADMIN)
     return login_required(inner(function))
 
 
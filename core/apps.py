@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from directory_api_client import api_client
+        from directory_ch_client import ch_search_api_client
+        from directory_forms_api_client.client import forms_api_client
+        from directory_sso_api_client import sso_api_client
+
+        from core import backends  # noqa: F401 connects the logout receiver
+        from core import transport
+
+        for client in [api_client, sso_api_client, ch_search_api_client, forms_api_client]:
+            transport.install(client)
@@ -0,0 +1,57 @@
+import collections
+import threading
+
+from directory_sso_api_client.backends import SSOUserBackend
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.dispatch import receiver
+
+from core import helpers
+from core.request_cache import cache
+
+
+class CachedSSOUserBackend(SSOUserBackend):
+    """Cache the SSO session user payload for a short time.
+
+    Every request resolves the SSO session cookie, so without this each page
+    view costs a round trip to SSO before any view code runs.
+
+    """
+
+    lock = threading.Lock()
+    stats = collections.Counter()
+
+    def get_user(self, session_id):
+        cache_key = helpers.get_session_cache_key(helpers.CACHE_KEY_SSO_SESSION_USER, session_id)
+        parsed = cache.get(cache_key)
+        if parsed is not None:
+            self.record('hits')
+            SSOUser = get_user_model()
+            return SSOUser(**self.user_kwargs(session_id=session_id, parsed=parsed))
+        self.record('misses')
+        user = super().get_user(session_id)
+        if user is None:
+            cache.delete(cache_key)
+        return user
+
+    def build_user(self, session_id, response):
+        parsed = response.json()
+        cache.set(
+            helpers.get_session_cache_key(helpers.CACHE_KEY_SSO_SESSION_USER, session_id),
+            parsed,
+            timeout=settings.SSO_SESSION_CACHE_SECONDS,
+        )
+        SSOUser = get_user_model()
+        return SSOUser(**self.user_kwargs(session_id=session_id, parsed=parsed))
+
+    @classmethod
+    def record(cls, name):
+        with cls.lock:
+            cls.stats[name] += 1
+
+
+@receiver(user_logged_out)
+def invalidate_session_user(sender, user, **kwargs):
+    if user is not None and getattr(user, 'session_id', None):
+        helpers.invalidate_sso_session_user(user.session_id)
@@ -0,0 +1,380 @@
+import collections
+import fnmatch
+import pickle
+import threading
+import time
+import zlib
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django_redis.compressors.base import BaseCompressor
+from django_redis.exceptions import CompressorError
+from django_redis.pool import ConnectionFactory as BaseConnectionFactory
+from redis.connection import BlockingConnectionPool
+from redis.exceptions import RedisError
+
+MISSING = object()
+INVALIDATE_ALL = '*'
+
+
+class LocalTier:
+    """The in-process copies of a TwoTierCache and what is needed to keep them current."""
+
+    def __init__(self):
+        self.local = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.subscriber = None
+        self.stats = collections.Counter()
+
+
+class CacheWrapper(BaseCache):
+    """Passes everything through to the cache whose alias is LOCATION, for subclasses to add to."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.remote_alias = location
+
+    def __getattr__(self, name):
+        # backend specific extras such as django_redis's `lock`, `ttl` and `client`
+        if name.startswith('_') or name == 'remote_alias':
+            raise AttributeError(name)
+        return getattr(self.remote, name)
+
+    @property
+    def remote(self):
+        return caches[self.remote_alias]
+
+    def get(self, key, default=None, version=None):
+        return self.remote.get(key, default, version=version)
+
+    def get_many(self, keys, version=None):
+        return self.remote.get_many(keys, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.set_many(data, timeout=timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.add(key, value, timeout=timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.remote.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.remote.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.remote.has_key(key, version=version)  # noqa: W601
+
+    def incr(self, key, delta=1, version=None):
+        return self.remote.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.remote.decr(key, delta, version=version)
+
+    def clear(self):
+        self.remote.clear()
+
+
+class TwoTierCache(CacheWrapper):
+    """A small in-process LRU in front of another cache, for hot values that rarely change.
+
+    LOCATION is the alias of the cache behind it. Only keys starting with one
+    of OPTIONS['LOCAL_KEY_PREFIXES'] are kept in process, for at most
+    OPTIONS['LOCAL_TIMEOUT'] seconds, and at most OPTIONS['LOCAL_MAX_ENTRIES']
+    of them. Everything else goes straight through, so locks, counters and
+    per-user values behave exactly as before.
+
+    When the cache behind it is Redis, writes to local keys are published on
+    OPTIONS['INVALIDATION_CHANNEL'] so every worker drops its copy, and the
+    local TTL only bounds how stale a copy can get if a message is missed.
+
+    """
+
+    # Django creates an instance per thread, so the in-process tier is kept here to be shared by them
+    tiers = {}
+    tiers_lock = threading.Lock()
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        options = params.get('OPTIONS', {})
+        self.local_key_prefixes = tuple(options.get('LOCAL_KEY_PREFIXES', []))
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self.invalidation_channel = options.get('INVALIDATION_CHANNEL', 'cache-invalidation')
+        with self.tiers_lock:
+            self.tier = self.tiers.setdefault((location, self.invalidation_channel), LocalTier())
+        self.local, self.lock, self.stats = self.tier.local, self.tier.lock, self.tier.stats
+
+    def get_redis_connection(self):
+        client = getattr(self.remote, 'client', None)
+        if client is None or not hasattr(client, 'get_client'):
+            return None
+        return client.get_client(write=True)
+
+    def is_local(self, key):
+        return bool(self.local_key_prefixes) and isinstance(key, str) and key.startswith(self.local_key_prefixes)
+
+    def get_local_key(self, key, version):
+        return self.remote.make_key(key, version=version)
+
+    def start_subscriber(self):
+        """Listen for invalidations from other workers, returning whether copies can be kept in process."""
+
+        with self.lock:
+            if self.tier.subscriber is False or (self.tier.subscriber is not None and self.tier.subscriber.is_alive()):
+                return True
+            if self.tier.subscriber is not None:
+                # the connection dropped, so invalidations may have been missed
+                self.local.clear()
+                self.tier.subscriber = None
+            connection = self.get_redis_connection()
+            if connection is None:
+                # not shared between processes, so there is nothing to hear about
+                self.tier.subscriber = False
+                return True
+            try:
+                pubsub = connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.invalidation_channel: self.handle_invalidation})
+            except RedisError:
+                # without invalidations a copy could outlive a write, so none are kept; tried again next time
+                return False
+            self.tier.subscriber = pubsub.run_in_thread(sleep_time=1, daemon=True)
+            return True
+
+    def handle_invalidation(self, message):
+        data = message['data']
+        if isinstance(data, bytes):
+            data = data.decode()
+        with self.lock:
+            for local_key in data.split('\n'):
+                if local_key == INVALIDATE_ALL:
+                    self.local.clear()
+                else:
+                    self.local.pop(local_key, None)
+
+    def invalidate(self, local_keys):
+        if not local_keys:
+            return
+        # one message for all the keys, as a set_many can write many of them. Keys made by
+        # make_key have no newlines, as Django warns about control characters in keys
+        data = '\n'.join(local_keys)
+        self.handle_invalidation({'data': data})
+        connection = self.get_redis_connection()
+        if connection is not None:
+            connection.publish(self.invalidation_channel, data)
+
+    def get_local(self, local_key):
+        with self.lock:
+            entry = self.local.get(local_key)
+            if entry is None:
+                return MISSING
+            expires, pickled = entry
+            if expires < time.monotonic():
+                del self.local[local_key]
+                return MISSING
+            self.local.move_to_end(local_key)
+        # kept pickled so callers can't change the copy other threads are given
+        return pickle.loads(pickled)
+
+    def set_local(self, local_key, value):
+        if not self.start_subscriber():
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.local[local_key] = (time.monotonic() + self.local_timeout, pickled)
+            self.local.move_to_end(local_key)
+            while len(self.local) > self.local_max_entries:
+                self.local.popitem(last=False)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        local_keys = {}
+        for key in keys:
+            if self.is_local(key):
+                local_keys[key] = self.get_local_key(key, version)
+                value = self.get_local(local_keys[key])
+                if value is not MISSING:
+                    found[key] = value
+        self.stats['local_hits'] += len(found)
+        remaining = [key for key in keys if key not in found]
+        if remaining:
+            remote_found = self.remote.get_many(remaining, version=version)
+            self.stats['remote_hits'] += len(remote_found)
+            self.stats['misses'] += len(remaining) - len(remote_found)
+            for key, value in remote_found.items():
+                if key in local_keys:
+                    self.set_local(local_keys[key], value)
+            found.update(remote_found)
+        return found
+
+    def invalidate_keys(self, keys, version=None):
+        self.invalidate([self.get_local_key(key, version) for key in keys if self.is_local(key)])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout=timeout, version=version)
+        self.invalidate_keys([key], version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.remote.set_many(data, timeout=timeout, version=version)
+        self.invalidate_keys(data, version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.remote.add(key, value, timeout=timeout, version=version)
+        if added:
+            self.invalidate_keys([key], version=version)
+        return added
+
+    def delete(self, key, version=None):
+        self.remote.delete(key, version=version)
+        self.invalidate_keys([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        self.remote.delete_many(keys, version=version)
+        self.invalidate_keys(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if not self.is_local(key):
+            return self.remote.has_key(key, version=version)  # noqa: W601
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def incr(self, key, delta=1, version=None):
+        value = self.remote.incr(key, delta, version=version)
+        self.invalidate_keys([key], version=version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self.remote.clear()
+        self.invalidate([INVALIDATE_ALL])
+
+
+class FallbackPolicyCache(CacheWrapper):
+    """Decides which writes to the api_fallback cache are worth making.
+
+    directory-client-core stores every successful response it fetches with
+    `use_fallback_cache`, some of them large and only of use to one user. A
+    write is only made when the key matches one of
+    OPTIONS['WRITE_KEY_PATTERNS'], the value is no bigger than
+    OPTIONS['MAX_VALUE_SIZE'] bytes, and the key was not written in the last
+    OPTIONS['WRITE_MIN_INTERVAL'] seconds. Any copy already stored is left as
+    it is, so fallbacks keep working.
+
+    """
+
+    key_prefix_written = 'FALLBACK_WRITTEN'
+    # shared by the instances Django creates for each thread
+    stats_by_location = collections.defaultdict(collections.Counter)
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        options = params.get('OPTIONS', {})
+        self.write_key_patterns = options.get('WRITE_KEY_PATTERNS', ['*'])
+        self.write_min_interval = options.get('WRITE_MIN_INTERVAL', 0)
+        self.max_value_size = options.get('MAX_VALUE_SIZE', 0)
+        self.stats = self.stats_by_location[location]
+
+    def get_size(self, value):
+        if isinstance(value, (bytes, str)):
+            return len(value)
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def should_write(self, key, value, version):
+        if not any(fnmatch.fnmatchcase(key, pattern) for pattern in self.write_key_patterns):
+            reason = 'skipped_not_allowed'
+        elif self.max_value_size and self.get_size(value) > self.max_value_size:
+            reason = 'skipped_too_large'
+        elif self.write_min_interval and not self.remote.add(
+            f'{self.key_prefix_written}-{key}', True, timeout=self.write_min_interval, version=version
+        ):
+            reason = 'skipped_recently_written'
+        else:
+            reason = 'written'
+        self.stats[reason] += 1
+        return reason == 'written'
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.should_write(key, value, version):
+            self.remote.set(key, value, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {key: value for key, value in data.items() if self.should_write(key, value, version)}
+        if not data:
+            return []
+        return self.remote.set_many(data, timeout=timeout, version=version)
+
+
+class ZlibCompressor(BaseCompressor):
+    """Compresses cached values of at least OPTIONS['COMPRESS_MIN_LENGTH'] bytes for django_redis.
+
+    Smaller values are stored as they are, as compressing them costs more
+    than it saves. Values that were stored uncompressed, including those
+    written before compression was turned on, still read back as normal.
+
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = options.get('COMPRESS_MIN_LENGTH', 512)
+        self.level = options.get('COMPRESS_LEVEL', 6)
+
+    def compress(self, value):
+        if len(value) < self.min_length:
+            return value
+        compressed = zlib.compress(value, self.level)
+        return compressed if len(compressed) < len(value) else value
+
+    def decompress(self, value):
+        try:
+            return zlib.decompress(value)
+        except zlib.error as error:
+            # django_redis then reads the value as it is
+            raise CompressorError(error)
+
+
+class ConnectionFactory(BaseConnectionFactory):
+    """Gives each Redis cache with a POOL_NAME option a connection pool of its own.
+
+    django_redis shares one pool between every cache with the same URL,
+    whatever their other options, so a slow cache could use up the
+    connections a fast one needs.
+
+    """
+
+    # pool name and url to pool, kept for the life of the process as in django_redis
+    _pools = {}
+
+    def get_or_create_connection_pool(self, params):
+        key = (self.options.get('POOL_NAME'), params['url'])
+        if key not in self._pools:
+            self._pools[key] = self.get_connection_pool(params)
+        return self._pools[key]
+
+    @classmethod
+    def stats(cls):
+        stats = {}
+        for (name, _), pool in list(cls._pools.items()):
+            if isinstance(pool, BlockingConnectionPool):
+                created = len(pool._connections)
+                idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+            else:
+                created = pool._created_connections
+                idle = len(pool._available_connections)
+            stats[name or 'shared'] = {
+                'max_connections': pool.max_connections,
+                'created': created,
+                'in_use': created - idle,
+                'socket_timeout': pool.connection_kwargs.get('socket_timeout'),
+            }
+        return stats
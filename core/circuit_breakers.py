@@ -0,0 +1,112 @@
+import contextvars
+import time
+
+from django.conf import settings
+from requests.exceptions import HTTPError, RequestException
+
+from core import request_cache, transport
+from core.request_cache import cache
+
+CACHE_KEY_FAILURES = 'CIRCUIT_BREAKER_FAILURES'
+CACHE_KEY_OPEN = 'CIRCUIT_BREAKER_OPEN'
+CACHE_KEY_LAST_KNOWN_GOOD = 'LAST_KNOWN_GOOD'
+
+# names of the breakers that served last-known-good data to the current request
+served_stale = contextvars.ContextVar('served_stale', default=frozenset())
+
+
+class CircuitBreakerOpen(RequestException):
+    pass
+
+
+def is_local_rejection(error):
+    # raised by this process before or instead of waiting on the upstream, so they say nothing about its health
+    return isinstance(error, (transport.BulkheadFull, transport.DeadlineExceeded))
+
+
+def is_upstream_failure(error):
+    # 4xx responses are answers, not signs that the upstream is unhealthy
+    if is_local_rejection(error):
+        return False
+    return not isinstance(error, HTTPError) or error.response is None or error.response.status_code >= 500
+
+
+class CircuitBreaker:
+    """Stops calling an upstream endpoint that keeps failing, serving its last-known-good result instead.
+
+    The state is kept in the default cache so every process shares it. After
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD failures within
+    CIRCUIT_BREAKER_WINDOW_SECONDS the breaker opens for
+    CIRCUIT_BREAKER_OPEN_SECONDS, during which no calls are attempted. The
+    first call after that is a trial: one more failure opens it again.
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.failures_key = f'{CACHE_KEY_FAILURES}-{name}'
+        self.open_key = f'{CACHE_KEY_OPEN}-{name}'
+
+    @property
+    def cache_keys(self):
+        return [self.failures_key, self.open_key]
+
+    def get_state(self):
+        state = cache.get_many(self.cache_keys)
+        return state.get(self.failures_key, 0), self.open_key in state
+
+    def is_open(self):
+        return self.get_state()[1]
+
+    def record_failure(self):
+        if cache.add(self.failures_key, 1, timeout=settings.CIRCUIT_BREAKER_WINDOW_SECONDS):
+            failures = 1
+        else:
+            failures = cache.incr(self.failures_key)
+        if failures >= settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+            cache.set(self.open_key, time.time(), timeout=settings.CIRCUIT_BREAKER_OPEN_SECONDS)
+            # kept one short of the threshold, so a failed trial call opens the breaker again
+            cache.set(
+                self.failures_key,
+                settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD - 1,
+                timeout=settings.CIRCUIT_BREAKER_OPEN_SECONDS + settings.CIRCUIT_BREAKER_WINDOW_SECONDS,
+            )
+
+    def call(self, func, fallback_key):
+        """Return func's result, keeping it as the last-known-good result for the key.
+
+        While the breaker is open, or if the call fails, the last-known-good
+        result is returned instead and the request is marked as showing stale
+        data. Raises if there is none. Bulkhead rejections and this request's
+        deadline running out are served the same way, but are not counted as
+        failures of the upstream.
+
+        """
+
+        fallback_cache = request_cache.get_cache('api_fallback')
+        fallback_key = f'{CACHE_KEY_LAST_KNOWN_GOOD}-{self.name}-{fallback_key}'
+        failures, is_open = self.get_state()
+        if is_open:
+            last_known_good = fallback_cache.get(fallback_key)
+            if last_known_good is None:
+                raise CircuitBreakerOpen(f'The circuit breaker for {self.name} is open')
+        else:
+            try:
+                result = func()
+            except RequestException as error:
+                if is_upstream_failure(error):
+                    self.record_failure()
+                elif not is_local_rejection(error):
+                    raise
+                last_known_good = fallback_cache.get(fallback_key)
+                if last_known_good is None:
+                    raise
+            else:
+                if failures:
+                    cache.delete(self.failures_key)
+                fallback_cache.set(
+                    fallback_key, {'result': result}, timeout=settings.DIRECTORY_CLIENT_CORE_CACHE_EXPIRE_SECONDS
+                )
+                return result
+        served_stale.set(served_stale.get() | {self.name})
+        return last_known_good['result']
@@ -0,0 +1,165 @@
+import csv
+import datetime
+import io
+import os
+import sqlite3
+import zipfile
+
+import orjson
+from django.conf import settings
+
+from core import reloading
+
+SNAPSHOT_DATE_FORMAT = '%d/%m/%Y'
+# statuses in the bulk data that the API reports differently
+STATUSES = {
+    'active - proposal to strike off': 'active',
+    'live but receiver manager on at least one charge': 'receivership',
+}
+
+
+def normalise_name(name):
+    return ' '.join(name.upper().split())
+
+
+def parse_date(value):
+    if value:
+        return datetime.datetime.strptime(value, SNAPSHOT_DATE_FORMAT).date().isoformat()
+
+
+def parse_row(row):
+    """Convert a row of the "basic company data" snapshot to the shape of a Companies House profile."""
+
+    address = {
+        'care_of': row['RegAddress.CareOf'],
+        'po_box': row['RegAddress.POBox'],
+        'address_line_1': row['RegAddress.AddressLine1'],
+        'address_line_2': row['RegAddress.AddressLine2'],
+        'locality': row['RegAddress.PostTown'],
+        'region': row['RegAddress.County'],
+        'country': row['RegAddress.Country'],
+        'postal_code': row['RegAddress.PostCode'],
+    }
+    status = row['CompanyStatus'].strip().lower()
+    return {
+        'company_number': row['CompanyNumber'],
+        'company_name': row['CompanyName'],
+        'company_status': STATUSES.get(status, status.replace(' ', '-')),
+        'date_of_creation': parse_date(row['IncorporationDate']),
+        'sic_codes': [
+            row[f'SICCode.SicText_{i}'].split(' - ')[0]
+            for i in range(1, 5)
+            if row.get(f'SICCode.SicText_{i}') and row[f'SICCode.SicText_{i}'] != 'None Supplied'
+        ],
+        'registered_office_address': {key: value for key, value in address.items() if value},
+    }
+
+
+def to_search_result(profile):
+    # the shape of an item returned by the Companies House search API
+    address = profile['registered_office_address']
+    return {
+        'company_number': profile['company_number'],
+        'title': profile['company_name'],
+        'company_status': profile['company_status'],
+        'date_of_creation': profile['date_of_creation'],
+        'address': address,
+        'address_snippet': ', '.join(
+            address[name] for name in ['address_line_1', 'address_line_2', 'locality', 'postal_code'] if name in address
+        ),
+    }
+
+
+def open_snapshot(path):
+    # the snapshot is published as a zip containing a single csv
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        return io.TextIOWrapper(archive.open(archive.namelist()[0]), encoding='utf-8-sig', newline='')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+def build_index(snapshot_path, index_path, snapshot_date, batch_size=10000):
+    """Stream the snapshot into a new SQLite index, then swap it in place of the old one.
+
+    Returns the number of companies indexed.
+
+    """
+
+    temp_path = f'{index_path}.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    connection.executescript('''
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE company (number TEXT PRIMARY KEY, name_key TEXT, profile BLOB) WITHOUT ROWID;
+        ''')
+    count = 0
+    with open_snapshot(snapshot_path) as snapshot:
+        reader = csv.reader(snapshot)
+        # some of the snapshot's column names have leading spaces
+        fieldnames = [name.strip() for name in next(reader)]
+        batch = []
+        for values in reader:
+            profile = parse_row(dict(zip(fieldnames, values)))
+            batch.append((profile['company_number'], normalise_name(profile['company_name']), orjson.dumps(profile)))
+            if len(batch) == batch_size:
+                connection.executemany('INSERT OR REPLACE INTO company VALUES (?, ?, ?)', batch)
+                count += len(batch)
+                batch = []
+        connection.executemany('INSERT OR REPLACE INTO company VALUES (?, ?, ?)', batch)
+        count += len(batch)
+    connection.execute('CREATE INDEX company_name_key ON company (name_key)')
+    connection.execute('INSERT INTO meta VALUES (?, ?)', ('snapshot_date', snapshot_date.isoformat()))
+    connection.commit()
+    connection.close()
+    os.replace(temp_path, index_path)
+    return count
+
+
+def connect(path):
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+class CompaniesHouseIndex:
+    """Read-only lookups against the index built from the Companies House snapshot.
+
+    Everything returns None when the index is not configured, missing, or
+    older than COMPANIES_HOUSE_INDEX_MAX_AGE_DAYS, so callers fall back to
+    the Companies House API.
+
+    """
+
+    def __init__(self):
+        self.file = reloading.ReloadingFile(
+            'COMPANIES_HOUSE_INDEX_PATH', load=connect, close=sqlite3.Connection.close, per_thread=True
+        )
+
+    def is_fresh(self, connection):
+        row = connection.execute('SELECT value FROM meta WHERE key = ?', ('snapshot_date',)).fetchone()
+        snapshot_date = datetime.date.fromisoformat(row[0])
+        max_age = datetime.timedelta(days=settings.COMPANIES_HOUSE_INDEX_MAX_AGE_DAYS)
+        return datetime.date.today() - snapshot_date <= max_age
+
+    def get_profile(self, number):
+        with self.file.open() as connection:
+            if connection is None or not self.is_fresh(connection):
+                return None
+            row = connection.execute('SELECT profile FROM company WHERE number = ?', (number,)).fetchone()
+        if row:
+            return orjson.loads(row[0])
+
+    def search(self, query, limit=20):
+        prefix = normalise_name(query)
+        with self.file.open() as connection:
+            if connection is None or not self.is_fresh(connection):
+                return None
+            rows = connection.execute(
+                'SELECT profile FROM company WHERE name_key >= ? AND name_key < ? ORDER BY name_key LIMIT ?',
+                (prefix, prefix + '\uffff', limit),
+            ).fetchall()
+        return [to_search_result(orjson.loads(row[0])) for row in rows]
+
+
+index = CompaniesHouseIndex()
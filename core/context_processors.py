@@ -0,0 +1,6 @@
+from core import circuit_breakers
+
+
+def stale_data(request):
+    # a callable, as the data may first be retrieved while the template renders
+    return {'is_data_stale': lambda: bool(circuit_breakers.served_stale.get())}
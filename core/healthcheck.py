@@ -0,0 +1,133 @@
+from health_check.backends import BaseHealthCheckBackend
+
+
+class HTTPTransportBackend(BaseHealthCheckBackend):
+    """Reports connection pool usage per upstream host. Never fails."""
+
+    critical_service = False
+
+    def check_status(self):
+        from core import transport
+
+        self.stats = transport.registry.stats()
+        return True
+
+    def pretty_status(self):
+        if not self.stats:
+            return 'no upstream requests yet'
+        return '\n'.join(
+            f'{host}: {s["in_flight"]}/{s["pool_maxsize"]} in flight, peak {s["peak_in_flight"]}, '
+            f'{s["requests"]} requests, {s["saturated"]} saturated'
+            for host, s in sorted(self.stats.items())
+        )
+
+
+class BulkheadBackend(BaseHealthCheckBackend):
+    """Reports how many upstream calls were rejected by each host's bulkhead. Never fails."""
+
+    critical_service = False
+
+    def check_status(self):
+        from core import transport
+
+        self.stats = transport.registry.bulkhead_stats()
+        return True
+
+    def pretty_status(self):
+        if not self.stats:
+            return 'no bulkheaded requests yet'
+        return '\n'.join(
+            f'{host}: {s["in_use"]}/{s["max_concurrency"]} in use, {s["rejected"]} rejected'
+            for host, s in sorted(self.stats.items())
+        )
+
+
+class SSOSessionCacheBackend(BaseHealthCheckBackend):
+    """Reports how many SSO session lookups were served from the cache. Never fails."""
+
+    critical_service = False
+
+    def check_status(self):
+        from core.backends import CachedSSOUserBackend
+
+        self.stats = dict(CachedSSOUserBackend.stats)
+        return True
+
+    def pretty_status(self):
+        hits = self.stats.get('hits', 0)
+        misses = self.stats.get('misses', 0)
+        return f'{hits} SSO calls avoided, {misses} SSO calls made'
+
+
+class TwoTierCacheBackend(BaseHealthCheckBackend):
+    """Reports the hit ratio of each tier of every two-tier cache. Never fails."""
+
+    critical_service = False
+
+    def check_status(self):
+        from django.conf import settings
+        from django.core.cache import caches
+
+        from core.cache_backends import TwoTierCache
+
+        self.stats = {
+            alias: dict(caches[alias].stats) for alias in settings.CACHES if isinstance(caches[alias], TwoTierCache)
+        }
+        return True
+
+    def pretty_status(self):
+        if not self.stats:
+            return 'no two-tier caches'
+        lines = []
+        for alias, s in sorted(self.stats.items()):
+            local_hits, remote_hits, misses = s.get('local_hits', 0), s.get('remote_hits', 0), s.get('misses', 0)
+            lookups = local_hits + remote_hits + misses
+            remote_lookups = remote_hits + misses
+            local_ratio = local_hits / lookups if lookups else 0
+            remote_ratio = remote_hits / remote_lookups if remote_lookups else 0
+            lines.append(
+                f'{alias}: in process {local_ratio:.0%} of {lookups} lookups, '
+                f'remote {remote_ratio:.0%} of {remote_lookups} lookups'
+            )
+        return '\n'.join(lines)
+
+
+class RedisPoolBackend(BaseHealthCheckBackend):
+    """Reports connection usage of each Redis cache's connection pool. Never fails."""
+
+    critical_service = False
+
+    def check_status(self):
+        from core.cache_backends import ConnectionFactory
+
+        self.stats = ConnectionFactory.stats()
+        return True
+
+    def pretty_status(self):
+        if not self.stats:
+            return 'no Redis connections yet'
+        return '\n'.join(
+            f'{name}: {s["in_use"]}/{s["max_connections"]} in use, {s["created"]} open, '
+            f'socket timeout {s["socket_timeout"]}s'
+            for name, s in sorted(self.stats.items())
+        )
+
+
+class FallbackPolicyBackend(BaseHealthCheckBackend):
+    """Reports how many api_fallback cache writes were made and skipped. Never fails."""
+
+    critical_service = False
+
+    def check_status(self):
+        from django.core.cache import caches
+
+        self.stats = dict(getattr(caches['api_fallback'], 'stats', {}))
+        return True
+
+    def pretty_status(self):
+        return (
+            f'{self.stats.get("written", 0)} written, '
+            f'{self.stats.get("skipped_not_allowed", 0)} skipped as not allowed, '
+            f'{self.stats.get("skipped_too_large", 0)} skipped as too large, '
+            f'{self.stats.get("skipped_recently_written", 0)} skipped as recently written'
+        )
@@ -1,10 +1,132 @@
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import orjson
 from directory_api_client.client import api_client
 from directory_constants import user_roles
 from directory_sso_api_client import sso_api_client
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from core import request_cache
+
+CACHE_KEY_SINGLE_FLIGHT_LOCK = 'SINGLE_FLIGHT_LOCK'
+CACHE_KEY_SINGLE_FLIGHT_RESULT = 'SINGLE_FLIGHT_RESULT'
+CACHE_KEY_LATEST_QUERY = 'LATEST_QUERY'
+CACHE_KEY_SSO_SESSION_USER = 'SSO_SESSION_USER'
+CACHE_KEY_COMPANY_PROFILE_PARTIAL = 'COMPANY_PROFILE_PARTIAL'
+CACHE_KEY_MEMBERSHIP_VERSION = 'MEMBERSHIP_VERSION'
+SESSION_KEY_MEMBERSHIP_CLAIMS = 'MEMBERSHIP_CLAIMS'
+
+
+def parse_json(response):
+    # orjson decodes large upstream payloads several times faster than response.json()
+    return orjson.loads(response.content)
+
+
+def get_session_cache_key(prefix, sso_session_id):
+    # the session id is a credential so is not stored in the key as is
+    hashed_session_id = hashlib.sha256(str(sso_session_id).encode()).hexdigest()
+    return f'{prefix}-{hashed_session_id}'
+
+
+def invalidate_sso_session_user(sso_session_id):
+    # through the request's cache, so a copy it read earlier is not written back when the response is ready
+    request_cache.cache.delete(get_session_cache_key(CACHE_KEY_SSO_SESSION_USER, sso_session_id))
+
+
+def get_membership_version_keys(sso_id, company_number):
+    keys = [f'{CACHE_KEY_MEMBERSHIP_VERSION}-USER-{sso_id}']
+    if company_number:
+        keys.append(f'{CACHE_KEY_MEMBERSHIP_VERSION}-COMPANY-{company_number}')
+    return keys
+
+
+def get_membership_version(sso_id, company_number):
+    keys = get_membership_version_keys(sso_id, company_number)
+    versions = cache.get_many(keys)
+    return ':'.join(versions.get(key, '') for key in keys)
+
+
+def invalidate_membership_claims(sso_id=None, company_number=None):
+    """Make the membership claims of the user, or of every member of the company, be rebuilt on next use."""
+
+    # a new random version rather than a counter, so an expired version can never match an old claim
+    keys = get_membership_version_keys(sso_id, company_number)
+    if sso_id is None:
+        keys = keys[1:]
+    cache.set_many({key: secrets.token_hex(4) for key in keys}, timeout=settings.MEMBERSHIP_CLAIMS_TTL_SECONDS)
+
+
+def get_membership_claims(request):
+    """The user's company membership, as needed by the views' authorization checks.
+
+    Kept in the session, which is signed, for MEMBERSHIP_CLAIMS_TTL_SECONDS
+    or until invalidated, so checking them costs no calls to directory-api.
+
+    """
+
+    user = request.user
+    if not user.is_authenticated:
+        return {'has_company': False, 'role': None, 'company_number': None}
+    claims = request.session.get(SESSION_KEY_MEMBERSHIP_CLAIMS)
+    is_current = (
+        claims is not None
+        and claims['sso_id'] == user.id
+        and claims['expires'] > time.time()
+        and claims['version'] == get_membership_version(user.id, claims['company_number'])
+    )
+    if not is_current:
+        # the user's version is read before the upstream calls so an invalidation made meanwhile is not missed
+        user_version = get_membership_version(user.id, None)
+        company = user.company
+        company_number = company.data.get('number') if company else None
+        version = get_membership_version(user.id, company_number)
+        if version.split(':')[0] != user_version:
+            version = None
+        claims = {
+            'sso_id': user.id,
+            'has_company': bool(company),
+            # only members of a company have a supplier record to take the role from
+            'role': user.role if company else None,
+            'company_number': company_number,
+            'version': version,
+            'expires': time.time() + settings.MEMBERSHIP_CLAIMS_TTL_SECONDS,
+        }
+        request.session[SESSION_KEY_MEMBERSHIP_CLAIMS] = claims
+    return claims
+
+
+def cache_companies_house_search_results(items):
+    """Store the profile fields present in Companies House search results.
+
+    The user picks one of these companies moments later, and the company
+    search step only needs its status, so that can be answered from here
+    rather than by fetching the full profile.
+
+    """
+
+    partial_profiles = {
+        f'{CACHE_KEY_COMPANY_PROFILE_PARTIAL}-{item["company_number"]}': {
+            'company_number': item['company_number'],
+            'company_name': item.get('title'),
+            **{name: item[name] for name in ['company_status', 'company_type', 'date_of_creation'] if name in item},
+        }
+        for item in items
+        if item.get('company_number')
+    }
+    if partial_profiles:
+        cache.set_many(partial_profiles, timeout=settings.COMPANIES_HOUSE_PARTIAL_PROFILE_CACHE_SECONDS)
 
 
 def create_user_profile(sso_session_id, data):
     profile_response = sso_api_client.user.create_user_profile(sso_session_id=sso_session_id, data=data)
+    invalidate_sso_session_user(sso_session_id)
     profile_response.raise_for_status()
     # Call made to Supplier to keep name in Sync
     # To be removed once we remove from supplier model
@@ -14,6 +136,7 @@ def create_user_profile(sso_session_id, data):
 
 def update_user_profile(sso_session_id, data):
     profile_response = sso_api_client.user.update_user_profile(sso_session_id=sso_session_id, data=data)
+    invalidate_sso_session_user(sso_session_id)
     profile_response.raise_for_status()
     # Call made to Supplier to keep name in Sync
     # To be removed once we remove from supplier model
@@ -41,3 +164,89 @@ def get_company_admins(sso_session_id):
 
     collaborators = response.json()
     return [collaborator for collaborator in collaborators if collaborator['role'] == user_roles.ADMIN]
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls so only one of them is executed.
+
+    Callers in the same process wait for the first caller's result. With
+    `across_processes` callers in other processes wait too, using a lock in
+    the cache and a short-lived copy of the result.
+
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    def do(self, key, func, across_processes=False, lock_timeout=15, result_timeout=2):
+        if across_processes:
+            return self.do_in_process(key, lambda: self.do_across_processes(key, func, lock_timeout, result_timeout))
+        return self.do_in_process(key, func)
+
+    def do_in_process(self, key, func):
+        with self.lock:
+            future = self.in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self.in_flight[key] = Future()
+        if not is_leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def do_across_processes(self, key, func, lock_timeout, result_timeout):
+        lock_key = f'{CACHE_KEY_SINGLE_FLIGHT_LOCK}-{key}'
+        result_key = f'{CACHE_KEY_SINGLE_FLIGHT_RESULT}-{key}'
+        result = cache.get(result_key)
+        if result is not None:
+            return result
+        if cache.add(lock_key, True, timeout=lock_timeout):
+            try:
+                result = func()
+                cache.set(result_key, result, timeout=result_timeout)
+                return result
+            finally:
+                cache.delete(lock_key)
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            if cache.get(lock_key) is None:
+                # the other process finished without sharing a result e.g., it errored
+                break
+        return func()
+
+
+single_flight = SingleFlight()
+
+
+def get_client_ident(request):
+    # IP address alone would make users behind the same proxy supersede each
+    # other's searches, so the per-browser CSRF cookie is included too
+    ip_address = BaseThrottle().get_ident(request)
+    csrf_token = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return hashlib.sha256(f'{ip_address} {csrf_token}'.encode()).hexdigest()
+
+
+def register_latest_query(key):
+    token = uuid.uuid4().hex
+    cache.set(f'{CACHE_KEY_LATEST_QUERY}-{key}', token, timeout=settings.SEARCH_LATEST_QUERY_TIMEOUT)
+    return token
+
+
+def is_latest_query(key, token):
+    return cache.get(f'{CACHE_KEY_LATEST_QUERY}-{key}') == token
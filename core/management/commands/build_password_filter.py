@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import passwords
+
+
+class Command(BaseCommand):
+    help = 'Build the Bloom filter of common and breached passwords from a list with one password per line.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('passwords_path')
+        parser.add_argument('--filter-path', default=settings.PASSWORD_FILTER_PATH)
+        parser.add_argument('--false-positive-rate', type=float, default=0.001)
+
+    def handle(self, *args, **options):
+        if not options['filter_path']:
+            raise CommandError('Set PASSWORD_FILTER_PATH or pass --filter-path')
+        count = passwords.build_filter(
+            passwords_path=options['passwords_path'],
+            filter_path=options['filter_path'],
+            false_positive_rate=options['false_positive_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Added {count} passwords'))
@@ -0,0 +1,49 @@
+import collections
+
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+# the header zlib puts in front of values core.cache_backends.ZlibCompressor compressed
+ZLIB_HEADERS = (b'\x78\x01', b'\x78\x5e', b'\x78\x9c', b'\x78\xda')
+
+
+class Command(BaseCommand):
+    help = 'Sample keys in a Redis cache and report their sizes by key prefix.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default', help='The cache to sample.')
+        parser.add_argument('--sample', type=int, default=1000, help='How many random keys to sample.')
+
+    def get_prefix(self, key):
+        # keys are stored as <KEY_PREFIX>:<version>:<key>, and the repo's keys look like <PREFIX>-<id>
+        return key.decode(errors='replace').split(':', 2)[-1].split('-', 1)[0]
+
+    def handle(self, *args, **options):
+        connection = get_redis_connection(options['alias'])
+        # RANDOMKEY, unlike SCAN, does not walk a large keyspace
+        keys = {connection.randomkey() for _ in range(options['sample'])} - {None}
+        if not keys:
+            self.stdout.write('The cache is empty')
+            return
+
+        keys = sorted(keys)
+        pipeline = connection.pipeline(transaction=False)
+        for key in keys:
+            pipeline.memory_usage(key)
+            pipeline.getrange(key, 0, 1)
+        results = pipeline.execute()
+
+        stats = collections.defaultdict(lambda: {'keys': 0, 'bytes': 0, 'max_bytes': 0, 'compressed': 0})
+        for key, memory_usage, header in zip(keys, results[::2], results[1::2]):
+            prefix_stats = stats[self.get_prefix(key)]
+            prefix_stats['keys'] += 1
+            prefix_stats['bytes'] += memory_usage or 0
+            prefix_stats['max_bytes'] = max(prefix_stats['max_bytes'], memory_usage or 0)
+            prefix_stats['compressed'] += header in ZLIB_HEADERS
+
+        self.stdout.write(f'Sampled {len(keys)} of {connection.dbsize()} keys')
+        for prefix, s in sorted(stats.items(), key=lambda item: -item[1]['bytes']):
+            self.stdout.write(
+                f'{prefix}: {s["keys"]} keys, {s["bytes"]} bytes, {s["bytes"] // s["keys"]} average, '
+                f'{s["max_bytes"]} largest, {s["compressed"]} compressed'
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import storage
+
+
+class Command(BaseCommand):
+    help = 'Delete files left in the wizard file storage by abandoned journeys.'
+
+    def handle(self, *args, **options):
+        file_storage = storage.get_wizard_file_storage()
+        if not hasattr(file_storage, 'delete_expired'):
+            self.stdout.write('Wizard file storage expires files itself')
+            return
+        count = file_storage.delete_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired files'))
@@ -0,0 +1,30 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import companies_house
+
+
+class Command(BaseCommand):
+    help = 'Build the Companies House index from a "basic company data" snapshot (csv or zip).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot_path')
+        parser.add_argument(
+            '--snapshot-date',
+            type=datetime.date.fromisoformat,
+            default=datetime.date.today(),
+            help='Date the snapshot was published, as YYYY-MM-DD. Defaults to today.',
+        )
+        parser.add_argument('--index-path', default=settings.COMPANIES_HOUSE_INDEX_PATH)
+
+    def handle(self, *args, **options):
+        if not options['index_path']:
+            raise CommandError('Set COMPANIES_HOUSE_INDEX_PATH or pass --index-path')
+        count = companies_house.build_index(
+            snapshot_path=options['snapshot_path'],
+            index_path=options['index_path'],
+            snapshot_date=options['snapshot_date'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} companies'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import postcodes
+
+
+class Command(BaseCommand):
+    help = 'Build the postcode index from the ONS Postcode Directory (csv or zip).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory_path')
+        parser.add_argument('--index-path', default=settings.POSTCODE_INDEX_PATH)
+        parser.add_argument(
+            '--locality-column', default='oslaua', help='Column holding the locality. Defaults to the local authority.'
+        )
+        parser.add_argument('--locality-names', help='csv mapping the locality codes to names.')
+
+    def handle(self, *args, **options):
+        if not options['index_path']:
+            raise CommandError('Set POSTCODE_INDEX_PATH or pass --index-path')
+        locality_names = None
+        if options['locality_names']:
+            locality_names = postcodes.read_locality_names(options['locality_names'])
+        count = postcodes.build_index(
+            directory_path=options['directory_path'],
+            index_path=options['index_path'],
+            locality_column=options['locality_column'],
+            locality_names=locality_names,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} postcodes'))
@@ -1,5 +1,84 @@
 from directory_components.middleware import AbstractPrefixUrlMiddleware
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from core import circuit_breakers, helpers, request_cache, transport
 
 
 class PrefixUrlMiddleware(AbstractPrefixUrlMiddleware):
     prefix = '/profile/'
+
+
+class UpstreamDeadlineMiddleware:
+    """Give each request a total budget for its upstream calls.
+
+    Every client goes through `core.transport`, which cuts each call's
+    timeout to the time left and raises `DeadlineExceeded` once none is left,
+    so a page making several slow calls fails within the budget rather than
+    after the sum of the clients' timeouts.
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_budget(self, request):
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            view_name = None
+        return settings.UPSTREAM_DEADLINE_URL_BUDGETS.get(view_name, settings.UPSTREAM_DEADLINE_SECONDS)
+
+    def __call__(self, request):
+        with transport.deadline(self.get_budget(request)):
+            return self.get_response(request)
+
+
+class StaleDataMiddleware:
+    """Start each request with no circuit breakers having served it last-known-good data."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = circuit_breakers.served_stale.set(frozenset())
+        try:
+            return self.get_response(request)
+        finally:
+            circuit_breakers.served_stale.reset(token)
+
+
+class RequestCacheMiddleware:
+    """Give each request a RequestCache, flushing its buffered writes once the response is ready.
+
+    The SSO session user and the keys declared by the view's
+    `get_prefetch_cache_keys` are fetched in one round trip up front.
+
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_prefetch_cache_keys(self, request):
+        keys = []
+        session_id = request.COOKIES.get(settings.SSO_SESSION_COOKIE)
+        if session_id:
+            keys.append(helpers.get_session_cache_key(helpers.CACHE_KEY_SSO_SESSION_USER, session_id))
+        try:
+            view_func = resolve(request.path_info).func
+        except Resolver404:
+            return keys
+        view_class = getattr(view_func, 'view_class', None)
+        if hasattr(view_class, 'get_prefetch_cache_keys'):
+            keys += view_class.get_prefetch_cache_keys(request)
+        return keys
+
+    def __call__(self, request):
+        token = request_cache.request_caches.set({})
+        try:
+            request_cache.get_cache().prefetch(self.get_prefetch_cache_keys(request))
+            return self.get_response(request)
+        finally:
+            for cache in request_cache.request_caches.get().values():
+                cache.flush()
+            request_cache.request_caches.reset(token)
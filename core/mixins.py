@@ -3,6 +3,14 @@ from django.utils.functional import cached_property
 from core import helpers
 
 
+class PrefetchCacheMixin:
+    """Declares the cache entries the view reads, so RequestCacheMiddleware fetches them in one round trip."""
+
+    @classmethod
+    def get_prefetch_cache_keys(cls, request):
+        return []
+
+
 class PreventCaptchaRevalidationMixin:
     """When get_all_cleaned_data() is called the forms are revalidated,
     which causes captcha to fail becuase the same captcha response from google
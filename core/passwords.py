@@ -0,0 +1,88 @@
+import hashlib
+import math
+import os
+import struct
+
+from core import reloading
+
+MAGIC = b'BLOOM1\n'
+HEADER = struct.Struct('<QI')  # number of bits, number of hashes
+
+
+def normalise(password):
+    # matches django's CommonPasswordValidator, which SSO uses
+    return password.lower().strip()
+
+
+def get_positions(value, bit_count, hash_count):
+    # double hashing: the k positions are derived from two halves of one digest
+    digest = hashlib.sha256(value.encode()).digest()
+    h1, h2 = struct.unpack_from('<QQ', digest)
+    return [(h1 + i * h2) % bit_count for i in range(hash_count)]
+
+
+def read_passwords(path):
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            password = normalise(line)
+            if password:
+                yield password
+
+
+def build_filter(passwords_path, filter_path, false_positive_rate=0.001):
+    """Build a Bloom filter of the passwords in the file, one per line.
+
+    Returns the number of passwords added.
+
+    """
+
+    count = sum(1 for _ in read_passwords(passwords_path))
+    bit_count = max(8, math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2))
+    hash_count = max(1, round(bit_count / max(count, 1) * math.log(2)))
+    bits = bytearray(math.ceil(bit_count / 8))
+    for password in read_passwords(passwords_path):
+        for position in get_positions(password, bit_count, hash_count):
+            bits[position // 8] |= 1 << (position % 8)
+    temp_path = f'{filter_path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(bit_count, hash_count))
+        f.write(bits)
+    os.replace(temp_path, filter_path)
+    return count
+
+
+def load_filter(path):
+    buffer = reloading.map_file(path, MAGIC, 'a password filter')
+    bit_count, hash_count = HEADER.unpack_from(buffer, len(MAGIC))
+    return buffer, len(MAGIC) + HEADER.size, bit_count, hash_count
+
+
+def close_filter(loaded):
+    buffer, *_ = loaded
+    buffer.close()
+
+
+class CommonPasswordFilter:
+    """Membership checks against the memory-mapped Bloom filter of common and breached passwords.
+
+    A password in the list is always reported, and a password not in the
+    list is wrongly reported at roughly the false positive rate the filter
+    was built with. Nothing is reported when PASSWORD_FILTER_PATH is not
+    configured or the file is missing.
+
+    """
+
+    def __init__(self):
+        self.file = reloading.ReloadingFile('PASSWORD_FILTER_PATH', load=load_filter, close=close_filter)
+
+    def __contains__(self, password):
+        with self.file.open() as loaded:
+            if loaded is None:
+                return False
+            buffer, offset, bit_count, hash_count = loaded
+            positions = get_positions(normalise(password), bit_count, hash_count)
+            return all(buffer[offset + position // 8] & (1 << (position % 8)) for position in positions)
+
+
+common_passwords = CommonPasswordFilter()
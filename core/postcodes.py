@@ -0,0 +1,146 @@
+import bisect
+import csv
+import io
+import os
+import re
+import struct
+import zipfile
+
+import orjson
+
+from core import reloading
+
+MAGIC = b'PCDX1\n'
+HEADER = struct.Struct('<II')  # number of records, length of the localities json
+RECORD = struct.Struct('<7sH')  # postcode without the space, index into the localities list
+POSTCODE_PATTERN = re.compile(r'^[A-Z]{1,2}[0-9][A-Z0-9]?[0-9][A-Z]{2}$')
+
+
+def normalise(postcode):
+    """Return the postcode in the canonical "SW1A 1AA" format, or None if it is not shaped like a UK postcode."""
+
+    compact = ''.join(postcode.split()).upper()
+    if POSTCODE_PATTERN.match(compact):
+        return f'{compact[:-3]} {compact[-3:]}'
+
+
+def open_csv(path):
+    # the directory is published as a zip with the whole of the data in one csv in the Data directory
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        for name in archive.namelist():
+            if name.lower().endswith('.csv') and os.path.basename(os.path.dirname(name)).lower() == 'data':
+                yield from csv.DictReader(io.TextIOWrapper(archive.open(name), encoding='utf-8-sig', newline=''))
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            yield from csv.DictReader(f)
+
+
+def read_locality_names(path):
+    # e.g., the directory's "LA_UA names and codes" file: code in the first column, name in the second
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        return {row[0]: row[1] for row in reader if len(row) >= 2}
+
+
+def build_index(directory_path, index_path, locality_column='oslaua', locality_names=None):
+    """Build the postcode index from the ONS Postcode Directory.
+
+    Terminated postcodes are left out. Records are fixed width and sorted so
+    lookups are a binary search over the memory-mapped file.
+
+    Returns the number of postcodes indexed.
+
+    """
+
+    localities = ['']
+    locality_ids = {'': 0}
+    records = []
+    for row in open_csv(directory_path):
+        if row.get('doterm'):
+            continue
+        postcode = normalise(row['pcds'] if 'pcds' in row else row['pcd'])
+        if not postcode:
+            continue
+        locality = row.get(locality_column, '')
+        locality = (locality_names or {}).get(locality, locality)
+        if locality not in locality_ids:
+            locality_ids[locality] = len(localities)
+            localities.append(locality)
+        records.append(RECORD.pack(postcode.replace(' ', '').ljust(7).encode(), locality_ids[locality]))
+    records = sorted(set(records))
+    localities_json = orjson.dumps(localities)
+    temp_path = f'{index_path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(records), len(localities_json)))
+        f.write(localities_json)
+        f.writelines(records)
+    os.replace(temp_path, index_path)
+    return len(records)
+
+
+class Records:
+    """Sequence view of the fixed width records, so bisect can search them."""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * RECORD.size
+        end = start + 7
+        return self.buffer[start:end]
+
+
+def load_index(path):
+    buffer = reloading.map_file(path, MAGIC, 'a postcode index')
+    count, localities_length = HEADER.unpack_from(buffer, len(MAGIC))
+    start = len(MAGIC) + HEADER.size
+    end = start + localities_length
+    return Records(buffer, end, count), orjson.loads(buffer[start:end])
+
+
+def close_index(loaded):
+    records, _ = loaded
+    records.buffer.close()
+
+
+class PostcodeIndex:
+    """Lookups against the memory-mapped index built from the ONS Postcode Directory.
+
+    `is_available` is False when POSTCODE_INDEX_PATH is not configured or the
+    file is missing, in which case postcodes are not checked locally.
+
+    """
+
+    def __init__(self):
+        self.file = reloading.ReloadingFile('POSTCODE_INDEX_PATH', load=load_index, close=close_index)
+
+    @property
+    def is_available(self):
+        with self.file.open() as loaded:
+            return loaded is not None
+
+    def lookup(self, postcode):
+        """Return the normalised postcode and its locality, or None if the postcode is unknown."""
+
+        postcode = normalise(postcode)
+        with self.file.open() as loaded:
+            if loaded is None or postcode is None:
+                return None
+            records, localities = loaded
+            key = postcode.replace(' ', '').ljust(7).encode()
+            i = bisect.bisect_left(records, key)
+            if i < len(records) and records[i] == key:
+                start = records.offset + i * RECORD.size
+                _, locality_id = RECORD.unpack_from(records.buffer, start)
+                return {'postcode': postcode, 'locality': localities[locality_id]}
+
+
+index = PostcodeIndex()
@@ -0,0 +1,72 @@
+import contextlib
+import mmap
+import os
+import threading
+import types
+
+from django.conf import settings
+
+
+def map_file(path, magic, description):
+    """Memory-map the file read only, so every worker on the host shares the same pages.
+
+    Raises ValueError if the file does not start with `magic`.
+
+    """
+
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[: len(magic)] != magic:
+        buffer.close()
+        raise ValueError(f'{path} is not {description}')
+    return buffer
+
+
+class ReloadingFile:
+    """A file built by a management command, loaded again whenever the command replaces it.
+
+    The path is read from the `setting_name` setting. `load` turns the path
+    into whatever callers use, and `close` releases what an earlier `load`
+    returned once it has been replaced. Everything loaded is shared between
+    threads and only used under a lock, unless `per_thread` is set for things
+    like SQLite connections that can't be shared, which each thread loads for
+    itself.
+
+    """
+
+    def __init__(self, setting_name, load, close, per_thread=False):
+        self.setting_name = setting_name
+        self.load = load
+        self.close = close
+        if per_thread:
+            self.state = threading.local()
+            self.lock = contextlib.nullcontext()
+        else:
+            self.state = types.SimpleNamespace()
+            self.lock = threading.Lock()
+
+    def get_loaded(self):
+        path = getattr(settings, self.setting_name)
+        if not path or not os.path.exists(path):
+            return None
+        # the command swaps a new file into place, so a new inode or mtime means a new file
+        stat = os.stat(path)
+        version = (path, stat.st_ino, stat.st_mtime)
+        if getattr(self.state, 'version', None) != version:
+            previous = getattr(self.state, 'loaded', None)
+            self.state.loaded = self.load(path)
+            self.state.version = version
+            if previous is not None:
+                self.close(previous)
+        return self.state.loaded
+
+    @contextlib.contextmanager
+    def open(self):
+        """Give what was loaded from the file, or None if it is not configured or missing.
+
+        It isn't closed by a reload until the block ends.
+
+        """
+
+        with self.lock:
+            yield self.get_loaded()
@@ -0,0 +1,19 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Render with orjson. Bytes are taken to be JSON already, and are passed through untouched."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, bytes):
+            return data
+        return orjson.dumps(data, default=self.encoder.default)
@@ -0,0 +1,102 @@
+import collections
+import contextvars
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+# the current request's RequestCache per cache alias, set by RequestCacheMiddleware
+request_caches = contextvars.ContextVar('request_caches', default=None)
+
+MISSING = object()
+
+
+class RequestCache:
+    """The cache as seen by one request.
+
+    Keys declared up front are fetched in one `get_many`, and values read
+    once are remembered, so each key costs at most one round trip per
+    request. Sets are buffered and written with one `set_many` per timeout
+    when the response is ready. Deletes, `add` and `incr` go straight to the
+    cache, as other processes rely on them straight away.
+
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+        self.values = {}
+        self.writes = {}
+
+    def prefetch(self, keys):
+        keys = [key for key in keys if key not in self.values]
+        if keys:
+            found = self.cache.get_many(keys)
+            for key in keys:
+                self.values[key] = found.get(key, MISSING)
+
+    def get(self, key, default=None):
+        if key not in self.values:
+            value = self.cache.get(key, MISSING)
+            if value is MISSING:
+                # misses are not remembered, so a key being waited on is seen when it arrives
+                return default
+            self.values[key] = value
+        value = self.values[key]
+        return default if value is MISSING else value
+
+    def get_many(self, keys):
+        self.prefetch(keys)
+        return {key: self.values[key] for key in keys if self.values[key] is not MISSING}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.values[key] = value
+        self.writes[key] = (value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT):
+        for key, value in data.items():
+            self.set(key, value, timeout=timeout)
+
+    def forget(self, key):
+        self.values.pop(key, None)
+        self.writes.pop(key, None)
+
+    def delete(self, key):
+        self.forget(key)
+        self.cache.delete(key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.forget(key)
+        return self.cache.add(key, value, timeout=timeout)
+
+    def incr(self, key, delta=1):
+        self.forget(key)
+        return self.cache.incr(key, delta)
+
+    def flush(self):
+        writes_by_timeout = collections.defaultdict(dict)
+        for key, (value, timeout) in self.writes.items():
+            writes_by_timeout[timeout][key] = value
+        self.writes = {}
+        for timeout, data in writes_by_timeout.items():
+            self.cache.set_many(data, timeout=timeout)
+
+
+def get_cache(alias=DEFAULT_CACHE_ALIAS):
+    current = request_caches.get()
+    if current is None:
+        return caches[alias]
+    if alias not in current:
+        current[alias] = RequestCache(alias)
+    return current[alias]
+
+
+class CacheProxy:
+    """Stands in for the cache: the current request's RequestCache during a request, the cache itself otherwise."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __getattr__(self, name):
+        return getattr(get_cache(self.alias), name)
+
+
+cache = CacheProxy(DEFAULT_CACHE_ALIAS)
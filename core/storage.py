@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage, get_storage_class
+from django.utils.deconstruct import deconstructible
+
+
+def get_wizard_file_storage():
+    return get_storage_class(settings.WIZARD_FILE_STORAGE)()
+
+
+@deconstructible
+class TemporaryFileSystemStorage(FileSystemStorage):
+    """Local storage for files uploaded part way through a wizard.
+
+    formtools deletes a journey's files when it finishes, but files from
+    abandoned journeys are left behind, so files older than
+    WIZARD_FILE_STORAGE_TTL_SECONDS are swept away every so often when a new
+    file is saved. The clear_expired_wizard_files command does the same.
+
+    """
+
+    lock = threading.Lock()
+    last_swept = 0
+
+    def __init__(self, location=None, **kwargs):
+        location = location or settings.WIZARD_FILE_STORAGE_LOCATION or os.path.join(tempfile.gettempdir(), 'wizard')
+        super().__init__(location=location, **kwargs)
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        with self.lock:
+            is_sweep_due = (
+                time.time() - TemporaryFileSystemStorage.last_swept > settings.WIZARD_FILE_STORAGE_TTL_SECONDS
+            )
+            if is_sweep_due:
+                TemporaryFileSystemStorage.last_swept = time.time()
+        if is_sweep_due:
+            self.delete_expired()
+        return name
+
+    def delete_expired(self):
+        """Delete files older than the TTL, returning how many were deleted."""
+
+        if not os.path.isdir(self.location):
+            return 0
+        expiry = time.time() - settings.WIZARD_FILE_STORAGE_TTL_SECONDS
+        count = 0
+        for directory, _, filenames in os.walk(self.location):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    if os.path.getmtime(path) < expiry:
+                        os.remove(path)
+                        count += 1
+                except FileNotFoundError:
+                    # deleted by another process in the meantime
+                    pass
+        return count
+
+
+@deconstructible
+class CacheStorage(Storage):
+    """Keeps files uploaded part way through a wizard in the cache, for when
+    the service runs on more than one host. Files expire after
+    WIZARD_FILE_STORAGE_TTL_SECONDS.
+
+    """
+
+    key_prefix = 'WIZARD_FILE'
+
+    @property
+    def cache(self):
+        return caches[settings.WIZARD_FILE_STORAGE_CACHE]
+
+    def get_key(self, name):
+        return f'{self.key_prefix}-{name}'
+
+    def _save(self, name, content):
+        content.seek(0)
+        self.cache.set(self.get_key(name), content.read(), timeout=settings.WIZARD_FILE_STORAGE_TTL_SECONDS)
+        return name
+
+    def _open(self, name, mode='rb'):
+        content = self.cache.get(self.get_key(name))
+        if content is None:
+            raise FileNotFoundError(name)
+        return ContentFile(content, name=name)
+
+    def delete(self, name):
+        self.cache.delete(self.get_key(name))
+
+    def exists(self, name):
+        # without fetching the file itself
+        return self.cache.has_key(self.get_key(name))  # noqa: W601
+
+    def size(self, name):
+        return len(self._open(name).read())
@@ -0,0 +1,112 @@
+from unittest import mock
+
+import pytest
+from django.contrib import auth
+from django.core.cache import cache
+from django.urls import reverse
+
+from core import backends, healthcheck, helpers
+from core.tests.helpers import create_response
+
+
+@pytest.fixture(autouse=True)
+def clear_stats():
+    backends.CachedSSOUserBackend.stats.clear()
+    yield
+    backends.CachedSSOUserBackend.stats.clear()
+
+
+@pytest.fixture
+def session_user_response():
+    return create_response(
+        {'id': 1, 'email': 'jim@example.com', 'hashed_uuid': 'abc', 'user_profile': {'first_name': 'Jim'}}
+    )
+
+
+def test_get_user_cached(auth_backend, session_user_response):
+    auth_backend.return_value = session_user_response
+    backend = backends.CachedSSOUserBackend()
+
+    user_one = backend.get_user('123')
+    user_two = backend.get_user('123')
+
+    assert auth_backend.call_count == 1
+    assert user_one.email == user_two.email == 'jim@example.com'
+    assert user_two.session_id == '123'
+    assert user_two.first_name == 'Jim'
+    assert user_two.has_user_profile is True
+    assert backends.CachedSSOUserBackend.stats == {'hits': 1, 'misses': 1}
+
+
+def test_get_user_cache_key_hides_session_id(auth_backend, session_user_response):
+    auth_backend.return_value = session_user_response
+
+    backends.CachedSSOUserBackend().get_user('secret-session-id')
+
+    cache_key = helpers.get_session_cache_key(helpers.CACHE_KEY_SSO_SESSION_USER, 'secret-session-id')
+    assert cache.get(cache_key)['email'] == 'jim@example.com'
+    assert 'secret-session-id' not in cache_key
+
+
+def test_get_user_not_cached_when_sso_errors(auth_backend):
+    auth_backend.return_value = create_response(status_code=404)
+    backend = backends.CachedSSOUserBackend()
+
+    assert backend.get_user('123') is None
+    assert backend.get_user('123') is None
+    assert auth_backend.call_count == 2
+
+
+def test_get_user_cache_expires(auth_backend, session_user_response, settings):
+    settings.SSO_SESSION_CACHE_SECONDS = 30
+    auth_backend.return_value = session_user_response
+
+    with mock.patch.object(backends.cache, 'set', wraps=backends.cache.set) as mock_set:
+        backends.CachedSSOUserBackend().get_user('123')
+
+    assert mock_set.call_args[1]['timeout'] == 30
+
+
+@pytest.mark.parametrize('func', [helpers.update_user_profile, helpers.create_user_profile])
+def test_profile_change_invalidates_session_user(func, auth_backend, session_user_response):
+    auth_backend.return_value = session_user_response
+    backend = backends.CachedSSOUserBackend()
+    backend.get_user('123')
+
+    func(sso_session_id='123', data={'first_name': 'Jim', 'last_name': 'Bob'})
+    backend.get_user('123')
+
+    assert auth_backend.call_count == 2
+
+
+def test_logout_invalidates_session_user(auth_backend, session_user_response, rf):
+    auth_backend.return_value = session_user_response
+    backend = backends.CachedSSOUserBackend()
+    request = rf.get('/')
+    request.user = backend.get_user('123')
+    request.session = mock.MagicMock()
+
+    auth.logout(request)
+    backend.get_user('123')
+
+    assert auth_backend.call_count == 2
+
+
+def test_middleware_uses_cache(auth_backend, client, user):
+    client.force_login(user)
+
+    client.get(reverse('about'))
+    client.get(reverse('about'))
+
+    assert auth_backend.call_count == 1
+
+
+def test_healthcheck_backend_reports_stats(auth_backend, session_user_response):
+    auth_backend.return_value = session_user_response
+    backends.CachedSSOUserBackend().get_user('123')
+    backends.CachedSSOUserBackend().get_user('123')
+    backend = healthcheck.SSOSessionCacheBackend()
+
+    backend.run_check()
+
+    assert backend.pretty_status() == '1 SSO calls avoided, 1 SSO calls made'
@@ -0,0 +1,337 @@
+import io
+import os
+import pickle
+import threading
+import zlib
+from unittest import mock
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django_redis.exceptions import CompressorError
+from redis.exceptions import ConnectionError
+
+from core import healthcheck
+from core.cache_backends import ConnectionFactory, FallbackPolicyCache, TwoTierCache, ZlibCompressor
+
+
+@pytest.fixture
+def two_tier_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'two_tier_remote': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'two_tier'},
+        'two_tier': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'LOCATION': 'two_tier_remote',
+            'OPTIONS': {'LOCAL_KEY_PREFIXES': ['HOT-'], 'LOCAL_TIMEOUT': 5, 'LOCAL_MAX_ENTRIES': 2},
+        },
+    }
+    with mock.patch.dict(TwoTierCache.tiers, clear=True):
+        cache = caches['two_tier']
+        yield cache
+        cache.clear()
+
+
+@pytest.fixture
+def remote(two_tier_cache):
+    return caches['two_tier_remote']
+
+
+def test_hot_keys_served_in_process(two_tier_cache, remote):
+    remote.set('HOT-1', {'name': 'Example corp'})
+
+    assert two_tier_cache.get('HOT-1') == {'name': 'Example corp'}
+    with mock.patch.object(remote, 'get_many') as mock_get_many:
+        assert two_tier_cache.get('HOT-1') == {'name': 'Example corp'}
+
+    assert mock_get_many.call_count == 0
+    assert +two_tier_cache.stats == {'local_hits': 1, 'remote_hits': 1}
+
+
+def test_threads_share_local_copies(two_tier_cache, remote):
+    remote.set('HOT-1', 'value')
+    two_tier_cache.get('HOT-1')
+    thread_caches = []
+
+    thread = threading.Thread(target=lambda: thread_caches.append(caches['two_tier']))
+    thread.start()
+    thread.join()
+
+    assert thread_caches[0] is not two_tier_cache
+    assert thread_caches[0].get('HOT-1') == 'value'
+    assert +two_tier_cache.stats == {'local_hits': 1, 'remote_hits': 1}
+
+
+def test_other_keys_always_read_from_remote(two_tier_cache, remote):
+    two_tier_cache.set('COLD-1', 'value')
+
+    assert two_tier_cache.get('COLD-1') == 'value'
+    remote.set('COLD-1', 'changed')
+
+    assert two_tier_cache.get('COLD-1') == 'changed'
+    assert two_tier_cache.get('COLD-2', 'default') == 'default'
+    assert +two_tier_cache.stats == {'remote_hits': 2, 'misses': 1}
+
+
+def test_local_copies_are_not_shared(two_tier_cache, remote):
+    remote.set('HOT-1', {'name': 'Example corp'})
+
+    two_tier_cache.get('HOT-1')['name'] = 'Changed'
+
+    assert two_tier_cache.get('HOT-1') == {'name': 'Example corp'}
+
+
+def test_local_copies_expire(two_tier_cache, remote):
+    remote.set('HOT-1', 'old')
+    two_tier_cache.get('HOT-1')
+    remote.set('HOT-1', 'new')
+
+    with mock.patch('time.monotonic', return_value=two_tier_cache.local[':1:HOT-1'][0] + 1):
+        assert two_tier_cache.get('HOT-1') == 'new'
+
+
+def test_least_recently_used_evicted(two_tier_cache, remote):
+    remote.set_many({'HOT-1': 1, 'HOT-2': 2, 'HOT-3': 3})
+
+    two_tier_cache.get_many(['HOT-1', 'HOT-2'])
+    two_tier_cache.get('HOT-1')
+    two_tier_cache.get('HOT-3')
+
+    assert list(two_tier_cache.local) == [':1:HOT-1', ':1:HOT-3']
+
+
+def test_writes_invalidate_local_copy(two_tier_cache, remote):
+    remote.set('HOT-1', 'old')
+    two_tier_cache.get('HOT-1')
+
+    two_tier_cache.set('HOT-1', 'new')
+
+    assert two_tier_cache.get('HOT-1') == 'new'
+
+
+def test_invalidations_published_to_other_workers(two_tier_cache):
+    connection = mock.Mock()
+
+    with mock.patch.object(TwoTierCache, 'get_redis_connection', return_value=connection):
+        two_tier_cache.set('HOT-1', 'value')
+        two_tier_cache.delete('COLD-1')
+
+    assert connection.publish.call_args_list == [mock.call('cache-invalidation', ':1:HOT-1')]
+
+
+def test_set_many_publishes_once(two_tier_cache, remote):
+    connection = mock.Mock()
+    remote.set_many({'HOT-1': 1, 'HOT-2': 2, 'HOT-3': 3})
+
+    with mock.patch.object(TwoTierCache, 'get_redis_connection', return_value=connection):
+        two_tier_cache.get_many(['HOT-1', 'HOT-2', 'HOT-3'])
+        two_tier_cache.set_many({'HOT-1': 10, 'HOT-2': 20, 'COLD-1': 30})
+
+    assert connection.publish.call_args_list == [mock.call('cache-invalidation', ':1:HOT-1\n:1:HOT-2')]
+    assert list(two_tier_cache.local) == [':1:HOT-3']
+
+
+def test_invalidation_from_other_worker_drops_local_copy(two_tier_cache, remote):
+    connection = mock.Mock()
+    remote.set_many({'HOT-1': 1, 'HOT-2': 2})
+
+    with mock.patch.object(TwoTierCache, 'get_redis_connection', return_value=connection):
+        two_tier_cache.get_many(['HOT-1', 'HOT-2'])
+    handler = connection.pubsub().subscribe.call_args[1]['cache-invalidation']
+    handler({'data': b':1:HOT-1'})
+
+    assert list(two_tier_cache.local) == [':1:HOT-2']
+
+
+def test_nothing_kept_in_process_without_subscription(two_tier_cache, remote):
+    connection = mock.Mock()
+    connection.pubsub.side_effect = ConnectionError
+    remote.set('HOT-1', 'value')
+
+    with mock.patch.object(TwoTierCache, 'get_redis_connection', return_value=connection):
+        assert two_tier_cache.get('HOT-1') == 'value'
+
+    assert two_tier_cache.local == {}
+
+
+def test_healthcheck_backend_reports_hit_ratios(two_tier_cache, remote):
+    remote.set('HOT-1', 'value')
+    two_tier_cache.get('HOT-1')
+    two_tier_cache.get('HOT-1')
+    two_tier_cache.get('HOT-2')
+    backend = healthcheck.TwoTierCacheBackend()
+
+    backend.check_status()
+
+    assert 'two_tier: in process 33% of 3 lookups, remote 50% of 2 lookups' in backend.pretty_status()
+
+
+def test_compressor_compresses_large_values():
+    compressor = ZlibCompressor({'COMPRESS_MIN_LENGTH': 100})
+    value = pickle.dumps({'summary': 'Example corp exports widgets. ' * 20})
+
+    compressed = compressor.compress(value)
+
+    assert len(compressed) < len(value)
+    assert compressor.decompress(compressed) == value
+
+
+def test_compressor_leaves_small_values():
+    compressor = ZlibCompressor({'COMPRESS_MIN_LENGTH': 100})
+    value = pickle.dumps(True)
+
+    assert compressor.compress(value) == value
+    with pytest.raises(CompressorError):
+        compressor.decompress(value)
+
+
+def test_compressor_leaves_values_that_do_not_shrink():
+    compressor = ZlibCompressor({'COMPRESS_MIN_LENGTH': 1})
+    value = zlib.compress(b'already compressed')
+
+    assert compressor.compress(value) == value
+
+
+@mock.patch('core.management.commands.cache_stats.get_redis_connection')
+def test_cache_stats(mock_get_redis_connection):
+    connection = mock_get_redis_connection.return_value
+    connection.randomkey.side_effect = [b':1:COMPANY-abc', b':1:COMPANY-def', b':1:IS_ENROLLED-123', None]
+    connection.dbsize.return_value = 10
+    connection.pipeline().execute.return_value = [300, b'x\x9c', 100, b'\x80\x05', 60, b'\x80\x05']
+    stdout = io.StringIO()
+
+    call_command('cache_stats', sample=4, stdout=stdout)
+
+    assert mock_get_redis_connection.call_args == mock.call('default')
+    assert stdout.getvalue() == (
+        'Sampled 3 of 10 keys\n'
+        'COMPANY: 2 keys, 400 bytes, 200 average, 300 largest, 1 compressed\n'
+        'IS_ENROLLED: 1 keys, 60 bytes, 60 average, 60 largest, 0 compressed\n'
+    )
+
+
+@mock.patch('core.management.commands.cache_stats.get_redis_connection')
+def test_cache_stats_empty(mock_get_redis_connection):
+    mock_get_redis_connection.return_value.randomkey.return_value = None
+    stdout = io.StringIO()
+
+    call_command('cache_stats', stdout=stdout)
+
+    assert stdout.getvalue() == 'The cache is empty\n'
+
+
+@pytest.fixture
+def connection_pools():
+    with mock.patch.dict(ConnectionFactory._pools, clear=True):
+        yield
+
+
+def create_connection_factory(pool_name):
+    return ConnectionFactory(
+        {
+            'POOL_NAME': pool_name,
+            'SOCKET_TIMEOUT': 1,
+            'CONNECTION_POOL_CLASS': 'redis.connection.BlockingConnectionPool',
+            'CONNECTION_POOL_KWARGS': {'max_connections': 5, 'timeout': 1},
+        }
+    )
+
+
+def test_connection_pool_per_pool_name(connection_pools):
+    cache_connection = create_connection_factory('cache').connect('redis://localhost:6379/0')
+    fallback_connection = create_connection_factory('api_fallback').connect('redis://localhost:6379/0')
+    other_cache_connection = create_connection_factory('cache').connect('redis://localhost:6379/0')
+
+    assert cache_connection.connection_pool is not fallback_connection.connection_pool
+    assert cache_connection.connection_pool is other_cache_connection.connection_pool
+
+
+def test_healthcheck_redis_pool_backend_reports_stats(connection_pools):
+    pool = create_connection_factory('cache').connect('redis://localhost:6379/0').connection_pool
+    # connections that don't reach Redis
+    connection_class = mock.Mock(
+        side_effect=lambda **kwargs: mock.Mock(pid=os.getpid(), **{'can_read.return_value': False})
+    )
+    with mock.patch.object(pool, 'connection_class', connection_class):
+        pool.get_connection('GET')
+        pool.release(pool.get_connection('GET'))
+    backend = healthcheck.RedisPoolBackend()
+
+    backend.check_status()
+
+    assert backend.stats == {'cache': {'max_connections': 5, 'created': 2, 'in_use': 1, 'socket_timeout': 1}}
+    assert backend.pretty_status() == 'cache: 1/5 in use, 2 open, socket timeout 1s'
+
+
+@pytest.fixture
+def fallback_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'fallback_remote': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fallback'},
+        'fallback': {
+            'BACKEND': 'core.cache_backends.FallbackPolicyCache',
+            'LOCATION': 'fallback_remote',
+            'OPTIONS': {'WRITE_KEY_PATTERNS': ['/public/*'], 'WRITE_MIN_INTERVAL': 60, 'MAX_VALUE_SIZE': 10},
+        },
+    }
+    with mock.patch.dict(FallbackPolicyCache.stats_by_location, clear=True):
+        cache = caches['fallback']
+        yield cache
+        cache.clear()
+
+
+def test_fallback_writes_allowed_keys(fallback_cache):
+    fallback_cache.set('/public/company/123/', b'{}')
+
+    assert fallback_cache.get('/public/company/123/') == b'{}'
+
+
+def test_fallback_skips_keys_not_allowed(fallback_cache):
+    fallback_cache.set('/supplier/123/', b'{}')
+
+    assert fallback_cache.get('/supplier/123/') is None
+
+
+def test_fallback_skips_large_values(fallback_cache):
+    fallback_cache.set('/public/company/123/', b'{"name": "Example corp"}')
+
+    assert fallback_cache.get('/public/company/123/') is None
+
+
+def test_fallback_skips_recently_written_keys(fallback_cache):
+    fallback_cache.set('/public/company/123/', b'{}')
+    fallback_cache.set_many({'/public/company/123/': b'[]', '/public/company/456/': b'[]'})
+
+    assert fallback_cache.get_many(['/public/company/123/', '/public/company/456/']) == {
+        '/public/company/123/': b'{}',
+        '/public/company/456/': b'[]',
+    }
+
+
+def test_fallback_reads_and_adds_pass_through(fallback_cache):
+    assert fallback_cache.add('noise-message', '') is True
+    assert fallback_cache.add('noise-message', '') is False
+
+
+def test_healthcheck_fallback_policy_backend_reports_stats(fallback_cache, settings):
+    settings.CACHES = {**settings.CACHES, 'api_fallback': settings.CACHES['fallback']}
+    fallback_cache.set('/public/company/123/', b'{}')
+    fallback_cache.set('/public/company/123/', b'{}')
+    fallback_cache.set('/public/company/123/', b'{"name": "Example corp"}')
+    fallback_cache.set('/supplier/123/', b'{}')
+    backend = healthcheck.FallbackPolicyBackend()
+
+    backend.check_status()
+
+    assert backend.pretty_status() == (
+        '1 written, 1 skipped as not allowed, 1 skipped as too large, 1 skipped as recently written'
+    )
+
+
+def test_has_key_of_other_keys_asks_remote(two_tier_cache, remote):
+    remote.set('COLD-1', b'data')
+
+    with mock.patch.object(remote, 'get') as mock_get:
+        assert two_tier_cache.has_key('COLD-1') is True  # noqa: W601
+
+    assert mock_get.call_count == 0
@@ -0,0 +1,132 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from core import circuit_breakers, transport
+from core.tests.helpers import create_response
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(settings):
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 2
+    settings.CIRCUIT_BREAKER_WINDOW_SECONDS = 60
+    settings.CIRCUIT_BREAKER_OPEN_SECONDS = 30
+
+
+@pytest.fixture(autouse=True)
+def served_stale():
+    token = circuit_breakers.served_stale.set(frozenset())
+    yield
+    circuit_breakers.served_stale.reset(token)
+
+
+def server_error():
+    response = create_response(status_code=500)
+    return requests.HTTPError(response=response)
+
+
+def test_call_stores_last_known_good():
+    breaker = circuit_breakers.CircuitBreaker('example')
+
+    assert breaker.call(lambda: {'name': 'Example corp'}, fallback_key='1') == {'name': 'Example corp'}
+    assert breaker.call(mock.Mock(side_effect=server_error()), fallback_key='1') == {'name': 'Example corp'}
+    assert circuit_breakers.served_stale.get() == {'example'}
+
+
+def test_call_failure_without_last_known_good_raises():
+    breaker = circuit_breakers.CircuitBreaker('example')
+
+    with pytest.raises(requests.HTTPError):
+        breaker.call(mock.Mock(side_effect=server_error()), fallback_key='1')
+
+
+def test_opens_after_threshold_and_skips_calls():
+    breaker = circuit_breakers.CircuitBreaker('example')
+    breaker.call(lambda: 'good', fallback_key='1')
+    func = mock.Mock(side_effect=requests.ConnectionError)
+
+    for _ in range(3):
+        assert breaker.call(func, fallback_key='1') == 'good'
+
+    assert breaker.is_open() is True
+    assert func.call_count == 2
+
+
+def test_open_without_last_known_good_raises():
+    breaker = circuit_breakers.CircuitBreaker('example')
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            breaker.call(mock.Mock(side_effect=requests.ConnectionError), fallback_key='1')
+
+    with pytest.raises(circuit_breakers.CircuitBreakerOpen):
+        breaker.call(lambda: 'good', fallback_key='1')
+
+
+def test_client_errors_are_not_failures():
+    breaker = circuit_breakers.CircuitBreaker('example')
+    breaker.call(lambda: 'good', fallback_key='1')
+    error = requests.HTTPError(response=create_response(status_code=400))
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            breaker.call(mock.Mock(side_effect=error), fallback_key='1')
+
+    assert breaker.is_open() is False
+    assert circuit_breakers.served_stale.get() == frozenset()
+
+
+def test_success_resets_failures():
+    breaker = circuit_breakers.CircuitBreaker('example')
+    breaker.call(lambda: 'good', fallback_key='1')
+
+    breaker.call(mock.Mock(side_effect=requests.ConnectionError), fallback_key='1')
+    breaker.call(lambda: 'good', fallback_key='1')
+    breaker.call(mock.Mock(side_effect=requests.ConnectionError), fallback_key='1')
+
+    assert breaker.is_open() is False
+
+
+def test_failed_trial_call_opens_again():
+    breaker = circuit_breakers.CircuitBreaker('example')
+    breaker.call(lambda: 'good', fallback_key='1')
+    for _ in range(2):
+        breaker.call(mock.Mock(side_effect=requests.ConnectionError), fallback_key='1')
+    # the open period passes
+    circuit_breakers.cache.delete(breaker.open_key)
+
+    breaker.call(mock.Mock(side_effect=requests.ConnectionError), fallback_key='1')
+
+    assert breaker.is_open() is True
+
+
+def test_last_known_good_kept_per_key():
+    breaker = circuit_breakers.CircuitBreaker('example')
+    breaker.call(lambda: 'one', fallback_key='1')
+    breaker.call(lambda: 'two', fallback_key='2')
+
+    assert breaker.call(mock.Mock(side_effect=requests.ConnectionError), fallback_key='2') == 'two'
+
+
+@pytest.mark.parametrize('error_class', (transport.BulkheadFull, transport.DeadlineExceeded))
+def test_local_rejections_are_not_failures(error_class):
+    breaker = circuit_breakers.CircuitBreaker('example')
+    breaker.call(lambda: 'good', fallback_key='1')
+
+    for _ in range(2):
+        assert breaker.call(mock.Mock(side_effect=error_class), fallback_key='1') == 'good'
+
+    assert breaker.is_open() is False
+    assert breaker.get_state() == (0, False)
+    assert circuit_breakers.served_stale.get() == {'example'}
+
+
+@pytest.mark.parametrize('error_class', (transport.BulkheadFull, transport.DeadlineExceeded))
+def test_local_rejections_without_last_known_good_raise(error_class):
+    breaker = circuit_breakers.CircuitBreaker('example')
+
+    for _ in range(2):
+        with pytest.raises(error_class):
+            breaker.call(mock.Mock(side_effect=error_class), fallback_key='1')
+
+    assert breaker.is_open() is False
@@ -0,0 +1,154 @@
+import datetime
+import zipfile
+from unittest import mock
+
+import pytest
+import requests
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from freezegun import freeze_time
+
+from core import companies_house, transport
+from core.tests.helpers import create_response
+from enrolment import helpers
+
+SNAPSHOT = '''CompanyName, CompanyNumber,RegAddress.CareOf,RegAddress.POBox,RegAddress.AddressLine1, RegAddress.AddressLine2,\
+RegAddress.PostTown,RegAddress.County,RegAddress.Country,RegAddress.PostCode,CompanyCategory,CompanyStatus,\
+CountryOfOrigin,DissolutionDate,IncorporationDate,SICCode.SicText_1,SICCode.SicText_2,SICCode.SicText_3,\
+SICCode.SicText_4
+EXAMPLE CORP LTD,00000001,,,1 FAKE STREET,,LONDON,,UNITED KINGDOM,EC1A 1BB,Private Limited Company,Active,\
+United Kingdom,,20/01/2001,62012 - Business and domestic software development,62020 - Information technology \
+consultancy activities,,
+EXAMPLE  TRADING LTD,00000002,,,2 FAKE STREET,UNIT 3,LEEDS,WEST YORKSHIRE,ENGLAND,LS1 1AA,Private Limited Company,\
+Active - Proposal to Strike off,United Kingdom,,05/06/2015,None Supplied,,,
+OTHER THING PLC,00000003,,,3 FAKE STREET,,BRISTOL,,ENGLAND,BS1 1AA,Public Limited Company,Liquidation,\
+United Kingdom,,01/02/1990,99999 - Dormant Company,,,
+'''
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = tmp_path / 'BasicCompanyData.csv'
+    path.write_text(SNAPSHOT)
+    return path
+
+
+@pytest.fixture
+def index_path(tmp_path, settings, snapshot_path):
+    path = tmp_path / 'companies-house.sqlite3'
+    settings.COMPANIES_HOUSE_INDEX_PATH = str(path)
+    call_command('ingest_companies_house_snapshot', str(snapshot_path), '--snapshot-date=2020-01-01')
+    return path
+
+
+@freeze_time('2020-01-10')
+def test_get_profile(index_path):
+    assert companies_house.index.get_profile('00000001') == {
+        'company_number': '00000001',
+        'company_name': 'EXAMPLE CORP LTD',
+        'company_status': 'active',
+        'date_of_creation': '2001-01-20',
+        'sic_codes': ['62012', '62020'],
+        'registered_office_address': {
+            'address_line_1': '1 FAKE STREET',
+            'locality': 'LONDON',
+            'country': 'UNITED KINGDOM',
+            'postal_code': 'EC1A 1BB',
+        },
+    }
+    assert companies_house.index.get_profile('00000002')['company_status'] == 'active'
+    assert companies_house.index.get_profile('00000002')['sic_codes'] == []
+    assert companies_house.index.get_profile('00000003')['company_status'] == 'liquidation'
+    assert companies_house.index.get_profile('99999999') is None
+
+
+@freeze_time('2020-01-10')
+def test_search(index_path):
+    results = companies_house.index.search('example ')
+
+    assert [result['company_number'] for result in results] == ['00000001', '00000002']
+    assert results[1] == {
+        'company_number': '00000002',
+        'title': 'EXAMPLE  TRADING LTD',
+        'company_status': 'active',
+        'date_of_creation': '2015-06-05',
+        'address': {
+            'address_line_1': '2 FAKE STREET',
+            'address_line_2': 'UNIT 3',
+            'locality': 'LEEDS',
+            'region': 'WEST YORKSHIRE',
+            'country': 'ENGLAND',
+            'postal_code': 'LS1 1AA',
+        },
+        'address_snippet': '2 FAKE STREET, UNIT 3, LEEDS, LS1 1AA',
+    }
+    assert companies_house.index.search('example t', limit=1)[0]['company_number'] == '00000002'
+    assert companies_house.index.search('nothing') == []
+
+
+def test_stale_index_not_used(index_path, settings):
+    settings.COMPANIES_HOUSE_INDEX_MAX_AGE_DAYS = 45
+
+    with freeze_time('2020-03-01'):
+        assert companies_house.index.get_profile('00000001') is None
+        assert companies_house.index.search('example') is None
+
+
+@freeze_time('2020-01-10')
+def test_ingest_zip(index_path, tmp_path):
+    zip_path = tmp_path / 'BasicCompanyData.zip'
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('BasicCompanyData-2020-01-01.csv', SNAPSHOT.replace('EXAMPLE CORP LTD', 'RENAMED LTD'))
+    assert companies_house.index.get_profile('00000001')['company_name'] == 'EXAMPLE CORP LTD'
+
+    companies_house.build_index(zip_path, index_path, snapshot_date=datetime.date(2020, 1, 2))
+
+    assert companies_house.index.get_profile('00000001')['company_name'] == 'RENAMED LTD'
+
+
+def test_ingest_requires_index_path(snapshot_path, settings):
+    settings.COMPANIES_HOUSE_INDEX_PATH = ''
+
+    with pytest.raises(CommandError):
+        call_command('ingest_companies_house_snapshot', str(snapshot_path))
+
+
+@freeze_time('2020-01-10')
+@mock.patch.object(helpers.ch_search_api_client.company, 'get_company_profile')
+def test_get_companies_house_profile_uses_index(mock_get_company_profile, index_path):
+    profile = helpers.get_companies_house_profile('00000001')
+
+    assert profile['sic_codes'] == ['62012', '62020']
+    assert mock_get_company_profile.call_count == 0
+
+
+@freeze_time('2020-01-10')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_companies_house_search_prefers_api(mock_search, index_path, client):
+    mock_search.return_value = create_response(content=b'{"items": [{"company_number": "12345678"}]}')
+
+    response = client.get(reverse('api:companies-house-search'), data={'term': 'other'})
+
+    assert response.status_code == 200
+    assert response.json() == [{'company_number': '12345678'}]
+
+
+@freeze_time('2020-01-10')
+@pytest.mark.parametrize(
+    'side_effect',
+    [
+        [create_response(status_code=429)],
+        [create_response(status_code=502)],
+        requests.exceptions.ConnectionError,
+        transport.DeadlineExceeded,
+    ],
+)
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_companies_house_search_falls_back_to_index(mock_search, side_effect, index_path, client):
+    mock_search.side_effect = side_effect
+
+    response = client.get(reverse('api:companies-house-search'), data={'term': 'other'})
+
+    assert response.status_code == 200
+    assert response.json()[0]['company_number'] == '00000003'
@@ -1,9 +1,15 @@
+import threading
 from unittest import mock
 
 import pytest
+from directory_constants import user_roles
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends import signed_cookies
+from django.core.cache import cache
 
 from core import helpers
 from core.tests.helpers import create_response
+from sso.models import SSOUser
 
 
 @mock.patch.object(helpers.api_client.supplier, 'profile_update')
@@ -68,3 +74,169 @@ def test_get_company_admins(mock_collaborator_list):
     assert mock_collaborator_list.call_count == 1
     assert mock_collaborator_list.call_args == mock.call(sso_session_id=1)
     assert return_data == data
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = helpers.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return 'result'
+
+    leader = threading.Thread(target=lambda: results.append(single_flight.do('key', func)))
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=lambda: results.append(single_flight.do('key', func))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(timeout=5)
+
+    assert calls == [1]
+    assert results == ['result'] * 4
+    assert single_flight.in_flight == {}
+
+
+def test_single_flight_shares_errors():
+    single_flight = helpers.SingleFlight()
+
+    with pytest.raises(ValueError):
+        single_flight.do('key', mock.Mock(side_effect=ValueError))
+
+    assert single_flight.in_flight == {}
+    assert single_flight.do('key', lambda: 'result') == 'result'
+
+
+def test_single_flight_across_processes_leader_shares_result():
+    func = mock.Mock(return_value='result')
+
+    assert helpers.single_flight.do('key', func, across_processes=True) == 'result'
+    assert helpers.single_flight.do('key', func, across_processes=True) == 'result'
+
+    assert func.call_count == 1
+    assert cache.get(f'{helpers.CACHE_KEY_SINGLE_FLIGHT_LOCK}-key') is None
+
+
+def test_single_flight_across_processes_waits_for_other_process():
+    cache.add(f'{helpers.CACHE_KEY_SINGLE_FLIGHT_LOCK}-key', True)
+    func = mock.Mock(return_value='own result')
+
+    def other_process_finishes(seconds):
+        cache.set(f'{helpers.CACHE_KEY_SINGLE_FLIGHT_RESULT}-key', 'shared result')
+
+    with mock.patch.object(helpers.time, 'sleep', side_effect=other_process_finishes):
+        result = helpers.single_flight.do('key', func, across_processes=True)
+
+    assert result == 'shared result'
+    assert func.call_count == 0
+
+
+def test_single_flight_across_processes_other_process_failed():
+    cache.add(f'{helpers.CACHE_KEY_SINGLE_FLIGHT_LOCK}-key', True)
+    func = mock.Mock(return_value='own result')
+
+    def other_process_fails(seconds):
+        cache.delete(f'{helpers.CACHE_KEY_SINGLE_FLIGHT_LOCK}-key')
+
+    with mock.patch.object(helpers.time, 'sleep', side_effect=other_process_fails):
+        result = helpers.single_flight.do('key', func, across_processes=True)
+
+    assert result == 'own result'
+    assert func.call_count == 1
+
+
+@pytest.fixture
+def membership_request(rf):
+    request = rf.get('/')
+    request.session = signed_cookies.SessionStore()
+    return request
+
+
+@pytest.fixture
+def mock_membership_calls():
+    company = create_response({'number': '01234567', 'name': 'Example corp'})
+    supplier = create_response({'role': user_roles.ADMIN})
+    with mock.patch.object(helpers.api_client.company, 'profile_retrieve', return_value=company) as mock_company:
+        with mock.patch.object(helpers.api_client.supplier, 'retrieve_profile', return_value=supplier):
+            yield mock_company
+
+
+def get_claims(request, user_id=1):
+    # a new user on each request, as on the real site
+    request.user = SSOUser(id=user_id, pk=user_id, session_id='123', email='jim@example.com')
+    return helpers.get_membership_claims(request)
+
+
+def test_membership_claims_reused_from_session(membership_request, mock_membership_calls):
+    claims = get_claims(membership_request)
+    claims_again = get_claims(membership_request)
+
+    assert claims == claims_again
+    assert claims['has_company'] is True
+    assert claims['role'] == user_roles.ADMIN
+    assert claims['company_number'] == '01234567'
+    assert mock_membership_calls.call_count == 1
+
+
+@pytest.mark.parametrize(
+    'invalidate_kwargs', [{'sso_id': 1}, {'company_number': '01234567'}, {'sso_id': 1, 'company_number': '01234567'}]
+)
+def test_membership_claims_invalidated(membership_request, mock_membership_calls, invalidate_kwargs):
+    get_claims(membership_request)
+    helpers.invalidate_membership_claims(**invalidate_kwargs)
+    get_claims(membership_request)
+    get_claims(membership_request)
+
+    assert mock_membership_calls.call_count == 2
+
+
+def test_membership_claims_other_user_or_company_not_invalidated(membership_request, mock_membership_calls):
+    get_claims(membership_request)
+    helpers.invalidate_membership_claims(sso_id=2, company_number='76543210')
+    get_claims(membership_request)
+
+    assert mock_membership_calls.call_count == 1
+
+
+def test_membership_claims_expire(membership_request, mock_membership_calls, settings):
+    settings.MEMBERSHIP_CLAIMS_TTL_SECONDS = -1
+    get_claims(membership_request)
+    get_claims(membership_request)
+
+    assert mock_membership_calls.call_count == 2
+
+
+def test_membership_claims_belong_to_one_user(membership_request, mock_membership_calls):
+    get_claims(membership_request)
+    claims = get_claims(membership_request, user_id=2)
+
+    assert claims['sso_id'] == 2
+    assert mock_membership_calls.call_count == 2
+
+
+def test_membership_claims_no_company(membership_request, mock_membership_calls):
+    mock_membership_calls.return_value = create_response(status_code=404)
+
+    claims = get_claims(membership_request)
+
+    assert claims['has_company'] is False
+    assert claims['role'] is None
+    assert claims['company_number'] is None
+
+
+def test_membership_claims_anonymous_user(membership_request):
+    membership_request.user = AnonymousUser()
+
+    assert helpers.get_membership_claims(membership_request) == {
+        'has_company': False,
+        'role': None,
+        'company_number': None,
+    }
+    assert helpers.SESSION_KEY_MEMBERSHIP_CLAIMS not in membership_request.session
@@ -0,0 +1,51 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core import passwords
+
+PASSWORDS = 'password\n123456789\nqwertyuiop\n  Password1234 \n\n'
+
+
+@pytest.fixture
+def passwords_path(tmp_path):
+    path = tmp_path / 'passwords.txt'
+    path.write_text(PASSWORDS)
+    return path
+
+
+@pytest.fixture
+def filter_path(tmp_path, settings, passwords_path):
+    path = tmp_path / 'passwords.bloom'
+    settings.PASSWORD_FILTER_PATH = str(path)
+    call_command('build_password_filter', str(passwords_path))
+    return path
+
+
+@pytest.mark.parametrize('password', ['password', 'PASSWORD', '123456789', 'qwertyuiop', 'password1234'])
+def test_common_password(password, filter_path):
+    assert password in passwords.common_passwords
+
+
+@pytest.mark.parametrize('password', ['correct horse battery staple', 'password12', ''])
+def test_uncommon_password(password, filter_path):
+    assert password not in passwords.common_passwords
+
+
+def test_false_positive_rate(tmp_path, settings):
+    passwords_path = tmp_path / 'passwords.txt'
+    passwords_path.write_text('\n'.join(f'common-{i}' for i in range(5000)))
+    settings.PASSWORD_FILTER_PATH = str(tmp_path / 'passwords.bloom')
+
+    assert passwords.build_filter(passwords_path, settings.PASSWORD_FILTER_PATH, false_positive_rate=0.01) == 5000
+
+    assert all(f'common-{i}' in passwords.common_passwords for i in range(5000))
+    false_positives = sum(f'uncommon-{i}' in passwords.common_passwords for i in range(5000))
+    assert false_positives < 5000 * 0.02
+
+
+def test_build_requires_filter_path(passwords_path, settings):
+    settings.PASSWORD_FILTER_PATH = ''
+
+    with pytest.raises(CommandError):
+        call_command('build_password_filter', str(passwords_path))
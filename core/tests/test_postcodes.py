@@ -0,0 +1,105 @@
+import zipfile
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from core import postcodes
+from core.tests.helpers import create_response
+
+DIRECTORY = '''pcd,pcd2,pcds,dointr,doterm,oslaua,osward
+SW1A1AA,SW1A 1AA,SW1A 1AA,198001,,E09000033,E05013806
+EC1A1BB,EC1A 1BB,EC1A 1BB,198001,,E09000001,E05009288
+W1A 0AX,W1A  0AX,W1A 0AX,198001,,E09000033,E05013805
+M1  1AA,M1   1AA,M1 1AA,198001,200001,E08000003,E05011368
+'''
+NAMES = '''LAD21CD,LAD21NM
+E09000033,Westminster
+E09000001,City of London
+'''
+
+
+@pytest.fixture
+def directory_path(tmp_path):
+    path = tmp_path / 'ONSPD.csv'
+    path.write_text(DIRECTORY)
+    return path
+
+
+@pytest.fixture
+def index_path(tmp_path, settings, directory_path):
+    names_path = tmp_path / 'names.csv'
+    names_path.write_text(NAMES)
+    path = tmp_path / 'postcodes.idx'
+    settings.POSTCODE_INDEX_PATH = str(path)
+    call_command('ingest_postcode_directory', str(directory_path), f'--locality-names={names_path}')
+    return path
+
+
+@pytest.mark.parametrize(
+    'value,expected',
+    [
+        ('sw1a1aa', 'SW1A 1AA'),
+        (' SW1A  1AA ', 'SW1A 1AA'),
+        ('w1a0ax', 'W1A 0AX'),
+        ('M11AA', 'M1 1AA'),
+        ('21313', None),
+        ('SW1A', None),
+        ('SW1A 1AAA', None),
+    ],
+)
+def test_normalise(value, expected):
+    assert postcodes.normalise(value) == expected
+
+
+def test_lookup(index_path):
+    assert postcodes.index.is_available is True
+    assert postcodes.index.lookup('sw1a1aa') == {'postcode': 'SW1A 1AA', 'locality': 'Westminster'}
+    assert postcodes.index.lookup('EC1A 1BB') == {'postcode': 'EC1A 1BB', 'locality': 'City of London'}
+    assert postcodes.index.lookup('W1A0AX')['postcode'] == 'W1A 0AX'
+    # terminated
+    assert postcodes.index.lookup('M1 1AA') is None
+    assert postcodes.index.lookup('ZZ1 1ZZ') is None
+    assert postcodes.index.lookup('nonsense') is None
+
+
+def test_lookup_raw_locality_codes(directory_path, tmp_path, settings):
+    settings.POSTCODE_INDEX_PATH = str(tmp_path / 'postcodes.idx')
+    postcodes.build_index(directory_path, settings.POSTCODE_INDEX_PATH, locality_column='osward')
+
+    assert postcodes.index.lookup('SW1A 1AA')['locality'] == 'E05013806'
+
+
+def test_ingest_zip(index_path, tmp_path):
+    zip_path = tmp_path / 'ONSPD.zip'
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('Data/ONSPD_UK.csv', DIRECTORY.replace('EC1A1BB,EC1A 1BB,EC1A 1BB', 'N11AA,N1  1AA,N1 1AA'))
+        archive.writestr('Data/multi_csv/ONSPD_UK_EC.csv', DIRECTORY)
+        archive.writestr('Documents/Notes.csv', 'not,data\n')
+
+    assert postcodes.build_index(zip_path, index_path) == 3
+
+    assert postcodes.index.lookup('N1 1AA') is not None
+    assert postcodes.index.lookup('EC1A 1BB') is None
+
+
+@mock.patch('core.views.transport.get')
+def test_address_lookup_unknown_postcode(mock_get, index_path, client):
+    response = client.get(reverse('api:postcode-search'), data={'postcode': 'ZZ11ZZ'})
+
+    assert response.status_code == 200
+    assert response.content == b'[]'
+    assert mock_get.call_count == 0
+
+
+@mock.patch('core.views.transport.get')
+def test_address_lookup_known_postcode(mock_get, index_path, client):
+    mock_get.return_value = create_response({'addresses': ['1 A road, , , , London']})
+
+    response = client.get(reverse('api:postcode-search'), data={'postcode': 'sw1a1aa'})
+
+    assert mock_get.call_args[0][0] == 'https://api.getAddress.io/find/SW1A 1AA/'
+    assert response.json() == [
+        {'text': '1 A road, London', 'value': '1 A road, London, SW1A 1AA', 'locality': 'Westminster'}
+    ]
@@ -0,0 +1,82 @@
+import os
+import threading
+from unittest import mock
+
+import pytest
+
+from core import reloading
+
+
+@pytest.fixture
+def path(tmp_path, settings):
+    path = tmp_path / 'data.idx'
+    path.write_bytes(b'MAGIC\none')
+    settings.DATA_PATH = str(path)
+    return path
+
+
+def replace(path, content):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def create_file(per_thread=False):
+    return reloading.ReloadingFile(
+        'DATA_PATH',
+        load=lambda path: reloading.map_file(path, b'MAGIC\n', 'a data file'),
+        close=mock.Mock(),
+        per_thread=per_thread,
+    )
+
+
+def test_loaded_once(path):
+    file = create_file()
+
+    with file.open() as first:
+        assert first[:] == b'MAGIC\none'
+    with file.open() as second:
+        assert second is first
+
+
+def test_replaced_file_reloaded_and_previous_closed(path):
+    file = create_file()
+    with file.open() as first:
+        pass
+
+    replace(path, b'MAGIC\ntwo')
+
+    with file.open() as second:
+        assert second[:] == b'MAGIC\ntwo'
+    assert file.close.call_args == mock.call(first)
+
+
+@pytest.mark.parametrize('value', ['', '/does/not/exist'])
+def test_not_configured_or_missing(value, settings):
+    settings.DATA_PATH = value
+
+    with create_file().open() as loaded:
+        assert loaded is None
+
+
+def test_per_thread(path):
+    file = create_file(per_thread=True)
+    loaded = []
+
+    def load():
+        with file.open() as value:
+            loaded.append(value)
+
+    load()
+    thread = threading.Thread(target=load)
+    thread.start()
+    thread.join()
+
+    assert loaded[0] is not loaded[1]
+    assert file.close.call_count == 0
+
+
+def test_map_file_checks_magic(path):
+    with pytest.raises(ValueError):
+        reloading.map_file(path, b'OTHER\n', 'another file')
@@ -0,0 +1,101 @@
+import datetime
+import json
+import timeit
+from decimal import Decimal
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from core import helpers, renderers
+from core.tests.helpers import create_response
+
+
+def create_companies_house_search_result(count):
+    # mirrors the shape of a Companies House search api result
+    return {
+        'kind': 'search#companies',
+        'total_results': 4000,
+        'items_per_page': count,
+        'start_index': 0,
+        'items': [
+            {
+                'kind': 'searchresults#company',
+                'company_number': f'{index:08}',
+                'title': f'EXAMPLE TRADING COMPANY NUMBER {index} LIMITED',
+                'company_status': 'active',
+                'company_type': 'ltd',
+                'date_of_creation': '2001-01-01',
+                'description': f'{index:08} - Incorporated on  1 January 2001',
+                'description_identifier': ['incorporated-on'],
+                'address_snippet': f'{index} Example Street, Example Town, Exampleshire, EX1 1AA',
+                'address': {
+                    'premises': str(index),
+                    'address_line_1': 'Example Street',
+                    'locality': 'Example Town',
+                    'region': 'Exampleshire',
+                    'postal_code': 'EX1 1AA',
+                    'country': 'United Kingdom',
+                },
+                'links': {'self': f'/company/{index:08}'},
+                'matches': {'title': [1, 7], 'snippet': []},
+                'snippet': '',
+            }
+            for index in range(count)
+        ],
+    }
+
+
+def test_orjson_renderer_matches_json_renderer():
+    data = {'name': 'Smashing corp', 'accents': 'Café', 'numbers': [1, 2.5], 'empty': None}
+
+    assert renderers.ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_orjson_renderer_falls_back_to_drf_encoder():
+    data = {'date': datetime.date(2001, 1, 1), 'amount': Decimal('1.50')}
+
+    assert renderers.ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_orjson_renderer_passes_bytes_through():
+    assert renderers.ORJSONRenderer().render(b'[{"name": "Smashing corp"}]') == b'[{"name": "Smashing corp"}]'
+    assert renderers.ORJSONRenderer().render(None) == b''
+
+
+def test_parse_json():
+    response = create_response(content=b'{"items": [{"name": "Smashing corp"}]}')
+
+    assert helpers.parse_json(response) == {'items': [{'name': 'Smashing corp'}]}
+
+
+@pytest.mark.parametrize('count', [20, 100])
+def test_companies_house_search_json_matches_stdlib(count):
+    content = json.dumps(create_companies_house_search_result(count)).encode()
+    response = create_response(content=content)
+
+    stdlib = JSONRenderer().render(json.loads(content)['items'])
+    fast = renderers.ORJSONRenderer().render(helpers.parse_json(response)['items'])
+
+    assert fast == stdlib
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('count', [20, 100])
+def test_benchmark_companies_house_search_json(count):
+    content = json.dumps(create_companies_house_search_result(count)).encode()
+    response = create_response(content=content)
+    number = 200
+
+    def stdlib():
+        return JSONRenderer().render(json.loads(content)['items'])
+
+    def fast():
+        return renderers.ORJSONRenderer().render(helpers.parse_json(response)['items'])
+
+    stdlib_seconds = timeit.timeit(stdlib, number=number)
+    fast_seconds = timeit.timeit(fast, number=number)
+    print(
+        f'\nCH search, {count} items ({len(content)} bytes): '
+        f'json + JSONRenderer {stdlib_seconds / number * 1e6:.0f}us, '
+        f'orjson {fast_seconds / number * 1e6:.0f}us per request'
+    )
@@ -0,0 +1,105 @@
+from unittest import mock
+
+import pytest
+from django.core.cache import caches
+
+from core import helpers, middleware, request_cache
+
+
+@pytest.fixture
+def current_request_cache():
+    token = request_cache.request_caches.set({})
+    yield request_cache.get_cache()
+    request_cache.request_caches.reset(token)
+
+
+def test_cache_outside_request_is_the_cache():
+    assert request_cache.get_cache() is caches['default']
+
+
+def test_get_remembers_values(current_request_cache):
+    caches['default'].set('key', 'value')
+
+    with mock.patch.object(caches['default'], 'get', wraps=caches['default'].get) as mock_get:
+        assert request_cache.cache.get('key') == 'value'
+        assert request_cache.cache.get('key') == 'value'
+
+    assert mock_get.call_count == 1
+
+
+def test_get_does_not_remember_misses(current_request_cache):
+    assert request_cache.cache.get('key') is None
+
+    caches['default'].set('key', 'value')
+
+    assert request_cache.cache.get('key') == 'value'
+
+
+def test_prefetch_fetches_keys_in_one_round_trip(current_request_cache):
+    caches['default'].set('one', 1)
+
+    with mock.patch.object(caches['default'], 'get_many', wraps=caches['default'].get_many) as mock_get_many:
+        current_request_cache.prefetch(['one', 'two'])
+        with mock.patch.object(caches['default'], 'get') as mock_get:
+            assert request_cache.cache.get('one') == 1
+            assert request_cache.cache.get('two', 'default') == 'default'
+            assert request_cache.cache.get_many(['one', 'two']) == {'one': 1}
+
+    assert mock_get_many.call_count == 1
+    assert mock_get.call_count == 0
+
+
+def test_sets_are_buffered_until_flushed(current_request_cache):
+    request_cache.cache.set('one', 1, timeout=10)
+    request_cache.cache.set('two', 2, timeout=10)
+    request_cache.cache.set('three', 3, timeout=20)
+
+    assert request_cache.cache.get('one') == 1
+    assert caches['default'].get('one') is None
+
+    with mock.patch.object(caches['default'], 'set_many', wraps=caches['default'].set_many) as mock_set_many:
+        current_request_cache.flush()
+
+    assert mock_set_many.call_args_list == [
+        mock.call({'one': 1, 'two': 2}, timeout=10),
+        mock.call({'three': 3}, timeout=20),
+    ]
+    assert caches['default'].get_many(['one', 'two', 'three']) == {'one': 1, 'two': 2, 'three': 3}
+
+
+def test_delete_drops_buffered_write(current_request_cache):
+    caches['default'].set('key', 'old')
+    request_cache.cache.set('key', 'new')
+
+    request_cache.cache.delete('key')
+    current_request_cache.flush()
+
+    assert request_cache.cache.get('key') is None
+    assert caches['default'].get('key') is None
+
+
+def test_incr_is_not_buffered(current_request_cache):
+    assert request_cache.cache.add('key', 1) is True
+    assert request_cache.cache.incr('key') == 2
+
+    assert caches['default'].get('key') == 2
+
+
+def test_middleware_prefetches_and_flushes(rf, settings):
+    settings.SSO_SESSION_COOKIE = 'sso_session'
+    session_key = helpers.get_session_cache_key(helpers.CACHE_KEY_SSO_SESSION_USER, '123')
+    caches['default'].set(session_key, {'id': 1})
+    request = rf.get('/')
+    request.COOKIES['sso_session'] = '123'
+
+    def get_response(request):
+        assert request_cache.cache.get(session_key) == {'id': 1}
+        request_cache.cache.set('key', 'value')
+        return mock.Mock()
+
+    with mock.patch.object(caches['default'], 'get_many', wraps=caches['default'].get_many) as mock_get_many:
+        middleware.RequestCacheMiddleware(get_response)(request)
+
+    assert mock_get_many.call_args == mock.call([session_key])
+    assert caches['default'].get('key') == 'value'
+    assert request_cache.request_caches.get() is None
@@ -0,0 +1,89 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from core import storage
+
+
+@pytest.fixture
+def temporary_storage(tmp_path, settings):
+    settings.WIZARD_FILE_STORAGE = 'core.storage.TemporaryFileSystemStorage'
+    settings.WIZARD_FILE_STORAGE_LOCATION = str(tmp_path)
+    settings.WIZARD_FILE_STORAGE_TTL_SECONDS = 60
+    return storage.get_wizard_file_storage()
+
+
+def test_temporary_storage_round_trip(temporary_storage, tmp_path):
+    name = temporary_storage.save('image.png', ContentFile(b'data'))
+
+    assert temporary_storage.open(name).read() == b'data'
+    assert os.path.dirname(temporary_storage.path(name)) == str(tmp_path)
+
+    temporary_storage.delete(name)
+
+    assert temporary_storage.exists(name) is False
+
+
+def test_temporary_storage_delete_expired(temporary_storage):
+    old_name = temporary_storage.save('old.png', ContentFile(b'old'))
+    new_name = temporary_storage.save('new.png', ContentFile(b'new'))
+    an_hour_ago = time.time() - 60 * 60
+    os.utime(temporary_storage.path(old_name), (an_hour_ago, an_hour_ago))
+
+    assert temporary_storage.delete_expired() == 1
+    assert temporary_storage.exists(old_name) is False
+    assert temporary_storage.exists(new_name) is True
+
+
+def test_temporary_storage_sweeps_on_save(temporary_storage):
+    old_name = temporary_storage.save('old.png', ContentFile(b'old'))
+    an_hour_ago = time.time() - 60 * 60
+    os.utime(temporary_storage.path(old_name), (an_hour_ago, an_hour_ago))
+
+    storage.TemporaryFileSystemStorage.last_swept = 0
+    temporary_storage.save('new.png', ContentFile(b'new'))
+
+    assert temporary_storage.exists(old_name) is False
+
+
+def test_clear_expired_wizard_files(temporary_storage):
+    name = temporary_storage.save('old.png', ContentFile(b'old'))
+    an_hour_ago = time.time() - 60 * 60
+    os.utime(temporary_storage.path(name), (an_hour_ago, an_hour_ago))
+
+    call_command('clear_expired_wizard_files')
+
+    assert temporary_storage.exists(name) is False
+
+
+def test_cache_storage_round_trip(settings):
+    settings.WIZARD_FILE_STORAGE = 'core.storage.CacheStorage'
+    file_storage = storage.get_wizard_file_storage()
+
+    name = file_storage.save('image.png', ContentFile(b'data'))
+
+    assert file_storage.exists(name) is True
+    assert file_storage.size(name) == 4
+    assert file_storage.open(name).read() == b'data'
+    assert file_storage.save('image.png', ContentFile(b'other')) != name
+
+    file_storage.delete(name)
+
+    assert file_storage.exists(name) is False
+    with pytest.raises(FileNotFoundError):
+        file_storage.open(name)
+
+
+def test_cache_storage_exists_does_not_fetch_file(settings):
+    settings.WIZARD_FILE_STORAGE = 'core.storage.CacheStorage'
+    file_storage = storage.get_wizard_file_storage()
+    name = file_storage.save('image.png', ContentFile(b'data'))
+
+    with mock.patch.object(file_storage.cache, 'get') as mock_get:
+        assert file_storage.exists(name) is True
+
+    assert mock_get.call_count == 0
@@ -0,0 +1,420 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+from directory_api_client.client import DirectoryAPIClient
+from django.http import HttpResponse
+from django.urls import reverse
+from requests.auth import HTTPBasicAuth
+
+from core import healthcheck, middleware, transport
+from core.tests.helpers import create_response
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    transport.registry.clear()
+    transport.hedger.clear()
+    yield
+    transport.registry.clear()
+    transport.hedger.clear()
+
+
+@pytest.fixture
+def mock_adapter_send():
+    def side_effect(request, **kwargs):
+        response = create_response()
+        response.request = request
+        response.url = request.url
+        response.headers['Set-Cookie'] = 'sessionid=abc; Path=/'
+        return response
+
+    patch = mock.patch('requests.adapters.HTTPAdapter.send', side_effect=side_effect)
+    yield patch.start()
+    patch.stop()
+
+
+def test_install_routes_sub_clients_through_registry(mock_adapter_send):
+    client = DirectoryAPIClient(base_url='http://api.example.com', api_key='debug', sender_id='debug', timeout=7)
+
+    transport.install(client)
+    client.company.profile_retrieve('123')
+    client.supplier.retrieve_profile(1)
+
+    assert mock_adapter_send.call_count == 2
+    request = mock_adapter_send.call_args[0][0]
+    assert request.url == 'http://api.example.com/supplier/1/'
+    assert 'X-Signature' in request.headers
+    assert mock_adapter_send.call_args[1]['timeout'] == 7
+    assert list(transport.registry.sessions) == ['api.example.com']
+
+
+def test_session_shared_per_host(mock_adapter_send):
+    session_one = transport.registry.get_session('http://one.example.com/a/')
+    session_two = transport.registry.get_session('http://ONE.example.com/b/')
+    session_three = transport.registry.get_session('http://two.example.com/a/')
+
+    assert session_one is session_two
+    assert session_one is not session_three
+
+
+def test_session_host_config(settings):
+    settings.HTTP_TRANSPORT_POOL_MAXSIZE = 3
+    settings.HTTP_TRANSPORT_HOSTS = {'two.example.com': {'pool_maxsize': 12, 'max_retries': 2}}
+
+    adapter_one = transport.registry.get_session('http://one.example.com').get_adapter('http://one.example.com')
+    adapter_two = transport.registry.get_session('http://two.example.com').get_adapter('http://two.example.com')
+
+    assert adapter_one._pool_maxsize == 3
+    assert adapter_one.max_retries.total == 0
+    assert adapter_two._pool_maxsize == 12
+    assert adapter_two.max_retries.total == 2
+    assert 'POST' not in adapter_two.max_retries.allowed_methods
+
+
+def test_host_timeout_overrides_client_timeout(mock_adapter_send, settings):
+    settings.HTTP_TRANSPORT_HOSTS = {'one.example.com': {'timeout': 2}}
+
+    transport.get('http://one.example.com/', timeout=10)
+    transport.get('http://two.example.com/', timeout=10)
+
+    assert mock_adapter_send.call_args_list[0][1]['timeout'] == 2
+    assert mock_adapter_send.call_args_list[1][1]['timeout'] == 10
+
+
+def test_session_does_not_persist_cookies(mock_adapter_send):
+    transport.get('http://one.example.com/')
+    transport.get('http://one.example.com/')
+
+    assert len(transport.registry.get_session('http://one.example.com/').cookies) == 0
+    assert 'Cookie' not in mock_adapter_send.call_args[0][0].headers
+
+
+def test_get_passes_params_and_auth(mock_adapter_send):
+    transport.get('http://one.example.com/find/', params={'a': 1}, auth=HTTPBasicAuth('api-key', 'debug'))
+
+    request = mock_adapter_send.call_args[0][0]
+    assert request.url == 'http://one.example.com/find/?a=1'
+    assert request.headers['Authorization'].startswith('Basic ')
+
+
+def test_stats_reports_saturation(settings):
+    settings.HTTP_TRANSPORT_POOL_MAXSIZE = 1
+    calls = []
+
+    def side_effect(request, **kwargs):
+        calls.append(request)
+        if len(calls) == 1:
+            # a second request starts while the first is still in flight
+            transport.get('http://one.example.com/other/')
+        return create_response()
+
+    with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=side_effect):
+        transport.get('http://one.example.com/')
+
+    assert transport.registry.stats() == {
+        'one.example.com': {'pool_maxsize': 1, 'in_flight': 0, 'peak_in_flight': 2, 'requests': 2, 'saturated': 1}
+    }
+
+
+def test_stats_in_flight_released_on_error():
+    with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=requests.ConnectionError):
+        with pytest.raises(requests.ConnectionError):
+            transport.get('http://one.example.com/')
+
+    assert transport.registry.stats()['one.example.com']['in_flight'] == 0
+
+
+def test_healthcheck_backend_reports_stats(mock_adapter_send):
+    transport.get('http://one.example.com/')
+    backend = healthcheck.HTTPTransportBackend()
+
+    backend.run_check()
+
+    assert backend.status == 1
+    assert backend.pretty_status() == 'one.example.com: 0/10 in flight, peak 1, 1 requests, 0 saturated'
+
+
+def test_get_coalesces_identical_concurrent_requests(mock_adapter_send):
+    with mock.patch.object(transport.helpers.single_flight, 'do', wraps=transport.helpers.single_flight.do) as mock_do:
+        transport.get('http://one.example.com/', params={'a': 1})
+
+    assert mock_do.call_count == 1
+    assert mock_do.call_args[1]['across_processes'] is False
+
+
+@pytest.mark.parametrize(
+    'headers_one,headers_two,is_same',
+    [
+        ({'X-Signature': 'a'}, {'X-Signature': 'b'}, True),
+        ({'Authorization': 'SSO_SESSION_ID 1'}, {'Authorization': 'SSO_SESSION_ID 2'}, False),
+    ],
+)
+def test_single_flight_key(headers_one, headers_two, is_same):
+    request_one = requests.Request('GET', 'http://one.example.com/', headers=headers_one).prepare()
+    request_two = requests.Request('GET', 'http://one.example.com/', headers=headers_two).prepare()
+
+    key_one = transport.registry.get_single_flight_key(request_one)
+    key_two = transport.registry.get_single_flight_key(request_two)
+
+    assert (key_one == key_two) is is_same
+    assert 'SSO_SESSION_ID' not in key_one
+
+
+def test_single_flight_not_used_for_writes(mock_adapter_send, settings):
+    with mock.patch.object(transport.helpers.single_flight, 'do') as mock_do:
+        transport.registry.send(requests.Request('POST', 'http://one.example.com/').prepare())
+
+    assert mock_do.call_count == 0
+    assert mock_adapter_send.call_count == 1
+
+
+def test_extra_headers(mock_adapter_send):
+    with transport.extra_headers({'If-None-Match': '"1"'}):
+        with transport.extra_headers({'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}):
+            transport.get('http://one.example.com/')
+    transport.get('http://one.example.com/')
+
+    headers_one = mock_adapter_send.call_args_list[0][0][0].headers
+    headers_two = mock_adapter_send.call_args_list[1][0][0].headers
+    assert headers_one['If-None-Match'] == '"1"'
+    assert headers_one['If-Modified-Since'] == 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert 'If-None-Match' not in headers_two
+
+
+def test_deadline_cuts_timeout(mock_adapter_send):
+    with transport.deadline(3):
+        transport.get('http://one.example.com/', timeout=10)
+        transport.get('http://one.example.com/', timeout=(1, 10))
+    transport.get('http://one.example.com/', timeout=10)
+
+    assert 2.5 < mock_adapter_send.call_args_list[0][1]['timeout'] <= 3
+    assert mock_adapter_send.call_args_list[1][1]['timeout'][0] == 1
+    assert 2.5 < mock_adapter_send.call_args_list[1][1]['timeout'][1] <= 3
+    assert mock_adapter_send.call_args_list[2][1]['timeout'] == 10
+
+
+def test_deadline_nested_keeps_earliest(mock_adapter_send):
+    with transport.deadline(3):
+        with transport.deadline(60):
+            transport.get('http://one.example.com/')
+
+    assert mock_adapter_send.call_args[1]['timeout'] <= 3
+
+
+def test_deadline_exceeded_fails_fast(mock_adapter_send):
+    with transport.deadline(-1):
+        with pytest.raises(transport.DeadlineExceeded):
+            transport.get('http://one.example.com/')
+
+    assert mock_adapter_send.call_count == 0
+
+
+@pytest.mark.parametrize(
+    'url,expected',
+    [('/profile/business-profile/', 5), ('/profile/enrol/', 20), ('/profile/not-found/', 20)],
+)
+def test_deadline_middleware_budget_per_url_name(rf, settings, url, expected):
+    settings.UPSTREAM_DEADLINE_SECONDS = 20
+    settings.UPSTREAM_DEADLINE_URL_BUDGETS = {'business-profile': 5}
+    deadlines = []
+
+    def get_response(request):
+        deadlines.append(transport.request_deadline.get() - time.monotonic())
+        return HttpResponse()
+
+    middleware.UpstreamDeadlineMiddleware(get_response)(rf.get(url))
+
+    assert expected - 1 < deadlines[0] <= expected
+    assert transport.request_deadline.get() is None
+
+
+def test_deadline_exceeded_fails_request(client, settings, user):
+    settings.UPSTREAM_DEADLINE_SECONDS = -1
+    client.force_login(user)
+
+    with mock.patch('requests.adapters.HTTPAdapter.send') as mock_send:
+        with pytest.raises(transport.DeadlineExceeded):
+            client.get(reverse('business-profile'))
+
+    assert mock_send.call_count == 0
+
+
+@pytest.fixture
+def mock_slow_first_attempt(settings):
+    settings.HEDGED_REQUESTS_ENABLED = True
+    calls = []
+
+    def side_effect(request, **kwargs):
+        calls.append(request)
+        if len(calls) == 1:
+            time.sleep(0.3)
+        response = create_response({'attempt': len(calls)})
+        response.request = request
+        return response
+
+    patch = mock.patch('requests.adapters.HTTPAdapter.send', side_effect=side_effect)
+    yield patch.start()
+    patch.stop()
+
+
+def prime_latencies(name, settings, latency=0.01):
+    transport.hedger.latencies[name].extend([latency] * settings.HEDGED_REQUESTS_MIN_SAMPLES)
+
+
+def test_hedged_request_second_attempt_wins(mock_slow_first_attempt, settings):
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    prime_latencies('example', settings)
+
+    with transport.hedged('example'):
+        response = transport.get('http://one.example.com/')
+
+    assert response.json() == {'attempt': 2}
+    assert mock_slow_first_attempt.call_count == 2
+    assert transport.hedger.stats()['example'] == {'p90': 0.01, 'requests': 1, 'hedged': 1, 'hedge_won': 1}
+
+
+def test_hedged_request_fast_first_attempt_not_hedged(mock_adapter_send, settings):
+    settings.HEDGED_REQUESTS_ENABLED = True
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    prime_latencies('example', settings, latency=5)
+
+    with transport.hedged('example'):
+        transport.get('http://one.example.com/')
+
+    assert mock_adapter_send.call_count == 1
+    assert transport.hedger.stats()['example']['hedged'] == 0
+
+
+def test_hedged_request_rate_capped(mock_slow_first_attempt, settings):
+    settings.HEDGED_REQUESTS_MAX_RATE = 0.1
+    prime_latencies('example', settings)
+
+    with transport.hedged('example'):
+        response = transport.get('http://one.example.com/')
+
+    assert response.json() == {'attempt': 1}
+    assert mock_slow_first_attempt.call_count == 1
+
+
+def test_hedged_request_needs_samples(mock_slow_first_attempt, settings):
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+
+    with transport.hedged('example'):
+        transport.get('http://one.example.com/')
+
+    assert mock_slow_first_attempt.call_count == 1
+    assert len(transport.hedger.latencies['example']) == 1
+    assert transport.hedger.stats()['example']['hedged'] == 0
+
+
+def test_hedged_request_warms_up_from_real_requests(settings):
+    settings.HEDGED_REQUESTS_ENABLED = True
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    settings.HEDGED_REQUESTS_MIN_SAMPLES = 3
+    calls = []
+
+    def side_effect(request, **kwargs):
+        calls.append(request)
+        if len(calls) == 4:
+            # the first attempt of the fourth request is slow
+            time.sleep(0.3)
+        response = create_response({'attempt': len(calls)})
+        response.request = request
+        return response
+
+    with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=side_effect):
+        with transport.hedged('example'):
+            for _ in range(4):
+                response = transport.get('http://one.example.com/')
+
+    assert response.json() == {'attempt': 5}
+    assert transport.hedger.stats()['example']['hedged'] == 1
+
+
+def test_hedged_request_only_for_idempotent_methods(mock_slow_first_attempt, settings):
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    prime_latencies('example', settings)
+
+    prepared_request = requests.Request('POST', 'http://one.example.com/').prepare()
+
+    with transport.hedged('example'):
+        transport.registry.send(prepared_request)
+
+    assert mock_slow_first_attempt.call_count == 1
+    assert 'example' not in transport.hedger.stats()
+
+
+def test_hedged_request_disabled(mock_slow_first_attempt, settings):
+    settings.HEDGED_REQUESTS_ENABLED = False
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    prime_latencies('example', settings)
+
+    with transport.hedged('example'):
+        transport.get('http://one.example.com/')
+
+    assert mock_slow_first_attempt.call_count == 1
+
+
+def test_hedged_request_errored_attempt_not_used(settings):
+    settings.HEDGED_REQUESTS_ENABLED = True
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    prime_latencies('example', settings)
+    calls = []
+
+    def side_effect(request, **kwargs):
+        calls.append(request)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            return create_response({'attempt': 1})
+        raise requests.ConnectionError()
+
+    with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=side_effect):
+        with transport.hedged('example'):
+            response = transport.get('http://one.example.com/')
+
+    assert response.json() == {'attempt': 1}
+
+
+def test_hedged_request_keeps_deadline(mock_slow_first_attempt, settings):
+    settings.HEDGED_REQUESTS_MAX_RATE = 1
+    prime_latencies('example', settings)
+
+    with transport.deadline(3):
+        with transport.hedged('example'):
+            transport.get('http://one.example.com/', timeout=10)
+
+    for call in mock_slow_first_attempt.call_args_list:
+        assert call[1]['timeout'] <= 3
+
+
+def test_bulkhead_rejects_calls_over_limit(settings):
+    settings.HTTP_TRANSPORT_HOSTS = {'one.example.com': {'max_concurrency': 1}}
+
+    def side_effect(request, **kwargs):
+        if request.url == 'http://one.example.com/':
+            # more calls start while the first is still waiting on the host
+            with pytest.raises(transport.BulkheadFull):
+                transport.get('http://one.example.com/other/')
+            transport.get('http://two.example.com/')
+        return create_response()
+
+    with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=side_effect) as mock_send:
+        transport.get('http://one.example.com/')
+        transport.get('http://one.example.com/other/')
+
+    assert mock_send.call_count == 3
+    assert transport.registry.bulkhead_stats() == {
+        'one.example.com': {'max_concurrency': 1, 'in_use': 0, 'rejected': 1}
+    }
+
+
+def test_healthcheck_bulkhead_backend_reports_stats(mock_adapter_send, settings):
+    settings.HTTP_TRANSPORT_HOSTS = {'one.example.com': {'max_concurrency': 4}}
+    transport.get('http://one.example.com/')
+    backend = healthcheck.BulkheadBackend()
+
+    backend.run_check()
+
+    assert backend.pretty_status() == 'one.example.com: 0/4 in use, 0 rejected'
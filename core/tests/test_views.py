@@ -3,8 +3,9 @@ from unittest import mock
 import pytest
 import requests
 from django.urls import reverse
+from freezegun import freeze_time
 
-from core import views
+from core import helpers, transport, views
 from core.tests.helpers import create_response
 
 SIGN_OUT_LABEL = '>Sign out<'
@@ -30,7 +31,7 @@ def test_companies_house_search_api_error(mock_search, client, settings):
 @mock.patch('core.views.ch_search_api_client.company.search_companies')
 def test_companies_house_search_api_success(mock_search, client, settings):
 
-    mock_search.return_value = create_response({'items': [{'name': 'Smashing corp'}]})
+    mock_search.return_value = create_response(content=b'{"items": [{"name": "Smashing corp"}]}')
     url = reverse('api:companies-house-search')
 
     response = client.get(url, data={'term': 'thing'})
@@ -42,7 +43,7 @@ def test_companies_house_search_api_success(mock_search, client, settings):
 @mock.patch('core.views.ch_search_api_client.company.search_companies')
 def test_companies_house_search(mock_search, client, settings):
 
-    mock_search.return_value = create_response({'items': [{'name': 'Smashing corp'}]})
+    mock_search.return_value = create_response(content=b'{"items": [{"name": "Smashing corp"}]}')
     url = reverse('api:companies-house-search')
 
     response = client.get(url, data={'term': 'thing'})
@@ -51,7 +52,35 @@ def test_companies_house_search(mock_search, client, settings):
     assert response.content == b'[{"name":"Smashing corp"}]'
 
 
-@mock.patch('core.views.requests.get')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_companies_house_search_caches_partial_profiles(mock_search, client, settings):
+    settings.COMPANIES_HOUSE_PARTIAL_PROFILE_CACHE_SECONDS = 20
+    mock_search.return_value = create_response(
+        content=(
+            b'{"items": [{"company_number": "123", "title": "Smashing corp", "company_status": "active", '
+            b'"date_of_creation": "2001-01-20", "address_snippet": "1 Fake St"}, {"title": "No number"}]}'
+        )
+    )
+
+    with mock.patch.object(helpers.cache, 'set_many', wraps=helpers.cache.set_many) as mock_set_many:
+        response = client.get(reverse('api:companies-house-search'), data={'term': 'thing'})
+
+    assert response.status_code == 200
+    assert mock_set_many.call_count == 1
+    assert mock_set_many.call_args == mock.call(
+        {
+            'COMPANY_PROFILE_PARTIAL-123': {
+                'company_number': '123',
+                'company_name': 'Smashing corp',
+                'company_status': 'active',
+                'date_of_creation': '2001-01-20',
+            }
+        },
+        timeout=20,
+    )
+
+
+@mock.patch('core.views.transport.get')
 def test_address_lookup_bad_postcode(mock_get, client):
     mock_get.return_value = create_response(status_code=400)
     url = reverse('api:postcode-search')
@@ -62,7 +91,7 @@ def test_address_lookup_bad_postcode(mock_get, client):
     assert response.content == b'[]'
 
 
-@mock.patch('core.views.requests.get')
+@mock.patch('core.views.transport.get')
 def test_address_lookup_not_ok(mock_get, client):
     mock_get.return_value = create_response(status_code=500)
     url = reverse('api:postcode-search')
@@ -71,7 +100,16 @@ def test_address_lookup_not_ok(mock_get, client):
         client.get(url, data={'postcode': '21313'})
 
 
-@mock.patch('core.views.requests.get')
+@pytest.mark.parametrize('error_class', [transport.BulkheadFull, transport.DeadlineExceeded, requests.ReadTimeout])
+def test_address_lookup_rejected_or_timed_out(error_class, client):
+    with mock.patch('core.views.transport.get', side_effect=error_class):
+        response = client.get(reverse('api:postcode-search'), data={'postcode': '21313'})
+
+    assert response.status_code == 200
+    assert response.content == b'[]'
+
+
+@mock.patch('core.views.transport.get')
 def test_address_lookup_ok(mock_get, client):
     mock_get.return_value = create_response({'addresses': ['1 A road, , , , Ashire', '2 B road, , , , Bshire']})
     url = reverse('api:postcode-search')
@@ -85,6 +123,126 @@ def test_address_lookup_ok(mock_get, client):
     )
 
 
+@pytest.mark.parametrize(
+    'url_name,data', [('api:companies-house-search', {'term': 'a'}), ('api:postcode-search', {'postcode': 'W1 1'})]
+)
+@mock.patch('core.views.transport.get')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_too_short(mock_search, mock_get, url_name, data, client):
+    response = client.get(reverse(url_name), data=data)
+
+    assert response.status_code == 200
+    assert response.content == b'[]'
+    assert mock_search.call_count == 0
+    assert mock_get.call_count == 0
+
+
+@pytest.mark.parametrize(
+    'url_name,data', [('api:companies-house-search', {'term': 'thing'}), ('api:postcode-search', {'postcode': 'W11AA'})]
+)
+@mock.patch('core.views.transport.get')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_throttled(mock_search, mock_get, url_name, data, client, settings):
+    settings.SEARCH_THROTTLE_CAPACITY = 2
+    settings.SEARCH_THROTTLE_REFILL_RATE = 1
+    mock_search.return_value = create_response(content=b'{"items": []}')
+    mock_get.return_value = create_response({'addresses': []})
+
+    with freeze_time('2020-01-01 12:00:00') as frozen_time:
+        responses = [client.get(reverse(url_name), data=data) for _ in range(3)]
+        frozen_time.tick(1)
+        response_after_refill = client.get(reverse(url_name), data=data)
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[2]['Retry-After'] == '1'
+    assert response_after_refill.status_code == 200
+    assert mock_search.call_count + mock_get.call_count == 3
+
+
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_throttle_buckets_per_endpoint(mock_search, client, settings):
+    settings.SEARCH_THROTTLE_CAPACITY = 1
+    mock_search.return_value = create_response(content=b'{"items": []}')
+
+    with mock.patch('core.views.transport.get', return_value=create_response({'addresses': []})):
+        response_one = client.get(reverse('api:companies-house-search'), data={'term': 'thing'})
+        response_two = client.get(reverse('api:postcode-search'), data={'postcode': 'W11AA'})
+
+    assert response_one.status_code == 200
+    assert response_two.status_code == 200
+
+
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_throttle_ignores_rotated_cookies(mock_search, client, settings):
+    settings.SEARCH_THROTTLE_CAPACITY = 1
+    mock_search.return_value = create_response(content=b'{"items": []}')
+    url = reverse('api:companies-house-search')
+
+    client.cookies[settings.CSRF_COOKIE_NAME] = 'one'
+    response_one = client.get(url, data={'term': 'thing'})
+    client.cookies[settings.CSRF_COOKIE_NAME] = 'two'
+    response_two = client.get(url, data={'term': 'thing'})
+
+    assert response_one.status_code == 200
+    assert response_two.status_code == 429
+
+
+@mock.patch('core.views.time.sleep')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_latest_query_wins_superseded_before_upstream(mock_search, mock_sleep, client, settings):
+    settings.SEARCH_LATEST_QUERY_WINS = True
+    mock_sleep.side_effect = lambda seconds: helpers.register_latest_query(
+        'CompaniesHouseSearchAPIView-'
+        + helpers.get_client_ident(mock.Mock(COOKIES={}, META={'REMOTE_ADDR': '127.0.0.1'}))
+    )
+
+    response = client.get(reverse('api:companies-house-search'), data={'term': 'thin'})
+
+    assert response.status_code == 200
+    assert response.content == b'[]'
+    assert mock_search.call_count == 0
+
+
+@mock.patch('core.views.time.sleep')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_latest_query_wins_superseded_during_upstream(mock_search, mock_sleep, client, settings):
+    settings.SEARCH_LATEST_QUERY_WINS = True
+
+    def newer_search_arrives(query):
+        helpers.register_latest_query(
+            'CompaniesHouseSearchAPIView-'
+            + helpers.get_client_ident(mock.Mock(COOKIES={}, META={'REMOTE_ADDR': '127.0.0.1'}))
+        )
+        return create_response(content=b'{"items": [{"name": "Smashing corp"}]}')
+
+    mock_search.side_effect = newer_search_arrives
+
+    response = client.get(reverse('api:companies-house-search'), data={'term': 'thin'})
+
+    assert response.content == b'[]'
+    assert mock_search.call_count == 1
+
+
+@mock.patch('core.views.time.sleep')
+@mock.patch('core.views.ch_search_api_client.company.search_companies')
+def test_search_latest_query_wins_latest(mock_search, mock_sleep, client, settings):
+    settings.SEARCH_LATEST_QUERY_WINS = True
+    settings.SEARCH_DEBOUNCE_SECONDS = 0.2
+    mock_search.return_value = create_response(content=b'{"items": [{"name": "Smashing corp"}]}')
+
+    response = client.get(reverse('api:companies-house-search'), data={'term': 'thing'})
+
+    assert response.content == b'[{"name":"Smashing corp"}]'
+    assert mock_sleep.call_args == mock.call(0.2)
+
+
+def test_get_client_ident_includes_browser():
+    request_one = mock.Mock(COOKIES={'csrftoken': 'a'}, META={'REMOTE_ADDR': '127.0.0.1'})
+    request_two = mock.Mock(COOKIES={'csrftoken': 'b'}, META={'REMOTE_ADDR': '127.0.0.1'})
+
+    assert helpers.get_client_ident(request_one) != helpers.get_client_ident(request_two)
+
+
 def test_about_view_exposes_context_and_template(client):
     response = client.get(reverse('about'))
 
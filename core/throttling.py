@@ -0,0 +1,58 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+CACHE_KEY_THROTTLE = 'THROTTLE'
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Allow bursts of up to `capacity` requests per client, refilled at `refill_rate` per second.
+
+    The bucket is read and written without a lock, so concurrent requests
+    from the same client can occasionally spend the same token.
+
+    """
+
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    @property
+    def capacity(self):
+        return settings.SEARCH_THROTTLE_CAPACITY
+
+    @property
+    def refill_rate(self):
+        return settings.SEARCH_THROTTLE_REFILL_RATE
+
+    def get_cache_key(self, request, view):
+        # not the CSRF cookie, as a client could send a new one with each request to get a full bucket
+        return f'{CACHE_KEY_THROTTLE}-{self.scope}-{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        key = self.get_cache_key(request, view)
+        now = time.time()
+        tokens, updated = cache.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) / self.refill_rate
+            return False
+        # an untouched bucket is full again after this long, so can be forgotten
+        timeout = math.ceil(self.capacity / self.refill_rate)
+        cache.set(key, (tokens - 1, now), timeout=timeout)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class CompaniesHouseSearchThrottle(TokenBucketThrottle):
+    scope = 'companies-house-search'
+
+
+class AddressSearchThrottle(TokenBucketThrottle):
+    scope = 'address-search'
@@ -0,0 +1,396 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import hashlib
+import threading
+import time
+from concurrent import futures
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
+import directory_client_core.base
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core import helpers
+
+request_headers = contextvars.ContextVar('request_headers', default={})
+# name under which GETs are hedged, if hedging was opted into for the current call
+request_hedge_name = contextvars.ContextVar('request_hedge_name', default=None)
+# time.monotonic() by which every upstream call made for the current request must finish
+request_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+class BulkheadFull(requests.exceptions.RequestException):
+    pass
+
+
+def get_deadline_timeout(timeout):
+    """The timeout, cut down to the time left before the request's deadline."""
+
+    deadline = request_deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded('The deadline for upstream calls made by this request has passed')
+    if isinstance(timeout, tuple):
+        return tuple(remaining if value is None else min(float(value), remaining) for value in timeout)
+    return remaining if timeout is None else min(float(timeout), remaining)
+
+
+class TransportRegistry:
+    """One pooled session per upstream host, shared by every client in the process.
+
+    The stock directory clients create a new `requests.Session` for each
+    request, so every call pays for a fresh TCP and TLS handshake. Sessions
+    here are kept alive for the life of the process, with pool size, retry
+    policy and timeout configured per host in settings.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.in_flight = collections.Counter()
+        self.peak_in_flight = collections.Counter()
+        self.request_count = collections.Counter()
+        self.saturated_count = collections.Counter()
+        self.bulkheads = {}
+        self.bulkhead_in_use = collections.Counter()
+        self.bulkhead_rejected_count = collections.Counter()
+
+    @staticmethod
+    def get_host(url):
+        return urlparse(url).netloc.lower()
+
+    def get_host_config(self, host):
+        return {
+            'pool_connections': settings.HTTP_TRANSPORT_POOL_CONNECTIONS,
+            'pool_maxsize': settings.HTTP_TRANSPORT_POOL_MAXSIZE,
+            'max_retries': settings.HTTP_TRANSPORT_MAX_RETRIES,
+            'backoff_factor': settings.HTTP_TRANSPORT_BACKOFF_FACTOR,
+            'timeout': None,
+            'max_concurrency': None,
+            **settings.HTTP_TRANSPORT_HOSTS.get(host, {}),
+        }
+
+    def create_session(self, host):
+        config = self.get_host_config(host)
+        retry = Retry(
+            total=config['max_retries'],
+            backoff_factor=config['backoff_factor'],
+            status_forcelist=[502, 503, 504],
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=config['pool_connections'], pool_maxsize=config['pool_maxsize'], max_retries=retry
+        )
+        session = requests.Session()
+        # the session is shared between users, so cookies set by one response
+        # must never be sent with another user's request
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_session(self, url):
+        host = self.get_host(url)
+        with self.lock:
+            if host not in self.sessions:
+                self.sessions[host] = self.create_session(host)
+            return self.sessions[host]
+
+    @contextlib.contextmanager
+    def bulkhead(self, host):
+        """Limit the worker threads waiting on the host at once, so a slow host cannot tie them all up."""
+
+        max_concurrency = self.get_host_config(host)['max_concurrency']
+        if max_concurrency is None:
+            yield
+            return
+        with self.lock:
+            if host not in self.bulkheads:
+                self.bulkheads[host] = threading.BoundedSemaphore(max_concurrency)
+            semaphore = self.bulkheads[host]
+        if not semaphore.acquire(blocking=False):
+            with self.lock:
+                self.bulkhead_rejected_count[host] += 1
+            raise BulkheadFull(f'Too many concurrent requests to {host}')
+        with self.lock:
+            self.bulkhead_in_use[host] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.bulkhead_in_use[host] -= 1
+            semaphore.release()
+
+    def send(self, prepared_request, timeout=None):
+        with self.bulkhead(self.get_host(prepared_request.url)):
+            return self.send_guarded(prepared_request, timeout=timeout)
+
+    def send_guarded(self, prepared_request, timeout=None):
+        # fail fast, rather than waiting on a call that would be cut short anyway
+        get_deadline_timeout(timeout)
+        prepared_request.headers.update(request_headers.get())
+
+        def func():
+            hedge_name = request_hedge_name.get()
+            # only idempotent requests can safely be sent twice
+            if hedge_name and settings.HEDGED_REQUESTS_ENABLED and prepared_request.method in ('GET', 'HEAD'):
+                return hedger.send(
+                    name=hedge_name,
+                    func=lambda request: self.send_pooled(request, timeout=timeout),
+                    prepared_request=prepared_request,
+                )
+            return self.send_pooled(prepared_request, timeout=timeout)
+
+        if prepared_request.method == 'GET' and settings.SINGLE_FLIGHT_ENABLED:
+            return helpers.single_flight.do(
+                key=self.get_single_flight_key(prepared_request),
+                func=func,
+                across_processes=settings.SINGLE_FLIGHT_ACROSS_PROCESSES,
+                lock_timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+                result_timeout=settings.SINGLE_FLIGHT_RESULT_TIMEOUT,
+            )
+        return func()
+
+    @staticmethod
+    def get_single_flight_key(prepared_request):
+        # the signature headers differ on every request so are not part of the
+        # key, but the Authorization header is: users never share a response.
+        # Conditional requests only share with identical conditional requests.
+        headers = prepared_request.headers
+        value = ' '.join(
+            [
+                prepared_request.url,
+                headers.get('Authorization', ''),
+                headers.get('If-None-Match', ''),
+                headers.get('If-Modified-Since', ''),
+            ]
+        )
+        return hashlib.sha256(value.encode()).hexdigest()
+
+    def send_pooled(self, prepared_request, timeout=None):
+        host = self.get_host(prepared_request.url)
+        session = self.get_session(prepared_request.url)
+        config = self.get_host_config(host)
+        timeout = get_deadline_timeout(config['timeout'] or timeout)
+        with self.lock:
+            if self.in_flight[host] >= config['pool_maxsize']:
+                self.saturated_count[host] += 1
+            self.in_flight[host] += 1
+            self.request_count[host] += 1
+            self.peak_in_flight[host] = max(self.peak_in_flight[host], self.in_flight[host])
+        try:
+            return session.send(prepared_request, timeout=timeout)
+        finally:
+            with self.lock:
+                self.in_flight[host] -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                host: {
+                    'pool_maxsize': self.get_host_config(host)['pool_maxsize'],
+                    'in_flight': self.in_flight[host],
+                    'peak_in_flight': self.peak_in_flight[host],
+                    'requests': self.request_count[host],
+                    'saturated': self.saturated_count[host],
+                }
+                for host in self.sessions
+            }
+
+    def bulkhead_stats(self):
+        with self.lock:
+            return {
+                host: {
+                    'max_concurrency': self.get_host_config(host)['max_concurrency'],
+                    'in_use': self.bulkhead_in_use[host],
+                    'rejected': self.bulkhead_rejected_count[host],
+                }
+                for host in self.bulkheads
+            }
+
+    def clear(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+            self.in_flight.clear()
+            self.peak_in_flight.clear()
+            self.request_count.clear()
+            self.saturated_count.clear()
+            self.bulkheads.clear()
+            self.bulkhead_in_use.clear()
+            self.bulkhead_rejected_count.clear()
+
+
+registry = TransportRegistry()
+
+
+class Hedger:
+    """Hedged requests for idempotent GETs.
+
+    If the first attempt has not answered within the observed p90 latency of
+    requests of the same name, an identical second attempt is sent and
+    whichever answers first is used. Hedges are limited to
+    HEDGED_REQUESTS_MAX_RATE of requests, with a small burst allowance, so
+    upstream load stays bounded when the upstream is slow for everyone.
+
+    """
+
+    max_tokens = 5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=settings.HEDGED_REQUESTS_MAX_WORKERS, thread_name_prefix='hedged-request'
+        )
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=settings.HEDGED_REQUESTS_LATENCY_WINDOW)
+        )
+        self.tokens = collections.Counter()
+        self.request_count = collections.Counter()
+        self.hedge_count = collections.Counter()
+        self.hedge_won_count = collections.Counter()
+
+    def get_delay(self, name):
+        with self.lock:
+            latencies = sorted(self.latencies[name])
+        if len(latencies) >= settings.HEDGED_REQUESTS_MIN_SAMPLES:
+            return latencies[int(0.9 * (len(latencies) - 1))]
+
+    def reserve_hedge(self, name):
+        with self.lock:
+            if self.tokens[name] < 1:
+                return False
+            self.tokens[name] -= 1
+            self.hedge_count[name] += 1
+            return True
+
+    def timed(self, name, func, prepared_request):
+        start = time.monotonic()
+        response = func(prepared_request)
+        with self.lock:
+            self.latencies[name].append(time.monotonic() - start)
+        return response
+
+    def submit(self, name, func, prepared_request):
+        # each attempt runs in a copy of the caller's context, so it keeps the caller's deadline
+        return self.executor.submit(contextvars.copy_context().run, self.timed, name, func, prepared_request)
+
+    def send(self, name, func, prepared_request):
+        with self.lock:
+            self.request_count[name] += 1
+            self.tokens[name] = min(self.tokens[name] + settings.HEDGED_REQUESTS_MAX_RATE, self.max_tokens)
+        delay = self.get_delay(name)
+        if delay is None:
+            # too few samples to know what slow is, so this request is one more
+            return self.timed(name, func, prepared_request)
+        first = self.submit(name, func, prepared_request)
+        try:
+            return first.result(timeout=delay)
+        except futures.TimeoutError:
+            if not self.reserve_hedge(name):
+                return first.result()
+        second = self.submit(name, func, prepared_request.copy())
+        attempts = futures.as_completed([first, second])
+        winner = next(attempts)
+        if winner.exception() is not None:
+            # an attempt that errored is not an answer while the other may still succeed
+            winner = next(attempts)
+        if winner is second:
+            with self.lock:
+                self.hedge_won_count[name] += 1
+        return winner.result()
+
+    def stats(self):
+        with self.lock:
+            names = list(self.request_count)
+        return {
+            name: {
+                'p90': self.get_delay(name),
+                'requests': self.request_count[name],
+                'hedged': self.hedge_count[name],
+                'hedge_won': self.hedge_won_count[name],
+            }
+            for name in names
+        }
+
+    def clear(self):
+        with self.lock:
+            self.latencies.clear()
+            self.tokens.clear()
+            self.request_count.clear()
+            self.hedge_count.clear()
+            self.hedge_won_count.clear()
+
+
+hedger = Hedger()
+
+
+@contextlib.contextmanager
+def extra_headers(headers):
+    """Add headers to every upstream request made within the block."""
+
+    token = request_headers.set({**request_headers.get(), **headers})
+    try:
+        yield
+    finally:
+        request_headers.reset(token)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Limit the total time spent on upstream calls made within the block."""
+
+    value = time.monotonic() + seconds
+    current = request_deadline.get()
+    token = request_deadline.set(value if current is None else min(current, value))
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+@contextlib.contextmanager
+def hedged(name):
+    """Hedge idempotent GETs made within the block, tracking their latency under the name."""
+
+    token = request_hedge_name.set(name)
+    try:
+        yield
+    finally:
+        request_hedge_name.reset(token)
+
+
+def get(url, params=None, auth=None, timeout=None):
+    prepared_request = requests.Request('GET', url, params=params, auth=auth).prepare()
+    return registry.send(prepared_request, timeout=timeout)
+
+
+def send(client, method, url, request=None, *args, **kwargs):
+    # mirrors directory_client_core.base.AbstractAPIClient.send, using the
+    # pooled session rather than creating a new one each time
+    prepared_request = requests.Request(method, url, *args, **kwargs).prepare()
+    signed_request = client.sign_request(prepared_request=prepared_request)
+    return registry.send(signed_request, timeout=client.timeout)
+
+
+def install(client):
+    """Route the client, and the clients hanging off it, through the registry."""
+
+    client.send = functools.partial(send, client)
+    for value in vars(client).values():
+        if isinstance(value, directory_client_core.base.AbstractAPIClient):
+            install(value)
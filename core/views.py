@@ -1,3 +1,5 @@
+import time
+
 import requests
 from directory_ch_client.client import ch_search_api_client
 from django.conf import settings
@@ -6,46 +8,108 @@ from requests.auth import HTTPBasicAuth
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
-from core import serializers
+from core import companies_house, helpers, postcodes, serializers, throttling, transport
 
 
-class CompaniesHouseSearchAPIView(GenericAPIView):
-    serializer_class = serializers.CompaniesHouseSearchSerializer
+class BaseSearchAPIView(GenericAPIView):
     permission_classes = []
     authentication_classes = []
+    query_field_name = None
+    min_query_length = None
 
     def get(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.GET)
         serializer.is_valid(raise_exception=True)
-        response = ch_search_api_client.company.search_companies(query=serializer.validated_data['term'])
-        response.raise_for_status()
-        return Response(response.json()['items'])
+        query = serializer.validated_data[self.query_field_name]
+        if len(query) < self.min_query_length:
+            # too short to give a useful result, so not worth spending upstream quota on
+            return Response([])
+        if settings.SEARCH_LATEST_QUERY_WINS:
+            return self.get_latest_query_response(query)
+        return Response(self.search(query))
+
+    def get_latest_query_response(self, query):
+        # each keystroke in the typeahead sends a search. Wait briefly for the
+        # next keystroke and only ask upstream if this is still the latest. The
+        # wait holds this worker thread, and an upstream call already under way
+        # is not cancelled, so see SEARCH_LATEST_QUERY_WINS before turning it on.
+        key = f'{type(self).__name__}-{helpers.get_client_ident(self.request)}'
+        token = helpers.register_latest_query(key)
+        time.sleep(settings.SEARCH_DEBOUNCE_SECONDS)
+        if not helpers.is_latest_query(key, token):
+            return Response([])
+        data = self.search(query)
+        if not helpers.is_latest_query(key, token):
+            # superseded while upstream was answering. The browser discards the result anyway.
+            return Response([])
+        return Response(data)
+
+    def search(self, query):
+        raise NotImplementedError
+
+
+class CompaniesHouseSearchAPIView(BaseSearchAPIView):
+    serializer_class = serializers.CompaniesHouseSearchSerializer
+    throttle_classes = [throttling.CompaniesHouseSearchThrottle]
+    query_field_name = 'term'
+
+    @property
+    def min_query_length(self):
+        return settings.SEARCH_COMPANIES_HOUSE_MIN_LENGTH
+
+    def search(self, query):
+        try:
+            response = ch_search_api_client.company.search_companies(query=query)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            # the snapshot can be a month old and only matches name prefixes, so it only
+            # stands in while Companies House is failing or throttling us
+            items = companies_house.index.search(query)
+            if items is None:
+                raise
+            return items
+        items = helpers.parse_json(response)['items']
+        helpers.cache_companies_house_search_results(items)
+        return items
 
 
-class AddressSearchAPIView(GenericAPIView):
+class AddressSearchAPIView(BaseSearchAPIView):
     serializer_class = serializers.AddressSearchSerializer
-    permission_classes = []
-    authentication_classes = []
+    throttle_classes = [throttling.AddressSearchThrottle]
+    query_field_name = 'postcode'
 
-    def get(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.GET)
-        serializer.is_valid(raise_exception=True)
-        postcode = serializer.validated_data['postcode']
-        response = requests.get(
-            f'https://api.getAddress.io/find/{postcode}/',
-            auth=HTTPBasicAuth('api-key', settings.GET_ADDRESS_API_KEY),
-            timeout=10,
-        )
+    @property
+    def min_query_length(self):
+        return settings.SEARCH_POSTCODE_MIN_LENGTH
+
+    def search(self, postcode):
+        extra = {}
+        if postcodes.index.is_available:
+            # unknown postcodes would only get a 400 from getAddress.io
+            known = postcodes.index.lookup(postcode)
+            if not known:
+                return []
+            postcode = known['postcode']
+            extra = {'locality': known['locality']}
+        try:
+            response = transport.get(
+                f'https://api.getAddress.io/find/{postcode}/',
+                auth=HTTPBasicAuth('api-key', settings.GET_ADDRESS_API_KEY),
+                timeout=10,
+            )
+        except (transport.BulkheadFull, requests.exceptions.Timeout):
+            # getAddress.io is slow or down, or this request has run out of time; the user can still type their address
+            return []
         if response.ok:
             data = [
-                {'text': address.replace(' ,', ''), 'value': address.replace(' ,', '') + ', ' + postcode}
+                {'text': address.replace(' ,', ''), 'value': address.replace(' ,', '') + ', ' + postcode, **extra}
                 for address in response.json()['addresses']
             ]
         elif response.status_code == 400:
             data = []
         else:
             response.raise_for_status()
-        return Response(data)
+        return data
 
 
 class LandingPageView(RedirectView):
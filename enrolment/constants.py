@@ -30,6 +30,7 @@ SESSION_KEY_BUSINESS_PROFILE_INTENT = 'BUSINESS_PROFILE_INTENT'
 SESSION_KEY_BACKFILL_DETAILS_INTENT = 'BACKFILL_DETAILS_INTENT'
 SESSION_KEY_EXPORT_OPPORTUNITY_INTENT = 'EXPORT_OPPORTUNITY_INTENT'
 SESSION_KEY_INVITE_KEY = 'INVITE_KEY'
+SESSION_KEY_CLEANED_DATA = 'CLEANED_DATA'
 
 PROGRESS_STEP_LABEL_USER_ACCOUNT = 'Enter your business email address and set a password'
 PROGRESS_STEP_LABEL_INDIVIDUAL_USER_ACCOUNT = 'Enter your email address and set a password'
@@ -9,6 +9,7 @@ from django.forms import HiddenInput, PasswordInput, Textarea, TextInput, Valida
 from django.http.request import QueryDict
 from django.utils.safestring import mark_safe
 
+from core import passwords, postcodes
 from core.forms import TERMS_LABEL
 from enrolment import constants, helpers
 from enrolment.widgets import PostcodeInput, RadioSelect
@@ -17,6 +18,17 @@ INDUSTRY_CHOICES = (('', 'Please select'),) + choices.INDUSTRIES + (('OTHER', 'O
 
 
 class CleanAddressMixin:
+    MESSAGE_INVALID_POSTCODE = 'Enter a valid UK postcode.'
+
+    def clean_postal_code(self):
+        value = self.cleaned_data['postal_code']
+        if value and postcodes.index.is_available:
+            known = postcodes.index.lookup(value)
+            if not known:
+                raise ValidationError(self.MESSAGE_INVALID_POSTCODE)
+            value = known['postcode']
+        return value
+
     def clean_address(self):
         value = self.cleaned_data['address'].strip().replace(', ', '\n')
         parts = value.split('\n')
@@ -70,6 +82,7 @@ class UserAccount(forms.Form):
         '</ul>'
     )
     MESSAGE_NOT_MATCH = "Passwords don't match"
+    MESSAGE_COMMON_PASSWORD = 'This password is too common.'
 
     email = forms.EmailField(label='Your email address')
     password = forms.CharField(label='Set a password', help_text=mark_safe(PASSWORD_HELP_TEXT), widget=PasswordInput)
@@ -84,8 +97,18 @@ class UserAccount(forms.Form):
             raise ValidationError({'password': self.data[self.add_prefix('remote_password_error')]})
         super().clean()
 
+    def clean_password(self):
+        value = self.cleaned_data['password']
+        # checked by SSO too, but rejecting here saves the round trip
+        if value in passwords.common_passwords:
+            raise ValidationError(self.MESSAGE_COMMON_PASSWORD, code='common_password')
+        return value
+
     def clean_password_confirmed(self):
         value = self.cleaned_data['password_confirmed']
+        if self.has_error('password', code='common_password'):
+            # the password was given but rejected, so whether the two match is beside the point
+            return value
         if value != self.cleaned_data.get('password'):
             raise ValidationError(self.MESSAGE_NOT_MATCH)
         return value
@@ -135,7 +158,7 @@ class CompaniesHouseCompanySearch(forms.Form):
     def clean(self):
         cleaned_data = super().clean()
         if 'company_number' in cleaned_data:
-            data = helpers.get_companies_house_profile(cleaned_data['company_number'])
+            data = helpers.get_companies_house_profile(cleaned_data['company_number'], fields=['company_status'])
             if 'company_status' in data:
                 if data['company_status'] not in ['active', 'voluntary-arrangement']:
                     raise ValidationError({'company_name': self.MESSAGE_COMPANY_NOT_ACTIVE})
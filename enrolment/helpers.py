@@ -1,5 +1,6 @@
 import collections
 import re
+from concurrent.futures import ThreadPoolExecutor
 from http import cookies
 
 import directory_components
@@ -9,10 +10,12 @@ from directory_constants import choices, urls
 from directory_forms_api_client import actions
 from directory_sso_api_client import sso_api_client
 from django.conf import settings
-from django.core.cache import cache
 from django.utils import formats
 from django.utils.dateparse import parse_datetime
 
+from core import companies_house
+from core.helpers import CACHE_KEY_COMPANY_PROFILE_PARTIAL
+from core.request_cache import cache
 from enrolment import constants
 
 COMPANIES_HOUSE_DATE_FORMAT = '%Y-%m-%d'
@@ -21,6 +24,10 @@ CACHE_KEY_IS_ENROLLED = 'IS_ENROLLED'
 
 ProgressIndicatorConf = collections.namedtuple('ProgressIndicatorConf', ['step_counter_user', 'step_counter_anon'])
 
+prefetch_executor = ThreadPoolExecutor(
+    max_workers=settings.ENROLMENT_PREFETCH_MAX_WORKERS, thread_name_prefix='enrolment-prefetch'
+)
+
 
 def retrieve_preverified_company(enrolment_key):
     response = api_client.enrolment.retrieve_prepeveried_company(enrolment_key)
@@ -37,9 +44,18 @@ def claim_company(enrolment_key, personal_name, sso_session_id):
     response.raise_for_status()
 
 
-def get_companies_house_profile(number):
+def get_companies_house_profile(number, fields=None):
+    value = companies_house.index.get_profile(number)
+    if value:
+        return value
+    # if only `fields` are needed the partial profile seeded by the company search typeahead may be enough
     key = f'{CACHE_KEY_COMPANY_PROFILE}-{number}'
-    value = cache.get(key)
+    partial_key = f'{CACHE_KEY_COMPANY_PROFILE_PARTIAL}-{number}'
+    cached = cache.get_many([key, partial_key] if fields else [key])
+    value = cached.get(key)
+    partial = cached.get(partial_key)
+    if not value and partial and all(name in partial for name in fields):
+        return partial
     if not value:
         response = ch_search_api_client.company.get_company_profile(number)
         response.raise_for_status()
@@ -57,12 +73,27 @@ def user_has_company(sso_session_id):
     response.raise_for_status()
 
 
-def get_is_enrolled(company_number):
-    response = api_client.company.validate_company_number(company_number)
-    if response.status_code == 400:
-        return True
-    response.raise_for_status()
-    return False
+def get_is_enrolled(company_number, use_cache=True):
+    key = f'{CACHE_KEY_IS_ENROLLED}-{company_number}'
+    value = cache.get(key) if use_cache else None
+    if value is None:
+        response = api_client.company.validate_company_number(company_number)
+        if response.status_code != 400:
+            response.raise_for_status()
+        value = response.status_code == 400
+        cache.set(key=key, value=value, timeout=settings.ENROLMENT_IS_ENROLLED_CACHE_SECONDS)
+    return value
+
+
+def prefetch(func, *args, **kwargs):
+    """Call func in the background so its result is in the cache by the time it's needed.
+
+    Errors are not raised: the caller that needs the value will call func again.
+
+    """
+
+    if settings.ENROLMENT_PREFETCH_ENABLED:
+        return prefetch_executor.submit(func, *args, **kwargs)
 
 
 def create_company_profile(data):
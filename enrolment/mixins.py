@@ -1,4 +1,6 @@
 import abc
+import hashlib
+import json
 from urllib.parse import unquote
 
 from directory_sso_api_client import sso_api_client
@@ -7,8 +9,10 @@ from django.http import QueryDict
 from django.shortcuts import redirect
 from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils.functional import cached_property
 from requests.exceptions import HTTPError
 
+from core.helpers import invalidate_membership_claims
 from enrolment import constants, helpers
 
 
@@ -19,6 +23,57 @@ class RestartOnStepSkipped:
         return super().render(*args, **kwargs)
 
 
+class MemoizedCleanedDataMixin:
+    """get_cleaned_data_for_step revalidates the step's form each time it's
+    called, and some forms call upstream APIs when validating. Remember the
+    cleaned data for the rest of the request, and for steps listed in
+    `persist_cleaned_data_steps` in the wizard storage too. Both are keyed on
+    a hash of the step data so changes to the step are always revalidated.
+
+    Only cleaned data that survives a round trip to JSON is persisted, and
+    persisted steps should be few because the session is a signed cookie.
+
+    """
+
+    persist_cleaned_data_steps = []
+
+    @cached_property
+    def cleaned_data_memo(self):
+        return {}
+
+    def get_step_data_hash(self, step):
+        step_data = self.storage.get_step_data(step)
+        data = dict(step_data.lists()) if step_data is not None else None
+        return hashlib.sha256(json.dumps([step, data], sort_keys=True).encode()).hexdigest()
+
+    def get_cleaned_data_for_step(self, step):
+        if step not in self.form_list:
+            return None
+        key = (step, self.get_step_data_hash(step))
+        if key not in self.cleaned_data_memo:
+            self.cleaned_data_memo[key] = self.get_persisted_cleaned_data(*key)
+        return self.cleaned_data_memo[key]
+
+    def get_persisted_cleaned_data(self, step, step_data_hash):
+        persisted = self.storage.extra_data.get(constants.SESSION_KEY_CLEANED_DATA, {})
+        if step in persisted and persisted[step]['hash'] == step_data_hash:
+            return persisted[step]['cleaned_data']
+        cleaned_data = super().get_cleaned_data_for_step(step)
+        if (
+            cleaned_data is not None
+            and step in self.persist_cleaned_data_steps
+            and not self.storage.get_step_files(step)
+        ):
+            try:
+                is_serializable = json.loads(json.dumps(cleaned_data)) == cleaned_data
+            except TypeError:
+                is_serializable = False
+            if is_serializable:
+                persisted = {**persisted, step: {'hash': step_data_hash, 'cleaned_data': cleaned_data}}
+                self.storage.extra_data[constants.SESSION_KEY_CLEANED_DATA] = persisted
+        return cleaned_data
+
+
 class RemotePasswordValidationError(ValueError):
     def __init__(self, form):
         self.form = form
@@ -259,6 +314,7 @@ class CreateBusinessProfileMixin:
                 **data,
             }
         )
+        invalidate_membership_claims(sso_id=user.id)
 
     # For user that started their journey from sso-profile, take them directly
     # to their business profile, otherwise show them the success page.
@@ -3,6 +3,7 @@ from unittest import mock
 import pytest
 from directory_components.forms import CharField, EmailField
 
+from core import passwords, postcodes
 from enrolment import forms, helpers
 
 
@@ -28,6 +29,21 @@ def test_create_user_password_confirm_empty():
     assert 'This field is required.' in form.errors['password']
 
 
+def test_create_user_password_common(settings, tmp_path):
+    passwords_path = tmp_path / 'passwords.txt'
+    passwords_path.write_text('password1234\n')
+    settings.PASSWORD_FILTER_PATH = str(tmp_path / 'passwords.bloom')
+    passwords.build_filter(passwords_path, settings.PASSWORD_FILTER_PATH)
+
+    form = forms.UserAccount(
+        data={'email': 'test@test.com', 'password': 'Password1234', 'password_confirmed': 'Password1234'}
+    )
+
+    assert form.is_valid() is False
+    assert form.errors['password'] == [forms.UserAccount.MESSAGE_COMMON_PASSWORD]
+    assert 'password_confirmed' not in form.errors
+
+
 def test_verification_code_empty_email():
 
     form = forms.UserAccountVerification()
@@ -114,3 +130,29 @@ def test_companies_house_business_form_row_height():
     form = forms.CompaniesHouseBusinessDetails(initial={'address': 'ddddd ' * 6})
 
     assert form.fields['address'].widget.attrs['rows'] == 2
+
+
+@pytest.mark.parametrize('form_class', [forms.CompaniesHouseAddressSearch, forms.NonCompaniesHouseSearch])
+def test_address_search_postcode_checked_against_index(form_class, settings, tmp_path):
+    settings.POSTCODE_INDEX_PATH = str(tmp_path / 'postcodes.idx')
+    directory_path = tmp_path / 'ONSPD.csv'
+    directory_path.write_text('pcds,doterm,oslaua\nSW1A 1AA,,E09000033\n')
+    postcodes.build_index(directory_path, settings.POSTCODE_INDEX_PATH)
+
+    valid = form_class(data={'postal_code': 'sw1a1aa'})
+    invalid = form_class(data={'postal_code': 'ZZ1 1ZZ'})
+    valid.is_valid()
+    invalid.is_valid()
+
+    assert 'postal_code' not in valid.errors
+    assert valid.cleaned_data['postal_code'] == 'SW1A 1AA'
+    assert invalid.errors['postal_code'] == [form_class.MESSAGE_INVALID_POSTCODE]
+
+
+def test_address_search_postcode_not_checked_without_index(settings):
+    settings.POSTCODE_INDEX_PATH = ''
+
+    form = forms.NonCompaniesHouseSearch(data={'postal_code': 'EDG 4DF'})
+    form.is_valid()
+
+    assert form.cleaned_data['postal_code'] == 'EDG 4DF'
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.core.cache import cache
 from requests.exceptions import HTTPError
 
+import core.helpers
 from core.tests.helpers import create_response
 from enrolment import helpers
 
@@ -192,3 +193,62 @@ def test_add_collaborator(mock_add_collaborator):
         sso_session_id=300,
         data={'company': 1234, 'company_email': 'xyz@xyzcorp.com', 'name': 'Abc', 'mobile_number': '9876543210'},
     )
+
+
+@mock.patch.object(helpers.api_client.company, 'validate_company_number')
+def test_get_is_enrolled_cached(mock_validate_company_number):
+    mock_validate_company_number.return_value = create_response(status_code=400)
+
+    assert helpers.get_is_enrolled('12345678') is True
+    assert helpers.get_is_enrolled('12345678') is True
+    assert mock_validate_company_number.call_count == 1
+
+    mock_validate_company_number.return_value = create_response(status_code=200)
+
+    assert helpers.get_is_enrolled('12345678', use_cache=False) is False
+    assert helpers.get_is_enrolled('12345678') is False
+    assert mock_validate_company_number.call_count == 2
+
+
+@mock.patch.object(helpers.api_client.company, 'validate_company_number')
+def test_get_is_enrolled_error(mock_validate_company_number):
+    mock_validate_company_number.return_value = create_response(status_code=500)
+
+    with pytest.raises(HTTPError):
+        helpers.get_is_enrolled('12345678')
+    assert helpers.cache.get(f'{helpers.CACHE_KEY_IS_ENROLLED}-12345678') is None
+
+
+@mock.patch.object(helpers.ch_search_api_client.company, 'get_company_profile')
+def test_get_company_profile_from_search_results(mock_get_company_profile):
+    core.helpers.cache_companies_house_search_results(
+        [{'company_number': '123456', 'title': 'Example corp', 'company_status': 'active'}]
+    )
+
+    result = helpers.get_companies_house_profile('123456', fields=['company_status'])
+
+    assert mock_get_company_profile.call_count == 0
+    assert result == {'company_number': '123456', 'company_name': 'Example corp', 'company_status': 'active'}
+
+
+@mock.patch.object(helpers.ch_search_api_client.company, 'get_company_profile')
+def test_get_company_profile_search_results_missing_fields(mock_get_company_profile):
+    data = {'company_number': '123456', 'company_status': 'active', 'sic_codes': ['1234']}
+    mock_get_company_profile.return_value = create_response(data)
+    core.helpers.cache_companies_house_search_results(
+        [{'company_number': '123456', 'title': 'Example corp', 'company_status': 'active'}]
+    )
+
+    assert helpers.get_companies_house_profile('123456', fields=['sic_codes']) == data
+    assert helpers.get_companies_house_profile('123456') == data
+    assert mock_get_company_profile.call_count == 1
+
+
+@mock.patch.object(helpers.ch_search_api_client.company, 'get_company_profile')
+def test_get_company_profile_prefers_full_profile(mock_get_company_profile):
+    data = {'company_number': '123456', 'company_status': 'dissolved', 'sic_codes': ['1234']}
+    cache.set('COMPANY_PROFILE-123456', data)
+    core.helpers.cache_companies_house_search_results([{'company_number': '123456', 'company_status': 'active'}])
+
+    assert helpers.get_companies_house_profile('123456', fields=['company_status']) == data
+    assert mock_get_company_profile.call_count == 0
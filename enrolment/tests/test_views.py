@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
 import pytest
@@ -6,6 +7,7 @@ from django.contrib.auth.models import AnonymousUser
 from django.contrib.sessions.backends import signed_cookies
 from django.urls import resolve, reverse
 from django.views.generic import TemplateView
+from formtools.wizard.storage import get_storage
 from formtools.wizard.views import NamedUrlSessionWizardView
 from freezegun import freeze_time
 from requests.exceptions import HTTPError
@@ -26,6 +28,15 @@ BUSINESS_INFO_COMPANIES_HOUSE = 'business-info-companies-house'
 ADDRESS_SEARCH_COMPANIES_HOUSE = 'address-search-companies-house'
 
 
+@pytest.fixture(autouse=True)
+def prefetch_executor():
+    # wait for background prefetches so they can't leak into the next test
+    executor = ThreadPoolExecutor(max_workers=1)
+    with mock.patch.object(helpers, 'prefetch_executor', executor):
+        yield executor
+    executor.shutdown(wait=True)
+
+
 @pytest.fixture
 def submit_collaborator_enrolment_step(client):
     return submit_step_factory(
@@ -538,6 +549,88 @@ def test_companies_house_enrolment_expose_company(client, submit_companies_house
     }
 
 
+def test_companies_house_enrolment_company_search_not_revalidated(
+    client, submit_companies_house_step, steps_data, user, mock_get_company_profile
+):
+    client.force_login(user)
+    response = submit_companies_house_step(steps_data[constants.COMPANY_SEARCH], step_name=constants.COMPANY_SEARCH)
+    assert response.status_code == 302
+    url = reverse('enrolment-companies-house', kwargs={'step': constants.BUSINESS_INFO})
+
+    mock_get_company_profile.reset_mock()
+    response = client.get(url)
+    assert response.status_code == 200
+    # only the call that populates the form initial, none for revalidating the company search step
+    assert mock_get_company_profile.call_count == 1
+
+    mock_get_company_profile.reset_mock()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert mock_get_company_profile.call_count == 1
+
+
+def test_companies_house_enrolment_prefetches_business_details(
+    client, submit_companies_house_step, steps_data, user, mock_validate_company_number, prefetch_executor
+):
+    client.force_login(user)
+    with mock.patch.object(helpers, 'prefetch', wraps=helpers.prefetch) as mock_prefetch:
+        response = submit_companies_house_step(steps_data[constants.COMPANY_SEARCH], step_name=constants.COMPANY_SEARCH)
+    assert response.status_code == 302
+    prefetch_executor.shutdown(wait=True)
+
+    assert mock_prefetch.call_args_list == [
+        mock.call(helpers.get_companies_house_profile, '12345678'),
+        mock.call(helpers.get_is_enrolled, '12345678'),
+    ]
+    assert mock_validate_company_number.call_count == 1
+
+    response = client.get(response.url)
+
+    assert response.status_code == 200
+    assert mock_validate_company_number.call_count == 1
+
+
+def test_companies_house_enrolment_prefetch_disabled(client, submit_companies_house_step, steps_data, user, settings):
+    settings.ENROLMENT_PREFETCH_ENABLED = False
+    client.force_login(user)
+
+    with mock.patch.object(helpers.prefetch_executor, 'submit') as mock_submit:
+        response = submit_companies_house_step(steps_data[constants.COMPANY_SEARCH], step_name=constants.COMPANY_SEARCH)
+
+    assert response.status_code == 302
+    assert mock_submit.call_count == 0
+
+
+def test_memoized_cleaned_data_revalidates_changed_step(rf):
+    class View(mixins.MemoizedCleanedDataMixin, NamedUrlSessionWizardView):
+        form_list = ((constants.COMPANY_SEARCH, forms.CompaniesHouseCompanySearch),)
+        persist_cleaned_data_steps = [constants.COMPANY_SEARCH]
+
+    request = rf.get('/')
+    request.session = signed_cookies.SessionStore()
+    view = View(request=request, kwargs={}, **View.get_initkwargs(url_name='enrolment-companies-house'))
+    view.storage = get_storage('formtools.wizard.storage.session.SessionStorage', 'view', request)
+    prefix = view.get_form_prefix(constants.COMPANY_SEARCH)
+
+    with mock.patch.object(forms.helpers, 'get_companies_house_profile', return_value={}) as mock_profile:
+        view.storage.set_step_data(
+            constants.COMPANY_SEARCH, {f'{prefix}-company_name': ['Example corp'], f'{prefix}-company_number': ['1']}
+        )
+        for _ in range(3):
+            assert view.get_cleaned_data_for_step(constants.COMPANY_SEARCH)['company_number'] == '1'
+
+        view.storage.set_step_data(
+            constants.COMPANY_SEARCH, {f'{prefix}-company_name': ['Example corp'], f'{prefix}-company_number': ['2']}
+        )
+        assert view.get_cleaned_data_for_step(constants.COMPANY_SEARCH)['company_number'] == '2'
+
+        del view.cleaned_data_memo
+        assert view.get_cleaned_data_for_step(constants.COMPANY_SEARCH)['company_number'] == '2'
+
+    assert mock_profile.call_count == 2
+    assert view.get_cleaned_data_for_step('unknown-step') is None
+
+
 def test_companies_house_enrolment_redirect_to_start(client, user):
     client.force_login(user)
 
@@ -1,5 +1,6 @@
 from urllib.parse import urlparse
 
+from directory_components.helpers import CompanyParser
 from directory_constants import urls, user_roles
 from directory_forms_api_client.helpers import FormSessionMixin
 from django.contrib import messages
@@ -9,11 +10,10 @@ from django.urls import reverse, reverse_lazy
 from django.utils.functional import cached_property
 from django.views.generic import FormView, TemplateView
 from formtools.wizard.views import NamedUrlSessionWizardView
-from directory_components.helpers import CompanyParser
 
 import core.forms
 import core.mixins
-from core.helpers import get_company_admins
+from core.helpers import get_company_admins, invalidate_membership_claims
 from enrolment import constants, forms, helpers, mixins
 
 URL_NON_COMPANIES_HOUSE_ENROLMENT = reverse_lazy('enrolment-sole-trader', kwargs={'step': constants.USER_ACCOUNT})
@@ -87,6 +87,7 @@ class BusinessTypeRoutingView(
 class BaseEnrolmentWizardView(
     mixins.RedirectAlreadyEnrolledMixin,
     FormSessionMixin,
+    mixins.MemoizedCleanedDataMixin,
     mixins.RestartOnStepSkipped,
     core.mixins.PreventCaptchaRevalidationMixin,
     core.mixins.CreateUpdateUserProfileMixin,
@@ -132,8 +133,12 @@ class BaseEnrolmentWizardView(
     def process_step(self, form):
         if form.prefix == constants.PERSONAL_INFO:
             self.create_update_user_profile(form)
+        self.prefetch_next_step(form)
         return super().process_step(form)
 
+    def prefetch_next_step(self, form):
+        pass
+
     def get_form_kwargs(self, step=None):
         form_kwargs = super().get_form_kwargs(step=step)
         if step == constants.PERSONAL_INFO:
@@ -187,6 +192,9 @@ class CompaniesHouseEnrolmentView(mixins.CreateBusinessProfileMixin, BaseEnrolme
         constants.FINISHED: 'enrolment/companies-house-success.html',
     }
 
+    # validating the company search step looks the company up in Companies House
+    persist_cleaned_data_steps = [constants.COMPANY_SEARCH]
+
     @property
     def verification_link_url(self):
         url = reverse('enrolment-companies-house', kwargs={'step': constants.VERIFICATION})
@@ -203,6 +211,13 @@ class CompaniesHouseEnrolmentView(mixins.CreateBusinessProfileMixin, BaseEnrolme
         **mixins.CreateUserAccountMixin.condition_dict,
     }
 
+    def prefetch_next_step(self, form):
+        super().prefetch_next_step(form)
+        if form.prefix == constants.COMPANY_SEARCH:
+            company_number = form.cleaned_data['company_number']
+            helpers.prefetch(helpers.get_companies_house_profile, company_number)
+            helpers.prefetch(helpers.get_is_enrolled, company_number)
+
     def get_form_kwargs(self, step=None):
         form_kwargs = super().get_form_kwargs(step=step)
         if step == constants.BUSINESS_INFO:
@@ -244,7 +259,8 @@ class CompaniesHouseEnrolmentView(mixins.CreateBusinessProfileMixin, BaseEnrolme
 
     def done(self, form_list, form_dict, **kwargs):
         data = self.serialize_form_list(form_list)
-        if helpers.get_is_enrolled(data['company_number']):
+        # the cached value is fine for rendering, but must be current when deciding what to create
+        if helpers.get_is_enrolled(data['company_number'], use_cache=False):
             helpers.create_company_member(
                 sso_session_id=self.request.user.session_id,
                 data={
@@ -255,6 +271,7 @@ class CompaniesHouseEnrolmentView(mixins.CreateBusinessProfileMixin, BaseEnrolme
                     'mobile_number': data.get('phone_number', ''),
                 },
             )
+            invalidate_membership_claims(sso_id=self.request.user.id)
             admins = get_company_admins(self.request.user.session_id)
             helpers.notify_company_admins_member_joined(
                 admins=admins,
@@ -443,6 +460,7 @@ class CollaboratorEnrolmentView(BaseEnrolmentWizardView):
             sso_session_id=self.request.user.session_id,
             invite_key=self.request.session[constants.SESSION_KEY_INVITE_KEY],
         )
+        invalidate_membership_claims(sso_id=self.request.user.id)
 
     @cached_property
     def collaborator_invition(self):
@@ -526,6 +544,7 @@ class PreVerifiedEnrolmentView(BaseEnrolmentWizardView):
             personal_name=f'{data["given_name"]} {data["family_name"]}',
             sso_session_id=self.request.user.session_id,
         )
+        invalidate_membership_claims(sso_id=self.request.user.id)
 
     def serialize_form_list(self, form_list):
         data = {}
@@ -541,6 +560,7 @@ class PreVerifiedEnrolmentView(BaseEnrolmentWizardView):
 
 class ResendVerificationCodeView(
     mixins.RedirectLoggedInMixin,
+    mixins.MemoizedCleanedDataMixin,
     mixins.RestartOnStepSkipped,
     mixins.ProgressIndicatorMixin,
     mixins.StepsListMixin,
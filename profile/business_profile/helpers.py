@@ -1,4 +1,5 @@
 import http
+import time
 
 import directory_components.helpers
 from directory_api_client.client import api_client
@@ -6,23 +7,133 @@ from directory_constants import company_types, user_roles
 from directory_forms_api_client import actions
 from django.conf import settings
 
-from core.helpers import get_company_admins
+from core import transport
+from core.circuit_breakers import CircuitBreaker
+from core.helpers import get_company_admins, get_session_cache_key
+from core.request_cache import cache
+
+CACHE_KEY_COMPANY = 'COMPANY'
+CACHE_KEY_COLLABORATORS = 'COLLABORATORS'
+CACHE_KEY_CASE_STUDY = 'CASE_STUDY'
+
+company_profile_breaker = CircuitBreaker('company-profile')
+supplier_profile_breaker = CircuitBreaker('supplier-profile')
+collaboration_requests_breaker = CircuitBreaker('collaboration-requests')
+
+
+def get_case_study_cache_key(sso_session_id, case_study_id):
+    return get_session_cache_key(f'{CACHE_KEY_CASE_STUDY}-{case_study_id}', sso_session_id)
+
+
+def get_conditional_headers(cached):
+    headers = {}
+    if cached and cached['etag']:
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached['last_modified']:
+        headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def conditional_retrieve(cache_key, retrieve):
+    """Revalidate the cached payload with a conditional request.
+
+    A 304 reuses the cached payload, so the body is neither downloaded nor
+    parsed again. Returns the response and the payload, which is None if the
+    response is unsuccessful. The response is None if the payload was
+    written through by `store_company_profile` recently enough to be used as is.
+
+    """
+
+    cached = cache.get(cache_key)
+    if cached and cached.get('fresh_until', 0) > time.time():
+        # written through from an update moments ago, so no need to ask
+        return None, cached['payload']
+    with transport.extra_headers(get_conditional_headers(cached)):
+        response = retrieve()
+    if cached and response.status_code == http.client.NOT_MODIFIED:
+        return response, cached['payload']
+    if not response.ok:
+        cache.delete(cache_key)
+        return response, None
+    payload = response.json()
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        cache.set(
+            cache_key,
+            {'etag': etag, 'last_modified': last_modified, 'payload': payload},
+            timeout=settings.CONDITIONAL_REQUEST_CACHE_SECONDS,
+        )
+    return response, payload
+
+
+def get_dashboard_cache_keys(sso_session_id, include_supplier=True):
+    """The cache entries read when showing the user's company on the dashboard."""
+
+    keys = company_profile_breaker.cache_keys
+    if sso_session_id:
+        keys = keys + [get_session_cache_key(CACHE_KEY_COMPANY, sso_session_id)]
+    if include_supplier:
+        keys = keys + supplier_profile_breaker.cache_keys + collaboration_requests_breaker.cache_keys
+    return keys
+
+
+def get_company_profile(sso_session_id, sso_id):
+    cache_key = get_session_cache_key(CACHE_KEY_COMPANY, sso_session_id)
+
+    def retrieve():
+        with transport.hedged('company-profile'):
+            response, company = conditional_retrieve(
+                cache_key=cache_key,
+                retrieve=lambda: api_client.company.profile_retrieve(sso_session_id),
+            )
+        if response is None:
+            return company
+        if response.status_code == http.client.NOT_FOUND:
+            return None
+        response.raise_for_status()
+        return company
+
+    # keyed on the user rather than the session, so it still serves them if they sign in again
+    return company_profile_breaker.call(retrieve, fallback_key=sso_id)
+
+
+def store_company_profile(sso_session_id, response):
+    """Write the company returned by profile_update through to the cache.
 
+    Returns the company, or None if the response has no company in it.
 
-def get_company_profile(sso_session_id):
-    response = api_client.company.profile_retrieve(sso_session_id)
-    if response.status_code == http.client.NOT_FOUND:
+    """
+
+    try:
+        company = response.json()
+    except ValueError:
         return None
-    response.raise_for_status()
-    return response.json()
+    if not isinstance(company, dict) or not company:
+        return None
+    cache.set(
+        get_session_cache_key(CACHE_KEY_COMPANY, sso_session_id),
+        {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'payload': company,
+            'fresh_until': time.time() + settings.COMPANY_WRITE_THROUGH_FRESH_SECONDS,
+        },
+        timeout=settings.CONDITIONAL_REQUEST_CACHE_SECONDS,
+    )
+    return company
 
 
 def get_supplier_profile(sso_id):
-    response = api_client.supplier.retrieve_profile(sso_id)
-    if response.status_code == http.client.NOT_FOUND:
-        return None
-    response.raise_for_status()
-    return response.json()
+    def retrieve():
+        with transport.hedged('supplier-profile'):
+            response = api_client.supplier.retrieve_profile(sso_id)
+        if response.status_code == http.client.NOT_FOUND:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    return supplier_profile_breaker.call(retrieve, fallback_key=sso_id)
 
 
 class CompanyParser(directory_components.helpers.CompanyParser):
@@ -60,9 +171,13 @@ class CompanyParser(directory_components.helpers.CompanyParser):
 
 
 def collaborator_list(sso_session_id):
-    response = api_client.company.collaborator_list(sso_session_id=sso_session_id)
+    with transport.hedged('collaborator-list'):
+        response, collaborators = conditional_retrieve(
+            cache_key=get_session_cache_key(CACHE_KEY_COLLABORATORS, sso_session_id),
+            retrieve=lambda: api_client.company.collaborator_list(sso_session_id=sso_session_id),
+        )
     response.raise_for_status()
-    return response.json()
+    return collaborators
 
 
 def retrieve_collaborator(sso_session_id, collaborator_sso_id):
@@ -132,7 +247,10 @@ def collaboration_request_create(sso_session_id, role):
 
 
 def has_editor_admin_request(sso_session_id, sso_id):
-    collaboration_requests = collaboration_request_list(sso_session_id)
+    collaboration_requests = collaboration_requests_breaker.call(
+        lambda: collaboration_request_list(sso_session_id),
+        fallback_key=sso_id,
+    )
     return bool([r for r in collaboration_requests if r['requestor_sso_id'] == sso_id and not r['accepted']])
 
 
@@ -1,13 +1,29 @@
+import json
 from profile.business_profile import helpers
 from unittest import mock
 
 import pytest
+import requests
 from directory_api_client import api_client
 from directory_constants import company_types
 
+from core import transport
 from core.tests.helpers import create_response
 
 
+def create_conditional_response(json_body={}, status_code=200, etag='"1"'):
+    response = create_response(json_body, status_code=status_code)
+    response.headers['ETag'] = etag
+    return response
+
+
+def create_empty_response():
+    response = requests.Response()
+    response.status_code = 204
+    response._content = b''
+    return response
+
+
 @pytest.mark.parametrize(
     'value,expected',
     (
@@ -58,17 +74,168 @@ def test_get_supplier_profile_not_found(mock_retrieve_profile):
     assert profile is None
 
 
+@pytest.mark.parametrize(
+    'method,helper,args,expected',
+    (
+        ('supplier.retrieve_profile', helpers.get_supplier_profile, ['1234'], 'supplier-profile'),
+        ('company.profile_retrieve', helpers.get_company_profile, ['1234', 1], 'company-profile'),
+        ('company.collaborator_list', helpers.collaborator_list, ['1234'], 'collaborator-list'),
+    ),
+)
+def test_reads_opt_in_to_hedging(method, helper, args, expected):
+    client_name, method_name = method.split('.')
+    hedge_names = []
+
+    def side_effect(*args, **kwargs):
+        hedge_names.append(transport.request_hedge_name.get())
+        return create_response([])
+
+    with mock.patch.object(getattr(api_client, client_name), method_name, side_effect=side_effect):
+        helper(*args)
+
+    assert hedge_names == [expected]
+
+
 @mock.patch.object(api_client.company, 'profile_retrieve')
 def test_get_company_profile_not_found(mock_profile_retrieve):
     mock_profile_retrieve.return_value = create_response(status_code=404)
 
-    profile = helpers.get_company_profile('1234')
+    profile = helpers.get_company_profile('1234', 1)
 
     assert mock_profile_retrieve.call_count == 1
     assert mock_profile_retrieve.call_args == mock.call('1234')
     assert profile is None
 
 
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_get_company_profile_revalidates_cached_payload(mock_profile_retrieve):
+    mock_profile_retrieve.return_value = create_conditional_response({'name': 'Example corp'})
+    helpers.get_company_profile('1234', 1)
+    request_headers = []
+
+    def profile_retrieve(sso_session_id):
+        request_headers.append(transport.request_headers.get())
+        return create_response(status_code=304)
+
+    mock_profile_retrieve.side_effect = profile_retrieve
+    profile = helpers.get_company_profile('1234', 1)
+
+    assert profile == {'name': 'Example corp'}
+    assert request_headers == [{'If-None-Match': '"1"'}]
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_get_company_profile_changed(mock_profile_retrieve):
+    mock_profile_retrieve.return_value = create_conditional_response({'name': 'Example corp'})
+    helpers.get_company_profile('1234', 1)
+    mock_profile_retrieve.return_value = create_conditional_response({'name': 'Renamed corp'}, etag='"2"')
+
+    assert helpers.get_company_profile('1234', 1) == {'name': 'Renamed corp'}
+    assert helpers.get_company_profile('5678', 1) == {'name': 'Renamed corp'}
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_get_company_profile_not_found_clears_cache(mock_profile_retrieve):
+    mock_profile_retrieve.return_value = create_conditional_response({'name': 'Example corp'})
+    helpers.get_company_profile('1234', 1)
+    mock_profile_retrieve.return_value = create_response(status_code=404)
+
+    assert helpers.get_company_profile('1234', 1) is None
+    assert helpers.cache.get(helpers.get_session_cache_key(helpers.CACHE_KEY_COMPANY, '1234')) is None
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_store_company_profile_skips_revalidation(mock_profile_retrieve):
+    stored = helpers.store_company_profile('1234', create_conditional_response({'name': 'Renamed corp'}, etag='"2"'))
+
+    assert stored == {'name': 'Renamed corp'}
+    assert helpers.get_company_profile('1234', 1) == {'name': 'Renamed corp'}
+    assert mock_profile_retrieve.call_count == 0
+
+
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_store_company_profile_revalidates_once_stale(mock_profile_retrieve, settings):
+    settings.COMPANY_WRITE_THROUGH_FRESH_SECONDS = -1
+    request_headers = []
+
+    def profile_retrieve(sso_session_id):
+        request_headers.append(transport.request_headers.get())
+        return create_response(status_code=304)
+
+    mock_profile_retrieve.side_effect = profile_retrieve
+    helpers.store_company_profile('1234', create_conditional_response({'name': 'Renamed corp'}, etag='"2"'))
+
+    assert helpers.get_company_profile('1234', 1) == {'name': 'Renamed corp'}
+    assert request_headers == [{'If-None-Match': '"2"'}]
+
+
+@mock.patch.object(api_client.company, 'collaboration_request_list')
+@mock.patch.object(api_client.company, 'profile_retrieve')
+def test_last_known_good_survives_signing_in_again(mock_profile_retrieve, mock_collaboration_request_list):
+    mock_profile_retrieve.return_value = create_response({'name': 'Example corp'})
+    mock_collaboration_request_list.return_value = create_response([{'requestor_sso_id': 1, 'accepted': False}])
+    helpers.get_company_profile('1234', 1)
+    helpers.has_editor_admin_request('1234', 1)
+    mock_profile_retrieve.side_effect = requests.ConnectionError
+    mock_collaboration_request_list.side_effect = requests.ConnectionError
+
+    assert helpers.get_company_profile('5678', 1) == {'name': 'Example corp'}
+    assert helpers.has_editor_admin_request('5678', 1) is True
+
+
+@pytest.mark.parametrize('response', (create_response({}), create_empty_response()))
+def test_store_company_profile_no_company_in_response(response):
+    assert helpers.store_company_profile('1234', response) is None
+    assert helpers.cache.get(helpers.get_session_cache_key(helpers.CACHE_KEY_COMPANY, '1234')) is None
+
+
+def test_get_session_cache_key_hides_session_id():
+    key = helpers.get_session_cache_key(helpers.CACHE_KEY_COMPANY, 'secret-session-id')
+
+    assert 'secret-session-id' not in key
+    assert key != helpers.get_session_cache_key(helpers.CACHE_KEY_COLLABORATORS, 'secret-session-id')
+
+
+def test_conditional_requests_save_bytes_and_parsing(settings):
+    # stub directory-api at the HTTP adapter so the real clients, transport
+    # and helpers are exercised, honouring If-None-Match like upstream does
+    body = json.dumps({'name': 'Example corp', 'summary': 'x' * 10000}).encode()
+    collaborators_body = json.dumps([{'sso_id': i, 'role': 'MEMBER'} for i in range(100)]).encode()
+    bytes_downloaded = []
+
+    def upstream(request, **kwargs):
+        content = collaborators_body if 'collaborators' in request.url else body
+        etag = f'"{hash(content)}"'
+        response = requests.Response()
+        response.headers['ETag'] = etag
+        if request.headers.get('If-None-Match') == etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = content
+        bytes_downloaded.append(len(response._content))
+        return response
+
+    def load_dashboard():
+        helpers.get_company_profile('1234', 1)
+        helpers.collaborator_list('1234')
+
+    with mock.patch('requests.adapters.HTTPAdapter.send', side_effect=upstream):
+        with mock.patch('requests.models.complexjson.loads', wraps=json.loads) as mock_loads:
+            load_dashboard()
+            first_bytes, first_parses = sum(bytes_downloaded), mock_loads.call_count
+            bytes_downloaded.clear()
+            mock_loads.reset_mock()
+            for _ in range(9):
+                load_dashboard()
+
+    assert first_bytes == len(body) + len(collaborators_body)
+    assert first_parses == 2
+    assert sum(bytes_downloaded) == 0
+    assert mock_loads.call_count == 0
+
+
 @mock.patch('directory_forms_api_client.client.forms_api_client.submit_generic')
 @mock.patch('profile.business_profile.helpers.get_company_admins')
 def test_collaboration_request_reminder(mock_get_company_admins, mock_notify_email, settings):
@@ -412,6 +412,33 @@ def test_case_study_edit_foo(
     assert mock_case_study_update.call_args == mock.call(case_study_id='1', data=data, sso_session_id='123')
 
 
+def test_case_study_edit_retrieves_once_per_journey(
+    submit_case_study_edit_step, mock_case_study_retrieve, mock_case_study_update, case_study_data, client, user
+):
+    client.force_login(user)
+
+    response = submit_case_study_edit_step(case_study_data[views.BASIC])
+    assert response.status_code == 302
+    response = submit_case_study_edit_step(case_study_data[views.MEDIA])
+    assert response.status_code == 302
+    response = client.get(response.url)
+
+    assert response.url == reverse('business-profile')
+    assert mock_case_study_retrieve.call_count == 1
+    assert helpers.cache.get(helpers.get_case_study_cache_key(sso_session_id='123', case_study_id='1')) is None
+
+
+def test_case_study_edit_refetched_when_journey_restarts(mock_case_study_retrieve, client, user):
+    client.force_login(user)
+    url = reverse('business-profile-case-study-edit', kwargs={'id': '1', 'step': views.BASIC})
+
+    client.get(url)
+    client.get(reverse('business-profile-case-study-edit', kwargs={'id': '1', 'step': views.MEDIA}))
+    client.get(url)
+
+    assert mock_case_study_retrieve.call_count == 2
+
+
 def test_case_study_edit_not_found(mock_case_study_retrieve, client, user):
     mock_case_study_retrieve.return_value = create_response(status_code=404)
 
@@ -826,6 +853,40 @@ def test_admin_disconnect(mock_disconnect_from_company, client, user):
     assert mock_disconnect_from_company.call_args == mock.call(user.session_id)
 
 
+@mock.patch.object(api_client.supplier, 'disconnect_from_company')
+def test_admin_disconnect_invalidates_membership_claims(
+    mock_disconnect_from_company, mock_retrieve_company, mock_retrieve_supplier, client, user
+):
+    mock_disconnect_from_company.return_value = create_response()
+    client.force_login(user)
+    url = reverse('business-profile-admin-disconnect')
+    client.get(url)
+
+    client.post(url)
+    mock_retrieve_company.return_value = create_response(status_code=404)
+    mock_retrieve_supplier.return_value = create_response(status_code=404)
+    response = client.get(url)
+
+    assert response.status_code == 302
+    assert response.url == reverse('business-profile')
+
+
+@mock.patch('core.helpers.invalidate_membership_claims')
+@mock.patch.object(api_client.company, 'collaborator_disconnect', return_value=create_response())
+@mock.patch.object(api_client.company, 'collaborator_role_update', return_value=create_response())
+@pytest.mark.parametrize(
+    'action', (forms.REMOVE_COLLABORATOR, forms.CHANGE_COLLABORATOR_TO_MEMBER, forms.CHANGE_COLLABORATOR_TO_ADMIN)
+)
+def test_edit_collaborator_invalidates_membership_claims(
+    mock_collaborator_role_update, mock_collaborator_disconnect, mock_invalidate, action, client, user
+):
+    client.force_login(user)
+
+    client.post(reverse('business-profile-admin-collaborator-edit', kwargs={'sso_id': 1234}), {'action': action})
+
+    assert mock_invalidate.call_args == mock.call(sso_id=1234)
+
+
 @pytest.mark.parametrize('count,expected', ((1, True), (2, False)))
 def test_admin_disconnect_is_sole_collaborator(mock_collaborator_list, count, expected, client, user):
     collaborators = [
@@ -1174,3 +1235,38 @@ def test_business_user_disconnect(mock_disconnect_from_company, client, user):
 
     assert response.status_code == 200
     assert response.redirect_chain == [('/profile/business-profile/', 302)]
+
+
+def test_edit_page_submit_writes_company_through_to_cache(
+    client, mock_update_company, mock_retrieve_company, user, company_profile_data
+):
+    client.force_login(user)
+    response = create_response({**company_profile_data, 'name': 'Renamed corp'})
+    response.headers['ETag'] = '"2"'
+    mock_update_company.return_value = response
+
+    client.post(reverse('business-profile-publish'), {'is_published_find_a_supplier': True})
+    mock_retrieve_company.reset_mock()
+    response = client.get(reverse('business-profile'))
+
+    assert response.status_code == 200
+    assert mock_retrieve_company.call_count == 0
+    assert response.context_data['company']['name'] == 'Renamed corp'
+
+
+def test_business_profile_serves_last_known_good_while_breaker_open(
+    client, mock_retrieve_company, company_profile_data, user, settings
+):
+    client.force_login(user)
+    response = client.get(reverse('business-profile'))
+    assert b'stale-data-banner' not in response.content
+    for _ in range(settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        helpers.company_profile_breaker.record_failure()
+    mock_retrieve_company.reset_mock()
+
+    response = client.get(reverse('business-profile'))
+
+    assert response.status_code == 200
+    assert mock_retrieve_company.call_count == 0
+    assert response.context_data['company']['name'] == company_profile_data['name']
+    assert b'stale-data-banner' in response.content
@@ -6,7 +6,6 @@ from directory_constants import urls, user_roles
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
-from django.core.files.storage import DefaultStorage
 from django.shortcuts import Http404, redirect
 from django.urls import reverse, reverse_lazy
 from django.utils.functional import cached_property
@@ -15,7 +14,10 @@ from formtools.wizard.views import NamedUrlSessionWizardView
 from requests.exceptions import HTTPError, RequestException
 
 import core.forms
+import core.helpers
 import core.mixins
+import core.storage
+from core.request_cache import cache
 
 BASIC = 'details'
 MEDIA = 'images'
@@ -35,6 +37,7 @@ class DisconnectFromCompanyMixin:
                 return self.form_invalid(form)
             else:
                 raise
+        core.helpers.invalidate_membership_claims(sso_id=self.request.user.id)
         return super().form_valid(form)
 
 
@@ -75,11 +78,15 @@ class MemberSendAdminRequestMixin:
         return success_message
 
 
-class BusinessProfileView(MemberSendAdminRequestMixin, SuccessMessageMixin, FormView):
+class BusinessProfileView(MemberSendAdminRequestMixin, core.mixins.PrefetchCacheMixin, SuccessMessageMixin, FormView):
     template_name_fab_user = 'business_profile/profile.html'
     template_name_not_fab_user = 'business_profile/is-not-business-profile-user.html'
     template_business_profile_member = 'business_profile/business-profile-member.html'
 
+    @classmethod
+    def get_prefetch_cache_keys(cls, request):
+        return helpers.get_dashboard_cache_keys(request.COOKIES.get(settings.SSO_SESSION_COOKIE))
+
     def get_template_names(self, *args, **kwargs):
         if self.request.user.company:
             if self.request.user.role == user_roles.MEMBER:
@@ -137,6 +144,9 @@ class BaseFormView(FormView):
             self.send_update_error_to_sentry(user=self.request.user, api_response=response)
             raise
         else:
+            company = helpers.store_company_profile(sso_session_id=self.request.user.session_id, response=response)
+            if company:
+                self.request.user.company = helpers.CompanyParser(company)
             if self.success_message:
                 messages.success(self.request, self.success_message)
             return redirect(self.success_url)
@@ -271,7 +281,7 @@ class BaseCaseStudyWizardView(NamedUrlSessionWizardView):
 
     done_step_name = 'finished'
 
-    file_storage = DefaultStorage()
+    file_storage = core.storage.get_wizard_file_storage()
 
     form_list = ((BASIC, forms.CaseStudyBasicInfoForm), (MEDIA, forms.CaseStudyRichMediaForm))
     templates = {
@@ -297,14 +307,37 @@ class BaseCaseStudyWizardView(NamedUrlSessionWizardView):
 
 
 class CaseStudyWizardEditView(BaseCaseStudyWizardView):
-    def get_form_initial(self, step):
-        response = api_client.company.case_study_retrieve(
+    # formtools asks for the initial data of every step on every request, so
+    # the case study is retrieved once per edit journey and kept in the cache
+
+    @cached_property
+    def case_study_cache_key(self):
+        return helpers.get_case_study_cache_key(
             sso_session_id=self.request.user.session_id, case_study_id=self.kwargs['id']
         )
-        if response.status_code == 404:
-            raise Http404()
-        response.raise_for_status()
-        return response.json()
+
+    @cached_property
+    def case_study(self):
+        case_study = cache.get(self.case_study_cache_key)
+        if case_study is None:
+            response = api_client.company.case_study_retrieve(
+                sso_session_id=self.request.user.session_id, case_study_id=self.kwargs['id']
+            )
+            if response.status_code == 404:
+                raise Http404()
+            response.raise_for_status()
+            case_study = response.json()
+            cache.set(self.case_study_cache_key, case_study, timeout=settings.CASE_STUDY_CACHE_SECONDS)
+        return case_study
+
+    def get(self, *args, **kwargs):
+        # the journey starts again from the first step, so start with a fresh copy
+        if kwargs.get('step') == self.steps.first:
+            cache.delete(self.case_study_cache_key)
+        return super().get(*args, **kwargs)
+
+    def get_form_initial(self, step):
+        return {**self.case_study}
 
     def done(self, form_list, *args, **kwags):
         response = api_client.company.case_study_update(
@@ -312,6 +345,7 @@ class CaseStudyWizardEditView(BaseCaseStudyWizardView):
             case_study_id=self.kwargs['id'],
             sso_session_id=self.request.user.session_id,
         )
+        cache.delete(self.case_study_cache_key)
         response.raise_for_status()
         return redirect('business-profile')
 
@@ -341,6 +375,9 @@ class ManageCollaborationRequestMixin:
             helpers.collaboration_request_accept(
                 sso_session_id=self.request.user.session_id, request_key=form.cleaned_data['request_key']
             )
+            # the requester is not known here, so every member of the company is checked again
+            claims = core.helpers.get_membership_claims(self.request)
+            core.helpers.invalidate_membership_claims(company_number=claims['company_number'])
         return super().form_valid(form)
 
     def get_success_message(self, cleaned_data):
@@ -414,6 +451,7 @@ class AdminCollaboratorEditFormView(SuccessMessageMixin, FormView):
             helpers.collaborator_role_update(
                 sso_session_id=self.request.user.session_id, sso_id=self.collaborator['sso_id'], role=role
             )
+        core.helpers.invalidate_membership_claims(sso_id=self.collaborator['sso_id'])
         return super().form_valid(form)
 
     def get_success_message(self, cleaned_data):
@@ -474,6 +512,7 @@ class AdminInviteNewAdminFormView(SuccessMessageMixin, FormView):
                     sso_id=form.cleaned_data['sso_id'],
                     role=user_roles.ADMIN,
                 )
+                core.helpers.invalidate_membership_claims(sso_id=form.cleaned_data['sso_id'])
         except HTTPError as error:
             if error.response.status_code == 400:
                 parsed = error.response.json()
@@ -4,14 +4,22 @@ import urllib.parse as urlparse
 import requests
 from django.conf import settings
 
+from core import transport
+from core.circuit_breakers import CircuitBreaker
+
+exops_data_breaker = CircuitBreaker('exops-data')
+
 
 def get_exops_data(hashed_sso_id):
-    response = exopps_client.get_exops_data(hashed_sso_id)
-    if response.status_code == http.client.FORBIDDEN:
-        return None
-    elif response.status_code == http.client.OK:
-        return response.json()
-    raise response.raise_for_status()
+    def retrieve():
+        response = exopps_client.get_exops_data(hashed_sso_id)
+        if response.status_code == http.client.FORBIDDEN:
+            return None
+        elif response.status_code == http.client.OK:
+            return response.json()
+        raise response.raise_for_status()
+
+    return exops_data_breaker.call(retrieve, fallback_key=hashed_sso_id)
 
 
 class ExportingIsGreatClient:
@@ -26,7 +34,7 @@ class ExportingIsGreatClient:
     def get(self, partial_url, params):
         params['shared_secret'] = self.secret
         url = urlparse.urljoin(self.base_url, partial_url)
-        return requests.get(url, params=params, auth=self.auth)
+        return transport.get(url, params=params, auth=self.auth)
 
     def get_exops_data(self, hashed_sso_id):
         params = {'sso_user_id': hashed_sso_id}
@@ -2,7 +2,7 @@ from profile.exops import helpers
 from unittest.mock import patch
 
 
-@patch('requests.get')
+@patch('core.transport.get')
 def test_exporting_is_great_handles_auth(mock_get, settings):
     client = helpers.ExportingIsGreatClient()
     client.base_url = 'http://b.co'
@@ -1,10 +1,13 @@
-from profile.exops import views
+from profile.exops import helpers, views
 from profile.exops.helpers import exopps_client
 from unittest.mock import Mock, patch
 
+import pytest
+import requests
 from django.urls import reverse
 
 from core.tests.helpers import create_response
+from core.transport import BulkheadFull, DeadlineExceeded
 
 
 def response_factory(status_code):
@@ -74,6 +77,16 @@ def test_opportunities_applications_retrieve_error(client, user):
     assert response.template_name == [views.ExportOpportunitiesApplicationsView.template_name_error]
 
 
+@pytest.mark.parametrize('error_class', [BulkheadFull, DeadlineExceeded, requests.exceptions.ReadTimeout])
+def test_opportunities_applications_rejected_or_timed_out(error_class, client, user):
+    client.force_login(user)
+
+    with patch.object(exopps_client, 'get_exops_data', Mock(side_effect=error_class)):
+        response = client.get(reverse('export-opportunities-applications'))
+
+    assert response.template_name == [views.ExportOpportunitiesApplicationsView.template_name_error]
+
+
 @patch.object(exopps_client, 'get_exops_data', response_factory(403))
 def test_opportunities_email_alerts_retrieve_not_found(client, user):
     client.force_login(user)
@@ -99,3 +112,28 @@ def test_opportunities_email_alerts_retrieve_error(client, user):
     response = client.get(reverse('export-opportunities-email-alerts'))
 
     assert response.template_name == [views.ExportOpportunitiesEmailAlertsView.template_name_error]
+
+
+def test_opportunities_applications_serves_last_known_good_when_failing(client, user):
+    client.force_login(user)
+    with patch.object(exopps_client, 'get_exops_data', Mock(return_value=create_response({'applications': []}))):
+        client.get(reverse('export-opportunities-applications'))
+
+    with patch.object(exopps_client, 'get_exops_data', response_factory(500)):
+        response = client.get(reverse('export-opportunities-applications'))
+
+    assert response.template_name == [views.ExportOpportunitiesApplicationsView.template_name_exops_user]
+    assert response.context_data['exops_data'] == {'applications': []}
+    assert b'stale-data-banner' in response.content
+
+
+@patch.object(exopps_client, 'get_exops_data', response_factory(500))
+def test_opportunities_applications_breaker_open_without_last_known_good(client, user, settings):
+    client.force_login(user)
+    for _ in range(settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        helpers.exops_data_breaker.record_failure()
+
+    response = client.get(reverse('export-opportunities-applications'))
+
+    assert exopps_client.get_exops_data.call_count == 0
+    assert response.template_name == [views.ExportOpportunitiesApplicationsView.template_name_error]
@@ -2,20 +2,28 @@ from profile.exops import helpers
 
 from django.conf import settings
 from django.views.generic import TemplateView
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, Timeout
 
+import core.mixins
+from core.circuit_breakers import CircuitBreakerOpen
+from core.transport import BulkheadFull
 
-class ExportOpportunitiesBaseView(TemplateView):
+
+class ExportOpportunitiesBaseView(core.mixins.PrefetchCacheMixin, TemplateView):
     template_name_not_exops_user = 'exops/is-not-exops-user.html'
     template_name_error = 'exops/opportunities-retrieve-error.html'
 
     exops_data = None
     opportunities_retrieve_error = False
 
+    @classmethod
+    def get_prefetch_cache_keys(cls, request):
+        return helpers.exops_data_breaker.cache_keys
+
     def dispatch(self, request, *args, **kwargs):
         try:
             self.exops_data = helpers.get_exops_data(request.user.hashed_uuid)
-        except HTTPError:
+        except (HTTPError, Timeout, BulkheadFull, CircuitBreakerOpen):
             self.opportunities_retrieve_error = True
         return super().dispatch(request, *args, **kwargs)
 
@@ -1,5 +1,7 @@
+from profile.business_profile import helpers as business_profile_helpers
 from profile.personal_profile import forms
 
+from django.conf import settings
 from django.contrib.messages.views import SuccessMessageMixin
 from django.urls import reverse_lazy
 from django.views.generic import FormView, TemplateView
@@ -26,5 +28,12 @@ class PersonalProfileEditFormView(core.mixins.CreateUpdateUserProfileMixin, Succ
         return super().form_valid(form)
 
 
-class PersonalProfileView(TemplateView):
+class PersonalProfileView(core.mixins.PrefetchCacheMixin, TemplateView):
     template_name = 'personal_profile/personal-profile.html'
+
+    @classmethod
+    def get_prefetch_cache_keys(cls, request):
+        # the account tabs show the company for users who have not completed their profile
+        return business_profile_helpers.get_dashboard_cache_keys(
+            request.COOKIES.get(settings.SSO_SESSION_COOKIE), include_supplier=False
+        )
@@ -8,7 +8,7 @@ from django.utils.functional import cached_property
 class SSOUser(directory_sso_api_client.models.SSOUser):
     @cached_property
     def company(self):
-        company = helpers.get_company_profile(self.session_id)
+        company = helpers.get_company_profile(self.session_id, self.id)
         if company:
             return helpers.CompanyParser(company)
 